@@ -1,11 +1,11 @@
 from fastapi import FastAPI
 from pathlib import Path
-from api.core.registry import ModuleRegistry
+from api.core.registry import get_registry
 from api.core.module_loader import load_all_modules
 
 app = FastAPI(title="SalesBot CORE", version="0.1")
 
-registry = ModuleRegistry()
+registry = get_registry()
 
 
 @app.get("/health")
@@ -18,7 +18,7 @@ def health():
 def startup_event():
     modules_path = Path(__file__).parent / "modules"
     load_all_modules(registry, modules_path)
-    print(f"[core] Loaded modules: {list(registry.all().keys())}")
+    print(f"[core] Modules: {registry.names()}")
 # ---------------------------------------
 
 
@@ -26,5 +26,6 @@ def startup_event():
 def root():
     return {
         "status": "running",
-        "loaded_modules": list(registry.all().keys())
+        "loaded_modules": list(registry.all().keys()),
+        "modules": registry.versions()
     }
@@ -1,21 +1,189 @@
-from typing import Dict, Any
+import importlib
+import os
+import re
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+# Корни с модулями: (пакет, каталог). Имя модуля берётся из первого корня,
+# где оно есть: modules/ — основное дерево, api/modules/ — только то, чего там нет.
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ROOTS: List[Tuple[str, str]] = [
+    ("modules", os.path.join(_ROOT, "modules")),
+    ("api.modules", os.path.join(_ROOT, "api", "modules")),
+]
+
+
+def _active_versions() -> Dict[str, str]:
+    # версии, которые реально подключает FastAPI-приложение (router_autoload)
+    try:
+        from router_autoload import ROUTE_MODULES
+    except Exception:
+        return {}
+    out = {}
+    for imp in ROUTE_MODULES:
+        parts = imp.split(".")
+        if len(parts) >= 3 and parts[0] == "modules":
+            out.setdefault(parts[1], parts[2])
+    return out
+
+
+def latest_version(module_dir: str) -> str:
+    """Старшая vN каталога модуля; '' если нет."""
+    try:
+        names = os.listdir(module_dir)
+    except OSError:
+        return ""
+    vers = [(int(m.group(1)), d) for d in names for m in [re.match(r"^v(\d+)$", d)] if m
+            and os.path.isdir(os.path.join(module_dir, d))]
+    return max(vers)[1] if vers else ""
+
+
+def resolve_version(module_dir: str, active: Optional[str] = None) -> str:
+    """Активная версия: из router_autoload -> _current -> старшая v*; '' если нет."""
+    try:
+        names = [d for d in os.listdir(module_dir) if os.path.isdir(os.path.join(module_dir, d))]
+    except OSError:
+        return ""
+    if active and active in names:
+        return active
+    if "_current" in names:
+        return "_current"
+    vers = [(int(m.group(1)), d) for d in names for m in [re.match(r"^v(\d+)$", d)] if m]
+    return max(vers)[1] if vers else ""
+
+
+class ModuleEntry:
+    """Модуль с выбранной версией; подмодули и экземпляр создаются при первом обращении."""
+
+    def __init__(self, name: str, package: str, version: str, path: str):
+        self.name = name
+        self.package = package  # 'modules.arena.v4'
+        self.version = version
+        self.path = path
+        self.instance: Any = None
+        self.instantiated = False
+        self._lock = threading.Lock()
+
+    def module(self, part: str = ""):
+        return importlib.import_module(f"{self.package}.{part}" if part else self.package)
+
+    def defines(self, part: str, symbol: str) -> bool:
+        # проверка по исходнику, без импорта
+        fn = os.path.join(self.path, "__init__.py" if part in ("", "__init__") else f"{part}.py")
+        try:
+            with open(fn, "r", encoding="utf-8") as f:
+                return re.search(rf"^\s*(def|class)\s+{re.escape(symbol)}\b", f.read(), re.M) is not None
+        except OSError:
+            return False
+
+    def get(self) -> Any:
+        """
+        Экземпляр модуля: engine.Module(), если движок его объявляет, иначе сам модуль engine
+        (движки тренажёров создаются на сессию: ArenaEngine(sid) и т.п.).
+        """
+        if not self.instantiated:
+            with self._lock:
+                if not self.instantiated:
+                    engine = self.module("engine") if os.path.exists(os.path.join(self.path, "engine.py")) else self.module()
+                    inst = engine.Module() if hasattr(engine, "Module") else engine
+                    if self.defines("routes", "register_routes"):
+                        self.module("routes").register_routes(inst)
+                    self.instance = inst
+                    self.instantiated = True
+        return self.instance
+
+    @property
+    def route_version(self) -> str:
+        """
+        Версия в URL роутов: _current не монтируется под своим именем —
+        берём конкретную старшую vN рядом с ним ('' — роуты без версии).
+        """
+        if self.version != "_current":
+            return self.version
+        return latest_version(os.path.dirname(self.path))
+
+    def info(self) -> dict:
+        return {"package": self.package, "version": self.version, "instantiated": self.instantiated}
+
 
 class ModuleRegistry:
-    """Global registry of all loaded modules.
-    Provides: module name -> module instance
+    """Global registry of all modules.
+    Provides: module name -> module instance.
+    Версия каждого модуля определяется один раз (discover, без импортов),
+    экземпляр создаётся лениво при первом get(name).
     """
-    def __init__(self):
+    def __init__(self, roots: Optional[List[Tuple[str, str]]] = None):
+        self.roots = roots or ROOTS
+        self.entries: Dict[str, ModuleEntry] = {}
         self.modules: Dict[str, Any] = {}
+        self._discovered = False
+        self._lock = threading.Lock()
+
+    def discover(self) -> Dict[str, ModuleEntry]:
+        if self._discovered:
+            return self.entries
+        with self._lock:
+            if self._discovered:
+                return self.entries
+            active = _active_versions()
+            for pkg, base in self.roots:
+                if not os.path.isdir(base):
+                    continue
+                for name in sorted(os.listdir(base)):
+                    d = os.path.join(base, name)
+                    if name in self.entries or name.startswith((".", "_")) or not os.path.isdir(d):
+                        continue
+                    version = resolve_version(d, active.get(name) if pkg == "modules" else None)
+                    if version:
+                        self.entries[name] = ModuleEntry(name, f"{pkg}.{name}.{version}", version, os.path.join(d, version))
+            self._discovered = True
+        return self.entries
 
     def register(self, name: str, module_instance: Any):
         """Register a module instance."""
         self.modules[name] = module_instance
         print(f"[registry] Loaded module: {name}")
 
+    def entry(self, name: str) -> Optional[ModuleEntry]:
+        return self.discover().get(name)
+
     def get(self, name: str):
-        """Retrieve module instance by name."""
-        return self.modules.get(name)
+        """Retrieve module instance by name (created on first use)."""
+        if name in self.modules:
+            return self.modules[name]
+        e = self.entry(name)
+        if e is None:
+            return None
+        inst = e.get()
+        self.modules[name] = inst
+        return inst
+
+    def names(self) -> List[str]:
+        return sorted(set(self.discover()) | set(self.modules))
+
+    def versions(self) -> Dict[str, str]:
+        return {n: e.version for n, e in self.discover().items()}
+
+    def route_versions(self, root: str = "modules") -> Dict[str, str]:
+        """{имя: версия в URL} для модулей корня root (_current -> конкретная vN)."""
+        return {n: e.route_version for n, e in self.discover().items() if e.package.startswith(root + ".")}
 
     def all(self):
-        """Return dict of all registered modules."""
+        """Return dict of all instantiated modules."""
         return self.modules
+
+    def stats(self) -> dict:
+        entries = self.discover()
+        return {
+            "modules": len(entries),
+            "instantiated": sum(1 for e in entries.values() if e.instantiated),
+            "entries": {n: e.info() for n, e in entries.items()},
+        }
+
+
+_REGISTRY = ModuleRegistry()
+
+
+def get_registry() -> ModuleRegistry:
+    """Один реестр на процесс: FastAPI, aiogram (run_bot.py) и simple_telegram_bot.py."""
+    return _REGISTRY
@@ -3,15 +3,14 @@ from typing import List, Optional
 
 import httpx
 from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 
-from core.voice_gateway.v1 import VoicePipeline
+from core.voice_gateway.v1 import get_pipeline, reload_pipeline, get_async_client, response_cache, single_flight
 
 router = APIRouter(prefix="/voice/v1", tags=["voice"])
 
-# Инициализируем общий пайплайн (ASR/TTS/LLM-обёртка)
-pipeline = VoicePipeline()
+# Общий пайплайн процесса (ASR/TTS/LLM-обёртка) берём через get_pipeline()
 
 
 # ---------- Модели ----------
@@ -23,6 +22,7 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
+    stream: bool = False
 
 
 # ---------- Настройки DeepSeek ----------
@@ -45,6 +45,31 @@ async def health():
     }
 
 
+@router.post("/reload")
+async def reload():
+    """Пересоздать общий VoicePipeline (после смены ENV)."""
+    vp = reload_pipeline()
+    return {"ok": True, "model": vp.llm.model, "has_api_key": bool(vp.llm.api_key)}
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Статистика кэша ответов LLM (hits/misses/size)."""
+    return {"ok": True, "cache": response_cache().stats()}
+
+
+@router.get("/singleflight")
+async def singleflight_stats():
+    """Сколько одинаковых одновременных LLM-запросов склеено в один."""
+    return {"ok": True, "singleflight": single_flight().stats()}
+
+
+@router.delete("/cache")
+async def cache_clear():
+    response_cache().clear()
+    return {"ok": True}
+
+
 # ---------- LLM / DeepSeek ----------
 
 @router.post("/llm/chat")
@@ -68,6 +93,13 @@ async def llm_chat(body: ChatRequest):
             role = "user"
         normalized_messages.append({"role": role, "content": m.content})
 
+    if body.stream:
+        # Потоковый режим: text/plain чанками по мере генерации (SSE DeepSeek)
+        return StreamingResponse(
+            get_pipeline().llm.astream(normalized_messages, temperature=0.7),
+            media_type="text/plain; charset=utf-8",
+        )
+
     payload = {
         "model": DEEPSEEK_MODEL,
         "messages": normalized_messages,
@@ -75,12 +107,14 @@ async def llm_chat(body: ChatRequest):
     }
 
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            resp = await client.post(
-                DEEPSEEK_API_URL,
-                headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}"},
-                json=payload,
-            )
+        # общий пул соединений вместо нового клиента на каждый запрос
+        client = get_async_client()
+        resp = await client.post(
+            DEEPSEEK_API_URL,
+            headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}"},
+            json=payload,
+            timeout=60,
+        )
     except Exception as e:
         # Ошибка сети / DNS / таймаут и т.п.
         raise HTTPException(status_code=500, detail=f"HTTP error: {e}")
@@ -114,7 +148,7 @@ async def asr_transcribe(file: UploadFile = File(...)):
     Сейчас использует stub из VoicePipeline.asr.
     """
     audio_bytes = await file.read()
-    text = pipeline.asr.transcribe(audio_bytes, lang="ru")
+    text = get_pipeline().asr.transcribe(audio_bytes, lang="ru")
     return {
         "ok": True,
         "text": text,
@@ -135,5 +169,5 @@ async def tts_synth(payload: TTSRequest):
     TTS: принимаем текст и отдаём WAV-байты.
     Сейчас это stub, но интерфейс уже правильный.
     """
-    audio_bytes = pipeline.tts.synth(payload.text, voice=payload.voice or "neutral")
+    audio_bytes = get_pipeline().tts.synth(payload.text, voice=payload.voice or "neutral")
     return Response(content=audio_bytes, media_type="audio/wav")
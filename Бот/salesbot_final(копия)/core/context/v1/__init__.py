@@ -0,0 +1,2 @@
+from .window import ContextWindow, get_window, render, estimate_tokens, clip, session_key, extractive_summary
+__all__=['ContextWindow','get_window','render','estimate_tokens','clip','session_key','extractive_summary']
@@ -0,0 +1,228 @@
+
+import os, json, time, hashlib, threading
+from typing import Any, Callable, Dict, List, Optional
+from core.state.v1 import get_store
+from core.metrics.v1 import inc
+
+# Окно контекста для промптов LLM: вместо json.dumps(history)[:N] —
+# свёртка старых реплик + последние K реплик целиком, в пределах бюджета токенов.
+#   - свёртка хранится в SQLite (ctx_summaries) по ключу сессии и дописывается
+#     инкрементально: в summarizer уходят только новые реплики + прошлая свёртка
+#   - сворачиваем пачкой, когда за последними CTX_KEEP_LAST накопилось CTX_FOLD_EVERY
+#     реплик — один вызов LLM на FOLD_EVERY ходов, а не на каждый
+#   - токены оцениваются по длине (CTX_CHARS_PER_TOKEN символов на токен)
+# Размер промпта перестаёт расти с длиной сессии.
+
+CHARS_PER_TOKEN = float(os.getenv("CTX_CHARS_PER_TOKEN", "3"))
+BUDGET = int(os.getenv("CTX_TOKEN_BUDGET", "1200"))
+KEEP_LAST = int(os.getenv("CTX_KEEP_LAST", "6"))
+FOLD_EVERY = max(1, int(os.getenv("CTX_FOLD_EVERY", "6")))
+SUMMARY_TOKENS = int(os.getenv("CTX_SUMMARY_TOKENS", "300"))
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS ctx_summaries (
+  key TEXT PRIMARY KEY,
+  upto INTEGER NOT NULL,
+  digest TEXT,
+  summary TEXT,
+  updated REAL
+)
+'''
+
+_FALLBACK_PREFIX = "Совет коуча:"  # ответ локального коуча вместо апстрима — не свёртка
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1 if text else 0
+
+
+def clip(text: str, tokens: int, tail: bool = False) -> str:
+    """Обрезка по бюджету токенов; tail=True — оставить конец."""
+    text = text or ""
+    limit = max(0, int(tokens * CHARS_PER_TOKEN))
+    if len(text) <= limit:
+        return text
+    if limit <= 1:
+        return text[:limit]
+    return "…" + text[-(limit - 1):] if tail else text[:limit - 1] + "…"
+
+
+def turn_text(turn: Any) -> str:
+    # {role, content} (dialog_memory) / {role, text} (тренажёры) / строка
+    if isinstance(turn, dict):
+        role = turn.get("role") or turn.get("speaker") or "?"
+        content = turn.get("content")
+        if content is None:
+            content = turn.get("text", "")
+        return f"{role}: {content}"
+    return str(turn)
+
+
+def _digest(history: List[Any], upto: int) -> str:
+    # граница свёртки: число реплик + последняя свёрнутая реплика
+    last = turn_text(history[upto - 1]) if upto else ""
+    return hashlib.sha1(f"{upto}\n{last}".encode("utf-8")).hexdigest()
+
+
+def session_key(module: str, *ids: Any) -> Optional[str]:
+    """Ключ свёртки с пространством имён модуля: 'dialog_memory:m1:s1'; None — id не передан."""
+    if not ids or any(i is None or i == "" for i in ids):
+        return None
+    return ":".join([module] + [str(i) for i in ids])
+
+
+def llm_summarizer(summary: str, turns: List[Any], tokens: int) -> str:
+    from core.voice_gateway.v1 import get_pipeline
+    llm = get_pipeline().llm
+    lines = "\n".join(clip(turn_text(t), tokens) for t in turns)
+    if llm.api_key:
+        msg = [
+            {"role": "system", "content": f"Ты ведёшь краткий конспект диалога менеджера с клиентом. Дополни конспект новыми репликами: факты о клиенте, возражения, договорённости, ошибки менеджера. Не больше {int(tokens * CHARS_PER_TOKEN)} символов, без вступлений."},
+            {"role": "user", "content": f"Конспект: {summary or '—'}\nНовые реплики:\n{lines}"},
+        ]
+        out = (llm.chat(msg, cache=True) or "").strip()
+        if out and not out.startswith(_FALLBACK_PREFIX):
+            return clip(out, tokens)
+    return extractive_summary(summary, turns, tokens)
+
+
+def extractive_summary(summary: str, turns: List[Any], tokens: int) -> str:
+    """Без LLM: первая фраза каждой реплики; при переполнении старое уходит с начала."""
+    parts = [summary] if summary else []
+    for t in turns:
+        s = turn_text(t).strip().replace("\n", " ")
+        cut = min((i for i in (s.find(". "), s.find("? "), s.find("! ")) if i > 0), default=-1)
+        parts.append(clip(s[:cut + 1] if cut > 0 else s, 40))
+    return clip(" | ".join(parts), tokens, tail=True)
+
+
+class ContextWindow:
+    def __init__(self, db_path: str = "salesbot.db", budget: int = BUDGET, keep_last: int = KEEP_LAST,
+                 fold_every: int = FOLD_EVERY, summary_tokens: int = SUMMARY_TOKENS,
+                 summarizer: Optional[Callable[[str, List[Any], int], str]] = None):
+        self.db_path = db_path
+        self.budget = budget
+        self.keep_last = keep_last
+        self.fold_every = fold_every
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer or llm_summarizer
+        self._ready = False
+        self._lock = threading.Lock()
+        self._stats = {"builds": 0, "folds": 0, "resets": 0, "dropped": 0}
+
+    def _kv(self):
+        st = get_store(self.db_path)
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    st._exec(_SCHEMA.strip()).close()
+                    self._ready = True
+        return st
+
+    def _get(self, key: str):
+        cur = self._kv()._exec("SELECT upto, digest, summary FROM ctx_summaries WHERE key=?", (key,))
+        row = cur.fetchone()
+        cur.close()
+        return row
+
+    def _put(self, key: str, upto: int, digest: str, summary: str) -> None:
+        self._kv()._exec(
+            "REPLACE INTO ctx_summaries(key, upto, digest, summary, updated) VALUES(?,?,?,?,?)",
+            (key, upto, digest, summary, time.time()),
+        ).close()
+
+    def reset(self, key: str) -> None:
+        self._kv()._exec("DELETE FROM ctx_summaries WHERE key=?", (key,)).close()
+
+    def build(self, key: Optional[str], history: Optional[List[Any]], budget: Optional[int] = None) -> Dict[str, Any]:
+        """
+        -> {summary, recent, tokens, turns, summarized, dropped}
+        recent — хвост истории после свёртки (не больше keep_last + fold_every - 1 реплик),
+        при нехватке бюджета самые старые из них отбрасываются (dropped).
+        key=None (нет session_id) — ничего не хранится и LLM не зовётся: всё, что старше
+        последних keep_last реплик, сжимается локально (extractive_summary).
+        """
+        history = list(history or [])
+        n = len(history)
+        budget = self.budget if budget is None else budget
+        upto, summary = 0, ""
+        if key is None:
+            if n > self.keep_last:
+                upto = n - self.keep_last
+                summary = extractive_summary("", history[:upto], self.summary_tokens)
+            return self._fit(summary, history, upto, budget)
+        row = self._get(key) if n > self.keep_last else None
+        if row is not None:
+            if row[0] <= n and row[1] == _digest(history, row[0]):
+                upto, summary = row[0], row[2] or ""
+            else:
+                self._stats["resets"] += 1  # история переписана / укорочена
+        if n - self.keep_last - upto >= self.fold_every:
+            new_upto = n - self.keep_last
+            summary = self.summarizer(summary, history[upto:new_upto], self.summary_tokens)
+            upto = new_upto
+            self._put(key, upto, _digest(history, upto), summary)
+            self._stats["folds"] += 1
+            inc("salesbot_context_folds_total")
+        return self._fit(summary, history, upto, budget)
+
+    def _fit(self, summary: str, history: List[Any], upto: int, budget: int) -> Dict[str, Any]:
+        n = len(history)
+        if estimate_tokens(summary) > budget // 2:
+            summary = clip(summary, budget // 2, tail=True)  # свёртка — не больше половины бюджета
+        left = budget - estimate_tokens(summary)
+        recent: List[Any] = []
+        for t in reversed(history[upto:]):
+            cost = estimate_tokens(turn_text(t))
+            if cost > left:
+                if not recent:
+                    recent.append(_clip_turn(t, max(left, 1)))  # последняя реплика — всегда, хоть обрезанная
+                    left = 0
+                break
+            recent.append(t)
+            left -= cost
+        recent.reverse()
+        dropped = n - upto - len(recent)
+        self._stats["builds"] += 1
+        self._stats["dropped"] += dropped
+        return {"summary": summary, "recent": recent, "tokens": budget - left, "turns": n,
+                "summarized": upto, "dropped": dropped}
+
+    def render(self, key: Optional[str], history: Optional[List[Any]], budget: Optional[int] = None) -> str:
+        """Текст для промпта: свёртка + последние реплики построчно."""
+        return render(self.build(key, history, budget))
+
+    def stats(self) -> dict:
+        return {"budget": self.budget, "keep_last": self.keep_last, "fold_every": self.fold_every,
+                "summary_tokens": self.summary_tokens, **self._stats}
+
+
+def _clip_turn(turn: Any, tokens: int) -> Any:
+    if isinstance(turn, dict):
+        field = "content" if turn.get("content") is not None else "text"
+        return dict(turn, **{field: clip(str(turn.get(field) or ""), tokens)})
+    return clip(str(turn), tokens)
+
+
+def render(ctx: Dict[str, Any]) -> str:
+    lines = []
+    if ctx.get("summary"):
+        lines.append(f"Ранее (кратко): {ctx['summary']}")
+    if ctx.get("dropped"):
+        lines.append(f"(пропущено реплик: {ctx['dropped']})")
+    lines.extend(turn_text(t) for t in ctx.get("recent") or [])
+    return "\n".join(lines)
+
+
+_WINDOW: Optional[ContextWindow] = None
+_WLOCK = threading.Lock()
+
+
+def get_window() -> ContextWindow:
+    """Одно окно на процесс (база CTX_DB, по умолчанию salesbot.db)."""
+    global _WINDOW
+    if _WINDOW is None:
+        with _WLOCK:
+            if _WINDOW is None:
+                _WINDOW = ContextWindow(os.getenv("CTX_DB", "salesbot.db"))
+    return _WINDOW
@@ -0,0 +1,2 @@
+from .automaton import AhoCorasick, KeywordIndex, AUTOMATON_MIN_KEYWORDS
+__all__=['AhoCorasick','KeywordIndex','AUTOMATON_MIN_KEYWORDS']
@@ -0,0 +1,120 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Порог: сколько уникальных ключевых слов нужно, чтобы проход автомата
+# (цикл на Python по символам) обогнал поиск каждой подстроки в C (str.count / in).
+# На меньших наборах выгоднее C-поиск по уникальным словам.
+AUTOMATON_MIN_KEYWORDS = 256
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо–Корасик: все вхождения всех слов за один линейный проход.
+    find(text) -> [(start, keyword)] (вхождения могут перекрываться).
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+        for kw in keywords:
+            if kw:
+                self._add(kw)
+        self._build()
+
+    def _add(self, kw: str) -> None:
+        s = 0
+        for ch in kw:
+            nxt = self._goto[s].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[s][ch] = nxt
+            s = nxt
+        if kw not in self._out[s]:
+            self._out[s] = self._out[s] + (kw,)
+
+    def _build(self) -> None:
+        q = deque(self._goto[0].values())
+        while q:
+            r = q.popleft()
+            for ch, s in self._goto[r].items():
+                q.append(s)
+                f = self._fail[r]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                nxt = self._goto[f].get(ch, 0)
+                self._fail[s] = nxt if nxt != s else 0
+                # выходы по суффиксным ссылкам склеиваются заранее
+                self._out[s] = self._out[s] + self._out[self._fail[s]]
+
+    def find(self, text: str) -> List[Tuple[int, str]]:
+        goto, fail, out = self._goto, self._fail, self._out
+        s = 0
+        res = []
+        for i, ch in enumerate(text):
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            if out[s]:
+                for kw in out[s]:
+                    res.append((i - len(kw) + 1, kw))
+        return res
+
+
+class KeywordIndex:
+    """
+    Набор ключевых слов по тегам, собранный один раз.
+      KeywordIndex({"warm": ["спасибо", ...], "cta": [...]}, lower=True)
+      counts(text)   -> {слово: число вхождений} (без перекрытий, как str.count)
+      present(text)  -> {слова, найденные в тексте}
+      tags(text)     -> {тег: сколько его слов найдено}
+      tag_counts(text) -> {тег: сумма вхождений его слов}
+    Одно слово в нескольких тегах ищется один раз. lower=True — текст и слова
+    приводятся к нижнему регистру. На больших наборах работает через AhoCorasick.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]], lower: bool = False,
+                 automaton: Optional[bool] = None) -> None:
+        self.lower = lower
+        self.groups: Dict[str, Tuple[str, ...]] = {}
+        for tag, words in groups.items():
+            ws = [w.lower() if lower else w for w in words if w]
+            self.groups[tag] = tuple(dict.fromkeys(ws))
+        self.keywords: Tuple[str, ...] = tuple(dict.fromkeys(w for ws in self.groups.values() for w in ws))
+        if automaton is None:
+            automaton = len(self.keywords) >= AUTOMATON_MIN_KEYWORDS
+        self._ac = AhoCorasick(self.keywords) if automaton else None
+
+    def _prep(self, text: str) -> str:
+        text = text or ""
+        return text.lower() if self.lower else text
+
+    def counts(self, text: str) -> Dict[str, int]:
+        t = self._prep(text)
+        if self._ac is None:
+            return {w: n for w in self.keywords for n in (t.count(w),) if n}
+        res: Dict[str, int] = {}
+        last_end: Dict[str, int] = {}
+        for start, kw in self._ac.find(t):
+            # как str.count: вхождение одного слова не перекрывает предыдущее
+            if start >= last_end.get(kw, 0):
+                res[kw] = res.get(kw, 0) + 1
+                last_end[kw] = start + len(kw)
+        return res
+
+    def present(self, text: str) -> Set[str]:
+        t = self._prep(text)
+        if self._ac is None:
+            return {w for w in self.keywords if w in t}
+        return {kw for _, kw in self._ac.find(t)}
+
+    def tags(self, text: str) -> Dict[str, int]:
+        found = self.present(text)
+        return {tag: sum(1 for w in ws if w in found) for tag, ws in self.groups.items()}
+
+    def tag_counts(self, text: str) -> Dict[str, int]:
+        c = self.counts(text)
+        return {tag: sum(c.get(w, 0) for w in ws) for tag, ws in self.groups.items()}
@@ -0,0 +1,3 @@
+from .metrics import Metrics, get_metrics, observe, inc, record, timer, timed, server_timing, BUCKETS
+from .middleware import TimingMiddleware
+__all__=['Metrics','get_metrics','observe','inc','record','timer','timed','server_timing','BUCKETS','TimingMiddleware']
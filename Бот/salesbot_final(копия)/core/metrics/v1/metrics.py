@@ -0,0 +1,179 @@
+import time
+import bisect
+import inspect
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Лёгкие метрики процесса в формате Prometheus (text 0.0.4), без зависимостей.
+#   observe(name, сек, **labels) — гистограмма, inc(name, **labels) — счётчик
+#   with timer("llm", op="chat"): ... — гистограмма salesbot_phase_duration_seconds
+#     + сумма по фазе в текущем запросе (для заголовка Server-Timing)
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PHASE = "salesbot_phase_duration_seconds"
+
+HELP = {
+    "salesbot_http_request_duration_seconds": "HTTP request latency by module and route",
+    PHASE: "Time spent in hot-path phases (llm, db, session_io, rules)",
+    "salesbot_llm_retries_total": "LLM upstream retry attempts",
+    "salesbot_llm_fallbacks_total": "LLM calls answered by the local fallback",
+    "salesbot_sqlite_busy_retries_total": "SQLite 'database is locked' retries",
+    "salesbot_context_folds_total": "Rolling-summary folds of older dialog turns",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# фазы текущего запроса: {phase: [секунд, вызовов]}; ставит TimingMiddleware
+_REQUEST: contextvars.ContextVar[Optional[Dict[str, List[float]]]] = contextvars.ContextVar("salesbot_request_phases", default=None)
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, v)] += 1
+        self.sum += v
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hist: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._hist.setdefault(name, {})
+            h = series.get(key)
+            if h is None:
+                h = series[key] = _Histogram()
+            h.observe(value)
+
+    def inc(self, name: str, n: float = 1, **labels) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + n
+
+    def render(self) -> str:
+        out: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                out.append(f"# HELP {name} {HELP.get(name, name)}")
+                out.append(f"# TYPE {name} counter")
+                for key, v in sorted(series.items()):
+                    out.append(f"{name}{_fmt(key)} {_num(v)}")
+            for name, series in sorted(self._hist.items()):
+                out.append(f"# HELP {name} {HELP.get(name, name)}")
+                out.append(f"# TYPE {name} histogram")
+                for key, h in sorted(series.items()):
+                    acc = 0
+                    for le, c in zip(BUCKETS, h.counts):
+                        acc += c
+                        out.append(f"{name}_bucket{_fmt(key + (('le', _num(le)),))} {acc}")
+                    out.append(f"{name}_bucket{_fmt(key + (('le', '+Inf'),))} {h.count}")
+                    out.append(f"{name}_sum{_fmt(key)} {h.sum:.6f}")
+                    out.append(f"{name}_count{_fmt(key)} {h.count}")
+        return "\n".join(out) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+            self._counters.clear()
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _fmt(key: Labels) -> str:
+    if not key:
+        return ""
+    esc = lambda s: s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in key) + "}"
+
+
+_METRICS = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _METRICS
+
+
+def observe(name: str, value: float, **labels) -> None:
+    _METRICS.observe(name, value, **labels)
+
+
+def inc(name: str, n: float = 1, **labels) -> None:
+    _METRICS.inc(name, n, **labels)
+
+
+def record(phase: str, seconds: float, **labels) -> None:
+    """Время фазы: в гистограмму и в Server-Timing текущего запроса."""
+    _METRICS.observe(PHASE, seconds, phase=phase, **labels)
+    phases = _REQUEST.get()
+    if phases is not None:
+        acc = phases.get(phase)
+        if acc is None:
+            phases[phase] = [seconds, 1]
+        else:
+            acc[0] += seconds
+            acc[1] += 1
+
+
+@contextmanager
+def timer(phase: str, **labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - t0, **labels)
+
+
+def timed(phase: str, **labels):
+    """Декоратор: timer(phase) вокруг функции (sync или async)."""
+    def deco(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*a, **kw):
+                with timer(phase, **labels):
+                    return await fn(*a, **kw)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            with timer(phase, **labels):
+                return fn(*a, **kw)
+        return wrapper
+    return deco
+
+
+def begin_request():
+    """-> (словарь фаз, токен для end_request)."""
+    phases: Dict[str, List[float]] = {}
+    return phases, _REQUEST.set(phases)
+
+
+def end_request(token) -> None:
+    _REQUEST.reset(token)
+
+
+def server_timing(phases: Dict[str, List[float]], total: Optional[float] = None) -> str:
+    """Заголовок Server-Timing: llm;dur=812.4;desc="2x", db;dur=3.1;desc="5x", total;dur=820.0"""
+    parts = []
+    for name, (sec, n) in phases.items():
+        parts.append(f'{name};dur={sec * 1000:.1f};desc="{int(n)}x"')
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,42 @@
+import time
+
+from .metrics import begin_request, end_request, observe, server_timing
+
+REQUEST = "salesbot_http_request_duration_seconds"
+
+
+class TimingMiddleware:
+    """
+    ASGI-мидлварь: гистограмма времени запроса по модулю и шаблону роута
+    и заголовок Server-Timing (фазы llm / db / session_io / rules + total).
+    Чистый ASGI, а не BaseHTTPMiddleware: contextvar фаз виден и в эндпоинте,
+    и в потоках, куда FastAPI уводит sync-обработчики.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        phases, token = begin_request()
+        t0 = time.perf_counter()
+        status = [500]
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                headers = list(message.get("headers") or [])
+                headers.append((b"server-timing", server_timing(phases, time.perf_counter() - t0).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            end_request(token)
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            module = route.strip("/").split("/", 1)[0] if route != "<unmatched>" else "<unmatched>"
+            observe(REQUEST, time.perf_counter() - t0, module=module, route=route,
+                    method=scope.get("method", ""), status=status[0])
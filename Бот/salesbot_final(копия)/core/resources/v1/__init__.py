@@ -0,0 +1,3 @@
+from .loader import ResourceLoader, get_loader, load_json, load_json_dir, invalidate, resource_stats
+from .frozen import FrozenDict, FrozenList, freeze, thaw
+__all__=['ResourceLoader','get_loader','load_json','load_json_dir','invalidate','resource_stats','FrozenDict','FrozenList','freeze','thaw']
@@ -0,0 +1,60 @@
+from typing import Any
+
+
+def _readonly(self, *a, **kw):
+    raise TypeError(f"{type(self).__name__} is read-only: use thaw() for a mutable copy")
+
+
+class FrozenDict(dict):
+    """dict только для чтения: сериализуется как обычный dict (json, FastAPI)."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = _readonly
+    pop = popitem = clear = update = setdefault = _readonly
+    __ior__ = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (dict, (thaw(self),))
+
+
+class FrozenList(list):
+    """list только для чтения."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = _readonly
+    append = extend = insert = remove = pop = clear = sort = reverse = _readonly
+    __iadd__ = __imul__ = _readonly
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (list, (thaw(self),))
+
+
+def freeze(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        fd = FrozenDict()
+        dict.update(fd, ((k, freeze(v)) for k, v in obj.items()))
+        return fd
+    if isinstance(obj, list):
+        fl = FrozenList()
+        list.extend(fl, (freeze(v) for v in obj))
+        return fl
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Изменяемая глубокая копия замороженного объекта."""
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [thaw(v) for v in obj]
+    return obj
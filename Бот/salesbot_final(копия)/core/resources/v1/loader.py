@@ -0,0 +1,207 @@
+import os
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .frozen import freeze
+
+_NO_DEFAULT = object()
+
+# Наблюдатель файловой системы (inotify / FSEvents / ReadDirectoryChangesW), если установлен watchdog
+try:
+    from watchdog.observers import Observer  # type: ignore
+    from watchdog.events import FileSystemEventHandler  # type: ignore
+except Exception:
+    Observer = None  # type: ignore
+    FileSystemEventHandler = object  # type: ignore
+
+
+def _sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _Handler(FileSystemEventHandler):  # type: ignore[misc]
+    def __init__(self, loader: "ResourceLoader") -> None:
+        self.loader = loader
+
+    def on_any_event(self, event) -> None:
+        for p in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if p:
+                self.loader.invalidate(p)
+                self.loader.invalidate(os.path.dirname(p))
+
+
+class ResourceLoader:
+    """
+    Общий загрузчик файлов данных модулей.
+      - json(path)      — файл разбирается один раз и отдаётся замороженным
+                          (FrozenDict / FrozenList, изменить нельзя — thaw() для копии)
+      - json_dir(dir)   — все *.json каталога, список в порядке имён файлов
+      - кэш сбрасывается по смене (mtime_ns, size) файла; проверка — os.stat на вызове
+      - watch()         — фоновое слежение (watchdog, иначе опрос раз в interval сек):
+                          пока оно активно, stat на каждом вызове не делается
+      - invalidate(path), stats()
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[Optional[Tuple[int, int]], Any]] = {}
+        self._dirs: Dict[str, Tuple[Optional[Tuple[int, int]], List[str]]] = {}
+        self._stats = {"hits": 0, "loads": 0, "reloads": 0, "errors": 0, "invalidations": 0}
+        self._watch_mode: Optional[str] = None
+        self._watch_stop = threading.Event()
+        self._observer = None
+        self._watched_dirs: set = set()
+
+    # ---- файлы ----
+
+    def json(self, path: str, default: Any = _NO_DEFAULT) -> Any:
+        path = os.path.abspath(path)
+        item = self._files.get(path)
+        if item is not None and (self._watch_mode or _sig(path) == item[0]):
+            with self._lock:
+                self._stats["hits"] += 1
+            return item[1]
+        sig = _sig(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = freeze(json.load(f))
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            if default is _NO_DEFAULT:
+                raise
+            return default
+        with self._lock:
+            self._stats["reloads" if path in self._files else "loads"] += 1
+            self._files[path] = (sig, data)
+        self._track(os.path.dirname(path))
+        return data
+
+    def json_dir(self, directory: str, suffix: str = ".json") -> List[Any]:
+        """Разобранные файлы каталога; битые файлы пропускаются."""
+        directory = os.path.abspath(directory)
+        key = directory + "\0" + suffix
+        item = self._dirs.get(key)
+        if item is None or (not self._watch_mode and _sig(directory) != item[0]):
+            sig = _sig(directory)
+            try:
+                names = sorted(fn for fn in os.listdir(directory) if fn.endswith(suffix))
+            except OSError:
+                names = []
+            with self._lock:
+                self._dirs[key] = (sig, names)
+            self._track(directory)
+        else:
+            names = item[1]
+        out = []
+        for fn in names:
+            data = self.json(os.path.join(directory, fn), default=None)
+            if data is not None:
+                out.append(data)
+        return out
+
+    def invalidate(self, path: Optional[str] = None) -> int:
+        with self._lock:
+            if path is None:
+                n = len(self._files) + len(self._dirs)
+                self._files.clear()
+                self._dirs.clear()
+            else:
+                path = os.path.abspath(path)
+                n = int(self._files.pop(path, None) is not None)
+                for key in [k for k in self._dirs if k.split("\0", 1)[0] == path]:
+                    del self._dirs[key]
+                    n += 1
+            self._stats["invalidations"] += n
+            return n
+
+    # ---- слежение ----
+
+    def _track(self, directory: str) -> None:
+        if self._observer is None or directory in self._watched_dirs:
+            return
+        with self._lock:
+            if directory in self._watched_dirs:
+                return
+            self._watched_dirs.add(directory)
+        try:
+            self._observer.schedule(_Handler(self), directory, recursive=False)
+        except Exception:
+            pass
+
+    def _poll(self, interval: float) -> None:
+        while not self._watch_stop.wait(interval):
+            for path, (sig, _) in list(self._files.items()):
+                if _sig(path) != sig:
+                    self.invalidate(path)
+            for key, (sig, _) in list(self._dirs.items()):
+                d = key.split("\0", 1)[0]
+                if _sig(d) != sig:
+                    self.invalidate(d)
+
+    def watch(self, interval: float = 1.0, mode: Optional[str] = None) -> str:
+        """mode: "inotify" (watchdog), "poll" или None — inotify, если watchdog установлен."""
+        if self._watch_mode:
+            return self._watch_mode
+        if mode in (None, "inotify") and Observer is not None:
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.start()
+            for d in {os.path.dirname(p) for p in self._files} | {k.split("\0", 1)[0] for k in self._dirs}:
+                self._track(d)
+            self._watch_mode = "inotify"
+        else:
+            self._watch_stop.clear()
+            threading.Thread(target=self._poll, args=(interval,), name="resource-watch", daemon=True).start()
+            self._watch_mode = "poll"
+        return self._watch_mode
+
+    def unwatch(self) -> None:
+        self._watch_stop.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+            self._watched_dirs.clear()
+        self._watch_mode = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["loads"] + self._stats["reloads"]
+            return {
+                "files": len(self._files),
+                "dirs": len(self._dirs),
+                "watch": self._watch_mode,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                **self._stats,
+            }
+
+
+_LOADER = ResourceLoader()
+
+
+def get_loader() -> ResourceLoader:
+    return _LOADER
+
+
+def load_json(path: str, default: Any = _NO_DEFAULT) -> Any:
+    return _LOADER.json(path, default)
+
+
+def load_json_dir(directory: str, suffix: str = ".json") -> List[Any]:
+    return _LOADER.json_dir(directory, suffix)
+
+
+def invalidate(path: Optional[str] = None) -> int:
+    return _LOADER.invalidate(path)
+
+
+def resource_stats() -> dict:
+    return _LOADER.stats()
@@ -1,2 +1,2 @@
-from .store import StateStore
-__all__=['StateStore']
+from .store import StateStore, StorePool, get_store, pool_stats, flush_all, close_all
+__all__=['StateStore','StorePool','get_store','pool_stats','flush_all','close_all']
@@ -1,6 +1,8 @@
 
-import sqlite3, time, threading
-from typing import List, Tuple, Optional
+import os, json, sqlite3, time, threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Optional
+from core.metrics.v1 import record, inc
 
 _SCHEMA = '''
 CREATE TABLE IF NOT EXISTS kv (
@@ -9,38 +11,273 @@ CREATE TABLE IF NOT EXISTS kv (
   ts REAL
 );
 CREATE INDEX IF NOT EXISTS kv_ts_idx ON kv(ts);
+CREATE TABLE IF NOT EXISTS turns (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  key TEXT NOT NULL,
+  item TEXT,
+  ts REAL
+);
+CREATE INDEX IF NOT EXISTS turns_key_idx ON turns(key, id);
 '''
 
-class StateStore:
-    def __init__(self, path: str = "salesbot.db"):
-        self.path = path
+_SYNC_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def _verb(sql: str) -> str:
+    # метка метрики: SELECT / REPLACE / INSERT / DELETE ...
+    return sql.split(None, 1)[0].upper() if sql else ""
+
+
+def _synchronous() -> str:
+    # уровень надёжности SQLite: STATE_SYNCHRONOUS=OFF|NORMAL|FULL|EXTRA
+    lvl = os.environ.get("STATE_SYNCHRONOUS", "NORMAL").upper()
+    return lvl if lvl in _SYNC_LEVELS else "NORMAL"
+
+
+def _write_behind_ms() -> float:
+    try:
+        return max(0.0, float(os.environ.get("STATE_WRITE_BEHIND_MS", "0")))
+    except ValueError:
+        return 0.0
+
+
+class StorePool:
+    """
+    Общий пул SQLite-соединений процесса.
+    Одно соединение на (путь к БД, поток): PRAGMA и схема выполняются
+    один раз, соединения переиспользуются всеми движками и закрываются
+    через close_all() при остановке приложения.
+    """
+
+    def __init__(self):
         self._lock = threading.RLock()
-        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
-        self._conn.execute("PRAGMA journal_mode=WAL;")
-        self._conn.execute("PRAGMA synchronous=NORMAL;")
-        self._init_db()
+        self._conns: Dict[Tuple[str, int], Tuple[sqlite3.Connection, threading.Thread]] = {}
+        self._schema_ready = set()
+        self._stores: Dict[str, "StateStore"] = {}
+        self._stats = {"opened": 0, "reused": 0, "closed": 0}
 
-    def _init_db(self):
-        with self._lock:
-            cur = self._conn.cursor()
+    @staticmethod
+    def _norm(path: str) -> str:
+        return path if path == ":memory:" else os.path.abspath(path)
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute(f"PRAGMA synchronous={_synchronous()};")
+        if path not in self._schema_ready:
+            cur = conn.cursor()
             for stmt in _SCHEMA.strip().split(';'):
                 s = stmt.strip()
                 if s:
                     cur.execute(s)
             cur.close()
+            self._schema_ready.add(path)
+        return conn
+
+    def _reap(self):
+        # соединения завершившихся потоков больше никто не возьмёт
+        dead = [k for k, (_, t) in self._conns.items() if not t.is_alive()]
+        for k in dead:
+            conn, _ = self._conns.pop(k)
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self._stats["closed"] += 1
+
+    def connection(self, path: str) -> sqlite3.Connection:
+        key = (self._norm(path), threading.get_ident())
+        item = self._conns.get(key)
+        if item is not None:
+            self._stats["reused"] += 1
+            return item[0]
+        with self._lock:
+            item = self._conns.get(key)
+            if item is None:
+                self._reap()
+                item = (self._open(key[0]), threading.current_thread())
+                self._conns[key] = item
+                self._stats["opened"] += 1
+            return item[0]
+
+    def store(self, path: str = "salesbot.db") -> "StateStore":
+        norm = self._norm(path)
+        st = self._stores.get(norm)
+        if st is None:
+            with self._lock:
+                st = self._stores.get(norm)
+                if st is None:
+                    st = StateStore(path, pool=self)
+                    self._stores[norm] = st
+        return st
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._reap()
+            paths: Dict[str, int] = {}
+            for (p, _) in self._conns:
+                paths[p] = paths.get(p, 0) + 1
+            wb = {p: st.wb_stats() for p, st in self._stores.items() if st.write_behind}
+            return {
+                "open": len(self._conns),
+                "by_path": paths,
+                "stores": len(self._stores),
+                "write_behind": wb,
+                **self._stats,
+            }
+
+    def flush_all(self) -> int:
+        with self._lock:
+            stores = list(self._stores.values())
+        return sum(st.flush() for st in stores)
+
+    def close_all(self) -> int:
+        # сначала сбрасываем отложенные записи, потом закрываем соединения
+        for st in list(self._stores.values()):
+            st.stop_write_behind()
+        with self._lock:
+            n = 0
+            for conn, _ in self._conns.values():
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                n += 1
+            self._conns.clear()
+            self._stores.clear()
+            self._schema_ready.clear()
+            self._stats["closed"] += n
+            return n
+
+
+_POOL = StorePool()
+
+
+def get_store(path: str = "salesbot.db") -> "StateStore":
+    """Общий StateStore для пути (вместо StateStore(path) в каждом движке)."""
+    return _POOL.store(path)
+
+
+def pool_stats() -> dict:
+    return _POOL.stats()
+
+
+def flush_all() -> int:
+    """Сбросить отложенные записи всех StateStore пула."""
+    return _POOL.flush_all()
+
+
+def close_all() -> int:
+    return _POOL.close_all()
+
+
+class StateStore:
+    """
+    KV поверх SQLite. write_behind_ms > 0 (или env STATE_WRITE_BEHIND_MS)
+    включает отложенную запись: set() кладёт значение в буфер, повторные
+    записи одного ключа склеиваются, а фоновый поток раз в окно сбрасывает
+    буфер одной транзакцией. get() видит буфер, flush() сбрасывает его сразу.
+    """
+
+    def __init__(self, path: str = "salesbot.db", pool: Optional[StorePool] = None,
+                 write_behind_ms: Optional[float] = None, max_pending: int = 1000):
+        self.path = path
+        self._lock = threading.RLock()
+        self._pool = pool or _POOL
+        ms = _write_behind_ms() if write_behind_ms is None else max(0.0, float(write_behind_ms))
+        self.write_behind = ms > 0
+        self._interval = ms / 1000.0
+        self._max_pending = max_pending
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._wb_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wb_wake = threading.Event()
+        self._wb_stop = False
+        self._wb_thread: Optional[threading.Thread] = None
+        self._wb_stats = {"writes": 0, "coalesced": 0, "flushes": 0, "flushed_rows": 0}
+        self._init_db()
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._pool.connection(self.path)
+
+    def _init_db(self):
+        # схема создаётся пулом при первом открытии соединения к пути
+        with self._lock:
+            self._pool.connection(self.path)
 
     def _exec(self, sql: str, args: tuple=()):
         # simple retry for SQLITE_BUSY
+        # соединение своё у каждого потока и в autocommit — ни общего лока, ни commit() не нужно
         backoff = 0.01
+        t0 = time.perf_counter()
         for _ in range(5):
             try:
-                with self._lock:
-                    cur = self._conn.cursor()
-                    cur.execute(sql, args)
-                    self._conn.commit()
-                    return cur
+                cur = self._conn.cursor()
+                cur.execute(sql, args)
+                record("db", time.perf_counter() - t0, op=_verb(sql))
+                return cur
             except sqlite3.OperationalError as e:
                 if "database is locked" in str(e).lower():
+                    inc("salesbot_sqlite_busy_retries_total", op="exec")
+                    time.sleep(backoff)
+                    backoff *= 2
+                    continue
+                raise
+        raise RuntimeError("SQLite busy, retries exceeded")
+
+    @contextmanager
+    def transaction(self):
+        """
+        BEGIN IMMEDIATE ... COMMIT на соединении текущего потока; _exec внутри блока
+        идут в эту транзакцию. Вложенный вызов присоединяется к внешней.
+        """
+        conn = self._conn
+        if conn.in_transaction:
+            yield self
+            return
+        backoff = 0.01
+        for attempt in range(5):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                break
+            except sqlite3.OperationalError as e:
+                if "database is locked" in str(e).lower() and attempt < 4:
+                    inc("salesbot_sqlite_busy_retries_total", op="begin")
+                    time.sleep(backoff)
+                    backoff *= 2
+                    continue
+                raise
+        try:
+            yield self
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _exec_many(self, sql: str, rows: List[tuple]) -> None:
+        # одна транзакция на пачку строк (внутри transaction() — в её составе)
+        backoff = 0.01
+        t0 = time.perf_counter()
+        if self._conn.in_transaction:
+            self._conn.executemany(sql, rows)
+            record("db", time.perf_counter() - t0, op="batch")
+            return
+        for _ in range(5):
+            try:
+                conn = self._conn
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany(sql, rows)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                record("db", time.perf_counter() - t0, op="batch")
+                return
+            except sqlite3.OperationalError as e:
+                if "database is locked" in str(e).lower():
+                    inc("salesbot_sqlite_busy_retries_total", op="exec_many")
                     time.sleep(backoff)
                     backoff *= 2
                     continue
@@ -48,6 +285,11 @@ class StateStore:
         raise RuntimeError("SQLite busy, retries exceeded")
 
     def get(self, key: str) -> Optional[str]:
+        if self.write_behind:
+            with self._wb_lock:
+                item = self._pending.get(key)
+            if item is not None:
+                return item[0]
         cur = self._exec("SELECT value FROM kv WHERE key = ?", (key,))
         row = cur.fetchone()
         cur.close()
@@ -55,22 +297,141 @@ class StateStore:
 
     def set(self, key: str, value: str) -> None:
         ts = time.time()
-        self._exec("REPLACE INTO kv(key, value, ts) VALUES(?,?,?)", (key, value, ts))
+        if not self.write_behind:
+            self._exec("REPLACE INTO kv(key, value, ts) VALUES(?,?,?)", (key, value, ts)).close()
+            return
+        with self._wb_lock:
+            if key in self._pending:
+                self._wb_stats["coalesced"] += 1
+            self._pending[key] = (value, ts)
+            self._wb_stats["writes"] += 1
+            full = len(self._pending) >= self._max_pending
+            self._ensure_flusher()
+        if full:
+            self._wb_wake.set()
 
     def delete(self, key: str) -> int:
-        cur = self._exec("DELETE FROM kv WHERE key = ?", (key,))
-        n = cur.rowcount or 0
-        cur.close()
-        return n
+        if not self.write_behind:
+            cur = self._exec("DELETE FROM kv WHERE key = ?", (key,))
+            n = cur.rowcount or 0
+            cur.close()
+            return n
+        # под _flush_lock: идущий сброс не воскресит удалённый ключ
+        with self._flush_lock:
+            with self._wb_lock:
+                pending = self._pending.pop(key, None) is not None
+            cur = self._exec("DELETE FROM kv WHERE key = ?", (key,))
+            n = cur.rowcount or 0
+            cur.close()
+        return max(n, int(pending))
 
     def scan(self, prefix: str, limit: int = 100) -> List[Tuple[str,str]]:
+        self.flush()
         cur = self._exec("SELECT key, value FROM kv WHERE key LIKE ? ORDER BY key LIMIT ?", (prefix + "%", limit))
         rows = cur.fetchall()
         cur.close()
         return [(k,v) for k,v in rows]
 
+    # ---- журнал ходов (append-only) ----
+
+    def append_turn(self, key: str, item: dict) -> None:
+        self._exec("INSERT INTO turns(key, item, ts) VALUES(?,?,?)",
+                   (key, json.dumps(item, ensure_ascii=False), time.time())).close()
+
+    def turns(self, key: str, limit: Optional[int] = None) -> List[dict]:
+        # limit — последние N ходов (в хронологическом порядке)
+        if limit is None:
+            cur = self._exec("SELECT item FROM turns WHERE key = ? ORDER BY id", (key,))
+            rows = cur.fetchall()
+        else:
+            cur = self._exec("SELECT item FROM turns WHERE key = ? ORDER BY id DESC LIMIT ?", (key, int(limit)))
+            rows = cur.fetchall()[::-1]
+        cur.close()
+        return [json.loads(r[0]) for r in rows]
+
+    def count_turns(self, key: str) -> int:
+        cur = self._exec("SELECT COUNT(*) FROM turns WHERE key = ?", (key,))
+        n = cur.fetchone()[0]
+        cur.close()
+        return int(n or 0)
+
+    def clear_turns(self, key: str) -> int:
+        cur = self._exec("DELETE FROM turns WHERE key = ?", (key,))
+        n = cur.rowcount or 0
+        cur.close()
+        return n
+
+    def import_turns(self, key: str, items: List[dict]) -> None:
+        """Заменить журнал ходов ключа (перенос истории из старых JSON-блобов)."""
+        self.clear_turns(key)
+        ts = time.time()
+        self._exec_many("INSERT INTO turns(key, item, ts) VALUES(?,?,?)",
+                        [(key, json.dumps(it, ensure_ascii=False), ts) for it in (items or [])])
+
+    # ---- отложенная запись (write-behind) ----
+
+    def _ensure_flusher(self):
+        # вызывается под _wb_lock
+        if self._wb_thread is None or not self._wb_thread.is_alive():
+            self._wb_stop = False
+            self._wb_thread = threading.Thread(target=self._flush_loop, name=f"state-wb:{self.path}", daemon=True)
+            self._wb_thread.start()
+
+    def _flush_loop(self):
+        while not self._wb_stop:
+            self._wb_wake.wait(self._interval)
+            self._wb_wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(self._interval)
+        self.flush()
+
+    def flush(self) -> int:
+        """Записать буфер одной транзакцией; возвращает число строк."""
+        if not self.write_behind:
+            return 0
+        with self._flush_lock:
+            with self._wb_lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+            rows = [(k, v, ts) for k, (v, ts) in batch.items()]
+            try:
+                self._exec_many("REPLACE INTO kv(key, value, ts) VALUES(?,?,?)", rows)
+            except Exception:
+                # вернуть в буфер то, что не перезаписано новыми set()
+                with self._wb_lock:
+                    for k, item in batch.items():
+                        self._pending.setdefault(k, item)
+                raise
+            with self._wb_lock:
+                self._wb_stats["flushes"] += 1
+                self._wb_stats["flushed_rows"] += len(rows)
+            return len(rows)
+
+    def stop_write_behind(self) -> None:
+        t = self._wb_thread
+        if t is not None and t.is_alive():
+            self._wb_stop = True
+            self._wb_wake.set()
+            t.join(timeout=5)
+        self._wb_thread = None
+        self.flush()
+
+    def wb_stats(self) -> dict:
+        with self._wb_lock:
+            return {"interval_ms": self._interval * 1000, "pending": len(self._pending), **self._wb_stats}
+
     def close(self):
-        try:
-            self._conn.close()
-        except Exception:
-            pass
+        # соединения принадлежат пулу; закрываем только соединение текущего потока
+        key = (self._pool._norm(self.path), threading.get_ident())
+        with self._pool._lock:
+            item = self._pool._conns.pop(key, None)
+            if item is not None:
+                self._pool._stats["closed"] += 1
+        if item is not None:
+            try:
+                item[0].close()
+            except Exception:
+                pass
@@ -0,0 +1,2 @@
+from .sender import TelegramSender, get_sender, sender_stats, split_text, MAX_TEXT
+__all__=['TelegramSender','get_sender','sender_stats','split_text','MAX_TEXT']
@@ -0,0 +1,292 @@
+
+import os, time, heapq, itertools, threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import requests  # type: ignore
+except Exception:  # pragma: no cover
+    requests = None
+
+# Общая очередь исходящих вызовов Bot API (sendMessage, editMessageText, ...).
+#   - глобальный темп: TG_GLOBAL_RATE сообщений в секунду на токен (30 по умолчанию)
+#   - темп на чат: не чаще раза в TG_CHAT_INTERVAL сек (1.0; для групп — TG_GROUP_INTERVAL, 3.0)
+#   - 429: сообщение остаётся в голове очереди чата, повтор через parameters.retry_after;
+#     на это же время приостанавливается вся отправка по токену
+#   - сеть / 5xx: повтор с экспоненциальной паузой; прочие 4xx — сразу ошибка
+#   - текст длиннее 4096 символов режется на части (по абзацу / строке / пробелу)
+# Порядок внутри чата сохраняется: чат обслуживает не больше одного потока сразу.
+
+API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+CHAT_INTERVAL = float(os.getenv("TG_CHAT_INTERVAL", "1.0"))
+GROUP_INTERVAL = float(os.getenv("TG_GROUP_INTERVAL", "3.0"))
+SEND_WORKERS = max(1, int(os.getenv("TG_SEND_WORKERS", "4")))
+MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "5"))
+MAX_TEXT = 4096
+
+
+def split_text(text: str, limit: int = MAX_TEXT) -> List[str]:
+    """Режет текст на части <= limit, стараясь резать по \\n\\n, \\n, пробелу."""
+    text = text or ""
+    parts = []
+    while len(text) > limit:
+        cut = -1
+        for sep in ("\n\n", "\n", " "):
+            cut = text.rfind(sep, limit // 2, limit)
+            if cut > 0:
+                break
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n ") if cut < limit else text[cut:]
+    if text or not parts:
+        parts.append(text)
+    return parts
+
+
+class _Job:
+    __slots__ = ("method", "payload", "attempts", "result", "event", "callback")
+
+    def __init__(self, method: str, payload: dict, callback: Optional[Callable[[dict], Any]]):
+        self.method = method
+        self.payload = payload
+        self.attempts = 0
+        self.result: Optional[dict] = None
+        self.event = threading.Event()
+        self.callback = callback
+
+
+class TelegramSender:
+    def __init__(self, token: str, workers: int = SEND_WORKERS, global_rate: float = GLOBAL_RATE,
+                 chat_interval: float = CHAT_INTERVAL, group_interval: float = GROUP_INTERVAL,
+                 max_retries: int = MAX_RETRIES, api_url: str = API_URL, timeout: float = 10.0):
+        self.base = f"{api_url}/bot{token}"
+        self.global_gap = 1.0 / global_rate if global_rate > 0 else 0.0
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._cv = threading.Condition()
+        self._queues: Dict[Any, deque] = {}   # chat -> очередь заданий
+        self._heap: list = []                 # (когда можно, seq, chat) для чатов без потока
+        self._ready_at: Dict[Any, float] = {} # когда чату можно следующее (после опустошения очереди)
+        self._seq = itertools.count()
+        self._next_slot = 0.0                 # глобальный темп
+        self._paused_until = 0.0              # глобальная пауза после 429
+        self._local = threading.local()
+        self._stop = False
+        self._stats = {"sent": 0, "failed": 0, "retried_429": 0, "retried_error": 0, "split": 0}
+        self._in_flight = 0
+        self._threads = []
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._worker, name=f"tg-send-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    # ---- постановка в очередь ----
+
+    def call(self, method: str, payload: dict, wait: bool = True, timeout: Optional[float] = None,
+             callback: Optional[Callable[[dict], Any]] = None) -> dict:
+        """Вызов Bot API через очередь. wait=False — сразу {ok, queued}, итог в callback."""
+        job = _Job(method, payload, callback)
+        self._enqueue(payload.get("chat_id"), [job])
+        if not wait:
+            return {"ok": True, "queued": True}
+        if not job.event.wait(timeout):
+            return {"ok": False, "error": "timeout", "queued": True}
+        return job.result
+
+    def send_message(self, chat_id, text: str, parse_mode: Optional[str] = None, wait: bool = True,
+                     timeout: Optional[float] = None, callback: Optional[Callable[[dict], Any]] = None,
+                     **extra) -> dict:
+        """
+        sendMessage с разбиением длинного текста. Части уходят подряд в одном чате.
+        Итог: {ok, status, data (ответ на первую часть), parts}.
+        """
+        parts = split_text(text)
+        if len(parts) > 1:
+            with self._cv:
+                self._stats["split"] += 1
+        jobs = []
+        for p in parts:
+            payload = {"chat_id": chat_id, "text": p, **extra}
+            if parse_mode:
+                payload["parse_mode"] = parse_mode
+            jobs.append(_Job("sendMessage", payload, None))
+        done = _Joined(jobs, callback)
+        for j in jobs:
+            j.callback = done.part_done
+        self._enqueue(chat_id, jobs)
+        if not wait:
+            return {"ok": True, "queued": True, "parts": len(parts)}
+        if not done.event.wait(timeout):
+            return {"ok": False, "error": "timeout", "queued": True, "parts": len(parts)}
+        return done.result
+
+    def _enqueue(self, chat, jobs: List[_Job]) -> None:
+        with self._cv:
+            chat = str(chat)  # 123 и "123" — один чат
+            q = self._queues.get(chat)
+            if q is None:
+                q = self._queues[chat] = deque()
+                now = time.time()
+                heapq.heappush(self._heap, (max(now, self._ready_at.pop(chat, 0.0)), next(self._seq), chat))
+                self._cv.notify()
+            q.extend(jobs)
+
+    # ---- отправка ----
+
+    def _http(self):
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = requests.Session()
+        return s
+
+    def _interval(self, chat) -> float:
+        try:
+            return self.group_interval if int(chat) < 0 else self.chat_interval
+        except (TypeError, ValueError):
+            return self.chat_interval  # @channelusername
+
+    def _wait_slot(self) -> None:
+        with self._cv:
+            now = time.time()
+            slot = max(now, self._next_slot, self._paused_until)
+            self._next_slot = slot + self.global_gap
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _post(self, job: _Job):
+        """-> (результат, пауза перед повтором или None)."""
+        job.attempts += 1
+        try:
+            r = self._http().post(f"{self.base}/{job.method}", json=job.payload, timeout=self.timeout)
+        except Exception as e:
+            res = {"ok": False, "error": str(e)}
+            return res, min(2 ** job.attempts, 30)
+        try:
+            data = r.json()
+        except Exception:
+            data = {"raw": r.text}
+        res = {"ok": r.ok, "status": r.status_code, "data": data}
+        if r.status_code == 429:
+            # 429 не тратит попытки: retry_after от сервера — и есть нужная пауза
+            job.attempts -= 1
+            params = (data.get("parameters") or {}) if isinstance(data, dict) else {}
+            return res, float(params.get("retry_after") or 1)
+        if r.status_code >= 500:
+            return res, min(2 ** job.attempts, 30)
+        return res, None
+
+    def _worker(self) -> None:
+        while True:
+            with self._cv:
+                while not self._stop and (not self._heap or self._heap[0][0] > time.time()):
+                    self._cv.wait(self._heap[0][0] - time.time() if self._heap else None)
+                if self._stop:
+                    return
+                _, _, chat = heapq.heappop(self._heap)
+                job = self._queues[chat][0]
+                self._in_flight += 1
+            self._wait_slot()
+            res, retry = self._post(job)
+            finished = None
+            with self._cv:
+                self._in_flight -= 1
+                now = time.time()
+                q = self._queues[chat]
+                if retry is not None and job.attempts <= self.max_retries:
+                    ready = now + retry
+                    if res.get("status") == 429:
+                        self._stats["retried_429"] += 1
+                        self._paused_until = max(self._paused_until, ready)
+                    else:
+                        self._stats["retried_error"] += 1
+                else:
+                    q.popleft()
+                    self._stats["sent" if res.get("ok") else "failed"] += 1
+                    ready = now + self._interval(chat)
+                    finished = job
+                if q:
+                    heapq.heappush(self._heap, (ready, next(self._seq), chat))
+                else:
+                    del self._queues[chat]
+                    self._ready_at[chat] = ready
+                    if len(self._ready_at) > 10000:
+                        self._ready_at = {k: v for k, v in self._ready_at.items() if v > now}
+                self._cv.notify_all()
+            if finished is not None:
+                finished.result = res
+                finished.event.set()
+                if finished.callback is not None:
+                    try:
+                        finished.callback(res)
+                    except Exception:
+                        pass
+
+    # ---- метрики / остановка ----
+
+    def stats(self) -> dict:
+        with self._cv:
+            now = time.time()
+            return {
+                "queued": sum(len(q) for q in self._queues.values()) - self._in_flight,
+                "chats": len(self._queues),
+                "in_flight": self._in_flight,
+                "paused_for": round(max(0.0, self._paused_until - now), 3),
+                "workers": len(self._threads),
+                **self._stats,
+            }
+
+    def close(self) -> None:
+        with self._cv:
+            self._stop = True
+            self._cv.notify_all()
+
+
+class _Joined:
+    """Сборка результата частей одного длинного сообщения."""
+
+    def __init__(self, jobs: List[_Job], callback: Optional[Callable[[dict], Any]]):
+        self.jobs = jobs
+        self.left = len(jobs)
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.callback = callback
+        self.result: Optional[dict] = None
+
+    def part_done(self, _res: dict) -> None:
+        with self.lock:
+            self.left -= 1
+            if self.left:
+                return
+        first, last = self.jobs[0].result, self.jobs[-1].result
+        ok = all(j.result and j.result.get("ok") for j in self.jobs)
+        self.result = {**last, "ok": ok, "data": first.get("data"), "parts": len(self.jobs)}
+        self.event.set()
+        if self.callback is not None:
+            self.callback(self.result)
+
+
+_SENDERS: Dict[str, TelegramSender] = {}
+_LOCK = threading.Lock()
+
+
+def get_sender(token: str) -> TelegramSender:
+    """Одна очередь на токен бота на процесс."""
+    s = _SENDERS.get(token)
+    if s is None:
+        with _LOCK:
+            s = _SENDERS.get(token)
+            if s is None:
+                s = _SENDERS[token] = TelegramSender(token)
+    return s
+
+
+def sender_stats() -> dict:
+    """Глубина очередей и счётчики по всем токенам (токен не раскрывается)."""
+    out = {}
+    for token, s in list(_SENDERS.items()):
+        out[token.split(":", 1)[0] or "bot"] = s.stats()
+    return out
@@ -1,2 +1,4 @@
-from .pipeline import VoicePipeline
-__all__=['VoicePipeline']
+from .pipeline import VoicePipeline, get_pipeline, reload_pipeline, get_async_client, close_async_client
+from .cache import ResponseCache, response_cache
+from .singleflight import SingleFlight, single_flight
+__all__=['VoicePipeline','get_pipeline','reload_pipeline','get_async_client','close_async_client','ResponseCache','response_cache','SingleFlight','single_flight']
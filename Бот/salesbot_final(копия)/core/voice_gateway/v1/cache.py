@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+def _read_env(name: str, default: str) -> str:
+    return os.environ.get(name, default)
+
+
+def _norm_text(s: object) -> str:
+    return " ".join(str(s or "").split())
+
+
+def cache_key(model: str, messages: List[Dict[str, str]], temperature: Optional[float] = None) -> str:
+    """
+    Контентный ключ запроса: модель + температура + нормализованные сообщения
+    (роль и текст без лишних пробелов).
+    """
+    body = {
+        "model": model,
+        "temperature": temperature,
+        "messages": [[m.get("role", "user"), _norm_text(m.get("content"))] for m in messages],
+    }
+    raw = json.dumps(body, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Кэш ответов LLM для детерминированных промптов.
+      - память: LRU (OrderedDict) с TTL
+      - SQLite: таблица kv в salesbot.db (ключи llm_cache:<sha256>), тоже с TTL и лимитом
+    Включается на вызове: llm.chat(messages, cache=True).
+    """
+
+    PREFIX = "llm_cache:"
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_items: Optional[int] = None,
+        db_path: Optional[str] = None,
+    ) -> None:
+        self.ttl = float(ttl if ttl is not None else _read_env("LLM_CACHE_TTL", "3600"))
+        self.max_items = int(max_items if max_items is not None else _read_env("LLM_CACHE_SIZE", "1024"))
+        if db_path is None:
+            db_path = _read_env("LLM_CACHE_DB", "salesbot.db")
+        self.db_path = db_path or None
+        self._mem: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    # ---- SQLite tier ----
+
+    def _store(self):
+        if not self.db_path:
+            return None
+        try:
+            from core.state.v1 import get_store
+            return get_store(self.db_path)
+        except Exception:
+            return None
+
+    def _db_get(self, key: str) -> Optional[Tuple[str, float]]:
+        st = self._store()
+        if st is None:
+            return None
+        try:
+            raw = st.get(self.PREFIX + key)
+            if not raw:
+                return None
+            d = json.loads(raw)
+            return d["v"], float(d["exp"])
+        except Exception:
+            return None
+
+    def _db_put(self, key: str, value: str, exp: float) -> None:
+        st = self._store()
+        if st is None:
+            return
+        try:
+            st.set(self.PREFIX + key, json.dumps({"v": value, "exp": exp}, ensure_ascii=False))
+        except Exception:
+            pass
+
+    def _db_prune(self) -> None:
+        st = self._store()
+        if st is None:
+            return
+        try:
+            # оставляем max_items самых свежих записей кэша
+            cur = st._exec(
+                "DELETE FROM kv WHERE key LIKE ? AND key NOT IN "
+                "(SELECT key FROM kv WHERE key LIKE ? ORDER BY ts DESC LIMIT ?)",
+                (self.PREFIX + "%", self.PREFIX + "%", self.max_items),
+            )
+            cur.close()
+        except Exception:
+            pass
+
+    # ---- public ----
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                if item[1] > now:
+                    self._mem.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return item[0]
+                del self._mem[key]
+        item = self._db_get(key)
+        if item is not None and item[1] > now:
+            with self._lock:
+                self._mem_put(key, item[0], item[1])
+                self._stats["hits"] += 1
+                self._stats["db_hits"] += 1
+            return item[0]
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def _mem_put(self, key: str, value: str, exp: float) -> None:
+        self._mem[key] = (value, exp)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def put(self, key: str, value: str) -> None:
+        exp = time.time() + self.ttl
+        with self._lock:
+            self._mem_put(key, value, exp)
+            self._stats["stores"] += 1
+            prune = self._stats["stores"] % 100 == 0
+        self._db_put(key, value, exp)
+        if prune:
+            self._db_prune()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+        st = self._store()
+        if st is not None:
+            try:
+                st._exec("DELETE FROM kv WHERE key LIKE ?", (self.PREFIX + "%",)).close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "size": len(self._mem),
+                "max_items": self.max_items,
+                "ttl": self.ttl,
+                "sqlite": bool(self.db_path),
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                **self._stats,
+            }
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def response_cache() -> ResponseCache:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = ResponseCache()
+    return _CACHE
@@ -1,6 +1,9 @@
 import os
+import json
 import time
-from typing import List, Dict, Optional
+import asyncio
+import threading
+from typing import AsyncIterator, List, Dict, Optional
 
 # Попробуем взять HTTP-клиент из integrations.patch_v4 / patch_v3
 _HTTP_CLIENT = None
@@ -14,12 +17,22 @@ except Exception:
     except Exception:
         _HTTP_CLIENT = None
 
+from .cache import cache_key, response_cache
+from .singleflight import single_flight
+from core.metrics.v1 import timer, record, inc
+
 # Фоллбек на requests (если есть)
 try:
     import requests  # type: ignore
 except Exception:
     requests = None  # type: ignore
 
+# Асинхронный клиент (httpx) для async-хэндлеров FastAPI
+try:
+    import httpx  # type: ignore
+except Exception:
+    httpx = None  # type: ignore
+
 
 def _read_env(name: str, default: Optional[str] = None) -> Optional[str]:
     return os.environ.get(name, default)
@@ -63,6 +76,79 @@ def _normalize_messages_for_deepseek(
     return normalized
 
 
+# ---- Общий пул HTTP-соединений (httpx.AsyncClient) ----
+
+_ASYNC_CLIENT = None
+
+
+def get_async_client():
+    """
+    Долгоживущий httpx.AsyncClient с пулом keep-alive соединений.
+    Один на процесс: все движки и роуты переиспользуют TCP/TLS-сессии.
+    """
+    global _ASYNC_CLIENT
+    if httpx is None:
+        return None
+    if _ASYNC_CLIENT is None or _ASYNC_CLIENT.is_closed:
+        limits = httpx.Limits(
+            max_connections=int(_read_env("HTTP_POOL_SIZE", "20")),
+            max_keepalive_connections=int(_read_env("HTTP_POOL_KEEPALIVE", "10")),
+        )
+        _ASYNC_CLIENT = httpx.AsyncClient(
+            timeout=float(_read_env("HTTP_TIMEOUT", "15")),
+            limits=limits,
+        )
+    return _ASYNC_CLIENT
+
+
+async def close_async_client() -> None:
+    """Закрыть общий AsyncClient (вызывается при shutdown приложения)."""
+    global _ASYNC_CLIENT
+    client, _ASYNC_CLIENT = _ASYNC_CLIENT, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def _extract_content(data: object) -> Optional[str]:
+    if isinstance(data, dict):
+        # Вариант { "output": "..." }
+        if "output" in data and isinstance(data["output"], str):
+            return data["output"]
+
+        # Вариант OpenAI-стиля с choices
+        if "choices" in data and data["choices"]:
+            ch = data["choices"][0]
+            msg = (ch.get("message") or {}).get("content")
+            if isinstance(msg, str):
+                return msg
+    return None
+
+
+_SSE_DONE = object()
+
+
+def _sse_delta(line: str):
+    """
+    Разбор строки SSE-потока DeepSeek/OpenAI:
+      data: {"choices":[{"delta":{"content":"..."}}]}
+      data: [DONE]
+    Возвращает кусок текста, _SSE_DONE или None.
+    """
+    line = (line or "").strip()
+    if not line.startswith("data:"):
+        return None
+    body = line[5:].strip()
+    if body == "[DONE]":
+        return _SSE_DONE
+    try:
+        data = json.loads(body)
+        ch = (data.get("choices") or [{}])[0]
+        delta = (ch.get("delta") or {}).get("content")
+        return delta if isinstance(delta, str) else None
+    except Exception:
+        return None
+
+
 class _LLMClient:
     """
     Обёртка над DeepSeek (или совместимым сервисом).
@@ -91,26 +177,39 @@ class _LLMClient:
         self.timeout = float(_read_env("HTTP_TIMEOUT", "15"))
         self.retries = int(_read_env("HTTP_RETRIES", "2"))
         self.model = _read_env("DEEPSEEK_MODEL", "deepseek-chat")
+        # одинаковые одновременные запросы идут в апстрим один раз
+        self.coalesce = (_read_env("LLM_SINGLEFLIGHT", "1") or "").lower() not in ("0", "false", "no", "off")
 
-    def chat(self, messages: List[Dict[str, str]]) -> str:
-        # Если ключа нет или вообще нет HTTP-клиента — локальный коуч-ответ
-        if not self.api_key or (_HTTP_CLIENT is None and requests is None):
-            return self._local_echo(messages)
-
-        safe_messages = _normalize_messages_for_deepseek(messages)
-
+    def _request(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+    ):
         payload: Dict[str, object] = {
             "model": self.model,
-            "messages": safe_messages,
+            "messages": _normalize_messages_for_deepseek(messages),
         }
+        if temperature is not None:
+            payload["temperature"] = temperature
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+        return payload, headers
 
+    def _cache_key(self, payload: Dict[str, object]) -> str:
+        return cache_key(
+            self.model,
+            payload["messages"],  # type: ignore[arg-type]
+            payload.get("temperature"),  # type: ignore[arg-type]
+        )
+
+    def _post(self, payload, headers):
         last_err: Optional[str] = None
 
-        for _ in range(max(1, self.retries)):
+        for attempt in range(max(1, self.retries)):
+            if attempt:
+                inc("salesbot_llm_retries_total", mode="sync")
             try:
                 # Вариант через integrations.patch_*
                 if _HTTP_CLIENT is not None:
@@ -133,25 +232,175 @@ class _LLMClient:
                     )
                     data = r.json()
 
-                if isinstance(data, dict):
-                    # Вариант { "output": "..." }
-                    if "output" in data and isinstance(data["output"], str):
-                        return data["output"]
-
-                    # Вариант OpenAI-стиля с choices
-                    if "choices" in data and data["choices"]:
-                        ch = data["choices"][0]
-                        msg = (ch.get("message") or {}).get("content")
-                        if isinstance(msg, str):
-                            return msg
+                content = _extract_content(data)
+                if content is not None:
+                    return content, None
 
                 last_err = f"unexpected response: {str(data)[:200]}"
             except Exception as e:  # noqa: BLE001
                 last_err = str(e)
                 time.sleep(0.25)
 
-        # Если всё упало — аккуратно деградируем
-        return self._local_echo(messages, error=last_err)
+        return None, last_err
+
+    async def _apost(self, client, payload, headers):
+        last_err: Optional[str] = None
+
+        for attempt in range(max(1, self.retries)):
+            if attempt:
+                inc("salesbot_llm_retries_total", mode="async")
+            try:
+                r = await client.post(
+                    self.api_url,
+                    json=payload,
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+                r.raise_for_status()
+                data = r.json()
+
+                content = _extract_content(data)
+                if content is not None:
+                    return content, None
+
+                last_err = f"unexpected response: {str(data)[:200]}"
+            except Exception as e:  # noqa: BLE001
+                last_err = str(e)
+                await asyncio.sleep(0.25)
+
+        return None, last_err
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        cache: bool = False,
+        temperature: Optional[float] = None,
+    ) -> str:
+        """
+        cache=True — для детерминированных промптов: ответ берётся из
+        response_cache() (память + SQLite), фоллбек-ответы не кэшируются.
+        """
+        # Если ключа нет или вообще нет HTTP-клиента — локальный коуч-ответ
+        if not self.api_key or (_HTTP_CLIENT is None and requests is None):
+            return self._local_echo(messages)
+
+        payload, headers = self._request(messages, temperature)
+
+        key = self._cache_key(payload) if (cache or self.coalesce) else None
+        if cache:
+            hit = response_cache().get(key)
+            if hit is not None:
+                return hit
+
+        with timer("llm", op="chat"):
+            if self.coalesce:
+                content, last_err = single_flight().do(key, lambda: self._post(payload, headers))
+            else:
+                content, last_err = self._post(payload, headers)
+        if content is None:
+            # Если всё упало — аккуратно деградируем
+            return self._local_echo(messages, error=last_err)
+
+        if cache:
+            response_cache().put(key, content)
+        return content
+
+    async def achat(
+        self,
+        messages: List[Dict[str, str]],
+        cache: bool = False,
+        temperature: Optional[float] = None,
+    ) -> str:
+        """
+        Асинхронный вариант chat(): не блокирует event loop и
+        использует общий пул соединений get_async_client().
+        """
+        if not self.api_key:
+            return self._local_echo(messages)
+
+        client = get_async_client()
+        if client is None:
+            # httpx нет — уводим синхронный вызов в поток
+            return await asyncio.to_thread(self.chat, messages, cache, temperature)
+
+        payload, headers = self._request(messages, temperature)
+
+        key = self._cache_key(payload) if (cache or self.coalesce) else None
+        if cache:
+            hit = response_cache().get(key)
+            if hit is not None:
+                return hit
+
+        with timer("llm", op="achat"):
+            if self.coalesce:
+                content, last_err = await single_flight().ado(
+                    key, lambda: self._apost(client, payload, headers)
+                )
+            else:
+                content, last_err = await self._apost(client, payload, headers)
+        if content is None:
+            return self._local_echo(messages, error=last_err)
+
+        if cache:
+            response_cache().put(key, content)
+        return content
+
+    async def astream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Потоковый ответ (stream=True): отдаёт куски текста по мере генерации.
+        Без ключа / при ошибке до первого куска — один кусок с локальным ответом.
+        """
+        if not self.api_key:
+            yield self._local_echo(messages)
+            return
+
+        client = get_async_client()
+        if client is None:
+            yield await asyncio.to_thread(self.chat, messages, False, temperature)
+            return
+
+        payload, headers = self._request(messages, temperature)
+        payload["stream"] = True
+
+        sent = False
+        err: Optional[str] = None
+        t0 = time.perf_counter()
+        try:
+            async with client.stream(
+                "POST",
+                self.api_url,
+                json=payload,
+                headers=headers,
+                timeout=self.timeout,
+            ) as r:
+                r.raise_for_status()
+                ctype = (r.headers.get("content-type") or "").lower()
+                if "event-stream" not in ctype:
+                    # сервис проигнорировал stream — обычный JSON целиком
+                    content = _extract_content(json.loads(await r.aread()))
+                    if content is not None:
+                        sent = True
+                        yield content
+                else:
+                    async for line in r.aiter_lines():
+                        delta = _sse_delta(line)
+                        if delta is _SSE_DONE:
+                            break
+                        if delta:
+                            sent = True
+                            yield delta
+        except Exception as e:  # noqa: BLE001
+            err = str(e)
+        finally:
+            # время всего потока (вместе с чтением кусков клиентом)
+            record("llm", time.perf_counter() - t0, op="stream")
+
+        if not sent:
+            yield self._local_echo(messages, error=err or "empty stream")
 
     def _local_echo(
         self,
@@ -162,6 +411,7 @@ class _LLMClient:
         Локальный коуч, когда нет сети / ключа / API.
         Даёт мягкий совет по последнему сообщению.
         """
+        inc("salesbot_llm_fallbacks_total", reason="error" if error else "no_key")
         text = ""
         for m in reversed(messages):
             if m.get("role") in ("user", "assistant"):
@@ -225,4 +475,31 @@ class VoicePipeline:
     def __init__(self) -> None:
         self.llm = _LLMClient()
         self.asr = _ASRStub()
-        self.tts = _TTSStub()
\ No newline at end of file
+        self.tts = _TTSStub()
+
+
+# ---- Общий пайплайн процесса ----
+
+_PIPELINE: Optional[VoicePipeline] = None
+_PIPELINE_LOCK = threading.Lock()
+
+
+def get_pipeline() -> VoicePipeline:
+    """
+    Лениво созданный VoicePipeline, общий для всего процесса.
+    ENV читается один раз; для применения новых настроек — reload_pipeline().
+    """
+    global _PIPELINE
+    if _PIPELINE is None:
+        with _PIPELINE_LOCK:
+            if _PIPELINE is None:
+                _PIPELINE = VoicePipeline()
+    return _PIPELINE
+
+
+def reload_pipeline() -> VoicePipeline:
+    """Пересоздать общий пайплайн (перечитать ENV: ключ, модель, таймауты)."""
+    global _PIPELINE
+    with _PIPELINE_LOCK:
+        _PIPELINE = VoicePipeline()
+    return _PIPELINE
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Склейка одинаковых запросов «в полёте».
+    Пока идёт вызов с ключом key, остальные вызовы с тем же ключом
+    не идут в апстрим, а ждут и получают тот же результат.
+      - do(key, fn)          — для синхронного кода (потоки)
+      - await ado(key, fn)   — для async-кода (fn — фабрика корутины)
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[Tuple[int, str], "asyncio.Future[Any]"] = {}
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["calls"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:  # noqa: BLE001
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        k = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(k)
+            if task is None:
+                # апстрим-вызов живёт отдельной задачей: отмена одного
+                # ожидающего не обрывает запрос для остальных
+                task = asyncio.ensure_future(fn())
+                self._tasks[k] = task
+                self._stats["calls"] += 1
+                task.add_done_callback(lambda _t: self._forget(k, _t))
+            else:
+                self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, k: Tuple[int, str], task: "asyncio.Future[Any]") -> None:
+        with self._lock:
+            if self._tasks.get(k) is task:
+                del self._tasks[k]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls) + len(self._tasks),
+                **self._stats,
+            }
+
+
+_FLIGHT = SingleFlight()
+
+
+def single_flight() -> SingleFlight:
+    return _FLIGHT
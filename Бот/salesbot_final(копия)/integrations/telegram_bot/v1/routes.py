@@ -2,9 +2,9 @@ from fastapi import APIRouter, Request
 from typing import Any, Dict
 
 import os
-import requests
 
-from core.voice_gateway.v1 import VoicePipeline
+from core.telegram.v1 import get_sender
+from core.voice_gateway.v1 import get_pipeline
 
 router = APIRouter(
     prefix="/telegram_bot/v1",
@@ -28,23 +28,13 @@ def _get_token() -> str:
     return token
 
 
-def _send_message(chat_id: int, text: str) -> Dict[str, Any]:
+def _send_message(chat_id: int, text: str, wait: bool = True) -> Dict[str, Any]:
     """
-    Отправка сообщения в Telegram.
+    Отправка сообщения в Telegram через общую очередь (темп, 429, длинные тексты).
+    wait=False — не ждать отправки, сразу {ok, queued}.
     """
     token = _get_token()
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": text,
-        "parse_mode": "HTML",
-    }
-    r = requests.post(url, json=payload, timeout=10)
-    try:
-        data = r.json()
-    except Exception:
-        data = {"raw": r.text}
-    return {"ok": r.ok, "status": r.status_code, "data": data}
+    return get_sender(token).send_message(chat_id, text, parse_mode="HTML", wait=wait)
 
 
 @router.get("/health")
@@ -85,7 +75,7 @@ async def telegram_webhook(update: Dict[str, Any]):
 
     # 2) Любой другой текст — отправляем в DeepSeek через VoicePipeline
     else:
-        vp = VoicePipeline()
+        vp = get_pipeline()
         system_prompt = (
             "Ты тёплый, живой ассистент проекта «На Счастье».\n"
             "Отвечай коротко, по-человечески, без канцелярита, в тоне заботливого менеджера,\n"
@@ -93,7 +83,7 @@ async def telegram_webhook(update: Dict[str, Any]):
             "Задавай уточняющие вопросы по истории, эмоциям, поводу, но не дави на оплату."
         )
         try:
-            reply_text = vp.llm.chat(
+            reply_text = await vp.llm.achat(
                 [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": text},
@@ -108,7 +98,8 @@ async def telegram_webhook(update: Dict[str, Any]):
 
     # --- Отправляем ответ пользователю ---
     try:
-        send_result = _send_message(chat_id, reply_text)
+        # ответ уходит в очередь: вебхук не ждёт темпа Telegram
+        send_result = _send_message(chat_id, reply_text, wait=False)
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
@@ -1,10 +1,9 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import json
 import os
 
-from .service import config, subscribers, update_subscribers, send_push, LOG
+from .service import config, subscribers, subscribe as subscribe_manager, unsubscribe as unsubscribe_manager, send_push, broadcast as broadcast_push, broadcast_status, queue_stats, read_log, log_stats
 
 
 router = APIRouter(
@@ -20,6 +19,19 @@ class SubscribeBody(BaseModel):
     channels: list[str] | None = None
 
 
+class UnsubscribeBody(BaseModel):
+    manager_id: str
+    channels: list[str] | None = None
+
+
+class BroadcastBody(BaseModel):
+    channel: str = "kpi"
+    template: str = "kpi.percent_up"
+    payload: dict | None = None
+    payloads: dict[str, dict] | None = None
+    manager_ids: list[str] | None = None
+
+
 class SendBody(BaseModel):
     manager_id: str
     channel: str = "training"
@@ -83,6 +95,12 @@ async def dev_me():
     }
 
 
+@router.get("/queue")
+async def queue():
+    # глубина общей очереди исходящих и счётчики (sent / failed / retried_429 ...)
+    return {"ok": True, "senders": queue_stats()}
+
+
 @router.get("/subscribers")
 async def get_subs():
     return subscribers()
@@ -102,15 +120,17 @@ async def subscribe(body: SubscribeBody):
             status_code=400,
         )
 
-    m = subscribers()
-    m[manager_id] = {
-        "chat_id": chat_id,
-        "channels": channels,
-    }
-    update_subscribers(m)
+    subscribe_manager(manager_id, chat_id, channels)
     return {"ok": True, "manager_id": manager_id}
 
 
+@router.post("/unsubscribe")
+async def unsubscribe(body: UnsubscribeBody):
+    if not unsubscribe_manager(body.manager_id, body.channels):
+        return JSONResponse({"ok": False, "error": "not_subscribed"}, status_code=404)
+    return {"ok": True, "manager_id": body.manager_id}
+
+
 @router.post("/send")
 async def send(body: SendBody):
     return send_push(
@@ -121,21 +141,44 @@ async def send(body: SendBody):
     )
 
 
+@router.post("/broadcast")
+async def broadcast(body: BroadcastBody):
+    # всем подписчикам канала; доставка в фоне, статус — GET /broadcast/{broadcast_id}
+    return broadcast_push(
+        body.channel,
+        body.template,
+        body.payload or {},
+        body.payloads,
+        body.manager_ids,
+    )
+
+
+@router.get("/broadcast/{broadcast_id}")
+async def broadcast_get(broadcast_id: str):
+    st = broadcast_status(broadcast_id)
+    if st is None:
+        return JSONResponse({"ok": False, "error": "not_found"}, status_code=404)
+    return {"ok": True, **st}
+
+
 @router.get("/log")
-async def log():
+async def log(
+    manager_id: str | None = None,
+    channel: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
+    before: str | None = None,
+):
+    # хвост журнала читается с конца файла; фильтры — по индексу смещений
     try:
-        lines = (
-            open(LOG, "r", encoding="utf-8")
-            .read()
-            .strip()
-            .splitlines()[-200:]
-        )
-        return {
-            "ok": True,
-            "items": [json.loads(x) for x in lines if x.strip()],
-        }
-    except Exception:
-        return {"ok": True, "items": []}
+        res = read_log(manager_id, channel, limit, before)
+    except ValueError:
+        return JSONResponse({"ok": False, "error": "bad_cursor"}, status_code=400)
+    return {"ok": True, **res}
+
+
+@router.get("/log/stats")
+async def log_stats_route():
+    return {"ok": True, **log_stats()}
 
 
 # ---------- События (event-хуки) ----------
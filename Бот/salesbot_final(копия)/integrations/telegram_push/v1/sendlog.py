@@ -0,0 +1,314 @@
+
+import os, json, time, hashlib, threading
+from array import array
+from typing import List, Dict, Any, Optional, Tuple
+
+# Журнал отправок telegram_push: JSONL-сегменты с ротацией и индексом смещений.
+#   send_log.jsonl                    — текущий сегмент (в него дописываем)
+#   send_log.YYYYMMDD-HHMMSS-NNN.jsonl — закрытые сегменты, хранятся последние keep
+#   <сегмент>.idx.json                — индекс закрытого сегмента (строится один раз)
+# Ротация — по размеру (TP_LOG_MAX_BYTES) и/или по смене дня (TP_LOG_DAILY=1).
+# tail(n) читает блоки с конца файла; query() идёт по индексу manager_id / channel
+# и читает с диска только нужные строки. Курсор страниц — «id сегмента:смещение»,
+# id — хэш первой строки сегмента: при ротации файл переименовывается, id не меняется.
+
+MAX_BYTES = int(os.getenv("TP_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+KEEP = int(os.getenv("TP_LOG_KEEP", "20"))
+DAILY = os.getenv("TP_LOG_DAILY", "0").lower() in ("1", "true", "yes", "on")
+_BLOCK = 64 * 1024
+
+
+class _SegIndex:
+    """Смещения строк сегмента: все подряд и по manager_id / channel."""
+    __slots__ = ("sid", "size", "offs", "by_mgr", "by_ch")
+
+    def __init__(self):
+        self.sid = ""
+        self.size = 0
+        self.offs = array("q")
+        self.by_mgr: Dict[str, array] = {}
+        self.by_ch: Dict[str, array] = {}
+
+    def extend(self, path: str) -> None:
+        # дочитываем только то, что дописано после прошлого раза
+        with open(path, "rb") as f:
+            f.seek(self.size)
+            pos = self.size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # строка ещё дописывается
+                if pos == 0:
+                    self.sid = _line_id(line)
+                try:
+                    e = json.loads(line)
+                except Exception:
+                    e = None
+                if isinstance(e, dict):
+                    self.offs.append(pos)
+                    self.by_mgr.setdefault(str(e.get("manager_id")), array("q")).append(pos)
+                    self.by_ch.setdefault(str(e.get("channel")), array("q")).append(pos)
+                pos += len(line)
+            self.size = pos
+
+    def to_json(self) -> dict:
+        return {"sid": self.sid, "size": self.size, "offs": self.offs.tolist(),
+                "mgr": {k: v.tolist() for k, v in self.by_mgr.items()},
+                "ch": {k: v.tolist() for k, v in self.by_ch.items()}}
+
+    @classmethod
+    def from_json(cls, d: dict) -> "_SegIndex":
+        ix = cls()
+        ix.sid = d["sid"]
+        ix.size = int(d["size"])
+        ix.offs = array("q", d["offs"])
+        ix.by_mgr = {k: array("q", v) for k, v in d["mgr"].items()}
+        ix.by_ch = {k: array("q", v) for k, v in d["ch"].items()}
+        return ix
+
+    def candidates(self, manager_id: Optional[str], channel: Optional[str]) -> List[int]:
+        if manager_id is None and channel is None:
+            return self.offs
+        sets = []
+        if manager_id is not None:
+            sets.append(self.by_mgr.get(str(manager_id), ()))
+        if channel is not None:
+            sets.append(self.by_ch.get(str(channel), ()))
+        if len(sets) == 1:
+            return sets[0]
+        other = set(sets[1])
+        return [o for o in sets[0] if o in other]
+
+
+class SendLog:
+    def __init__(self, path: str, max_bytes: int = MAX_BYTES, keep: int = KEEP, daily: bool = DAILY):
+        self.path = path
+        self.dir = os.path.dirname(path)
+        self.stem = os.path.basename(path)[:-len(".jsonl")]
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.daily = daily
+        self._lock = threading.Lock()
+        self._index: Dict[str, _SegIndex] = {}
+
+    # ---- запись / ротация ----
+
+    def append(self, entries: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).encode("utf-8")
+        with self._lock:
+            self._maybe_rotate()
+            with open(self.path, "ab") as f:
+                f.write(data)
+
+    def _maybe_rotate(self) -> None:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        if st.st_size == 0:
+            return
+        new_day = self.daily and time.strftime("%Y%m%d", time.localtime(st.st_mtime)) != time.strftime("%Y%m%d")
+        if st.st_size < self.max_bytes and not new_day:
+            return
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(st.st_mtime))
+        # имена сортируются хронологически (и после ротаций в одну секунду)
+        n = 0
+        dst = os.path.join(self.dir, f"{self.stem}.{stamp}-{n:03d}.jsonl")
+        while os.path.exists(dst):
+            n += 1
+            dst = os.path.join(self.dir, f"{self.stem}.{stamp}-{n:03d}.jsonl")
+        os.replace(self.path, dst)
+        ix = self._index.pop(self.path, None)
+        if ix is not None:
+            self._index[dst] = ix
+        for old in self.sealed()[:-self.keep] if self.keep > 0 else []:
+            for p in (old, old + ".idx.json"):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            self._index.pop(old, None)
+
+    # ---- сегменты / индекс ----
+
+    def sealed(self) -> List[str]:
+        """Закрытые сегменты, старые сначала."""
+        pre, cur = self.stem + ".", os.path.basename(self.path)
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return []
+        return [os.path.join(self.dir, n) for n in sorted(names)
+                if n.startswith(pre) and n.endswith(".jsonl") and n != cur]
+
+    def segments(self) -> List[str]:
+        return self.sealed() + ([self.path] if os.path.exists(self.path) else [])
+
+    def _seg_index(self, path: str) -> Optional[_SegIndex]:
+        """Индекс сегмента; None — сегмент успели удалить (ротация / keep)."""
+        with self._lock:
+            ix = self._index.get(path)
+            sealed = path != self.path
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                self._index.pop(path, None)
+                return None
+            if ix is not None and ix.size > size:
+                ix = None  # файл подменили / обрезали
+            if ix is None and sealed:
+                try:
+                    with open(path + ".idx.json", "r", encoding="utf-8") as f:
+                        ix = _SegIndex.from_json(json.load(f))
+                    if ix.size != size:
+                        ix = None
+                except Exception:
+                    ix = None
+            if ix is None:
+                ix = _SegIndex()
+            if ix.size < size:
+                try:
+                    ix.extend(path)
+                except FileNotFoundError:
+                    self._index.pop(path, None)
+                    return None
+                if sealed:
+                    try:
+                        with open(path + ".idx.json", "w", encoding="utf-8") as f:
+                            json.dump(ix.to_json(), f)
+                    except OSError:
+                        pass
+            self._index[path] = ix
+            return ix
+
+    # ---- чтение ----
+
+    def tail(self, n: int = 200) -> List[Dict[str, Any]]:
+        """Последние n записей (старые сначала); читаются только хвосты файлов."""
+        out: List[Dict[str, Any]] = []
+        for seg in reversed(self.segments()):
+            if len(out) >= n:
+                break
+            out = _tail_lines(seg, n - len(out)) + out
+        return out
+
+    def query(self, manager_id: Optional[str] = None, channel: Optional[str] = None,
+              limit: int = 200, before: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Записи с фильтром, от новых к старым страницами по limit.
+        before — курсор «id сегмента:смещение» из прошлой страницы; переживает ротацию.
+        ValueError — курсор не разобрать или его сегмент уже удалён.
+        -> (записи в хронологическом порядке, курсор на более старые или None)
+        """
+        cur_sid, cur_off = None, None
+        if before:
+            cur_sid, _, off = before.rpartition(":")
+            cur_off = int(off)
+            if not cur_sid:
+                raise ValueError("bad_cursor")
+        picked: List[Tuple[str, int, str]] = []
+        more = False
+        found = cur_sid is None
+        segs = self.segments()
+        for seg in reversed(segs):
+            ix = self._seg_index(seg)
+            if ix is None:
+                continue
+            if not found:
+                if ix.sid != cur_sid:
+                    continue  # новее курсора
+                found = True
+                cand = ix.candidates(manager_id, channel)
+                i = _bisect_left(cand, cur_off)
+            else:
+                cand = ix.candidates(manager_id, channel)
+                i = len(cand)
+            while i > 0 and len(picked) < limit:
+                i -= 1
+                picked.append((seg, cand[i], ix.sid))
+            if len(picked) >= limit:
+                more = i > 0 or seg != segs[0]
+                break
+        if not found:
+            raise ValueError("bad_cursor")
+        items = self._read_picked(reversed(picked))
+        nxt = None
+        if more and picked:
+            _, off, sid = picked[-1]
+            nxt = f"{sid}:{off}"
+        return items, nxt
+
+    def _read_picked(self, picked) -> List[Dict[str, Any]]:
+        # под замком: ротация не переименует сегмент посреди чтения; путь берём заново
+        # по sid — между выбором смещений и чтением сегмент мог уйти в архив
+        items = []
+        with self._lock:
+            paths = {ix.sid: path for path, ix in self._index.items()}
+            for seg, off, sid in picked:
+                e = _read_at(paths.get(sid, seg), off)
+                if e is not None:
+                    items.append(e)
+        return items
+
+    def stats(self) -> Dict[str, Any]:
+        segs = self.segments()
+        return {"segments": len(segs), "bytes": sum(_size(s) for s in segs),
+                "indexed": len(self._index), "max_bytes": self.max_bytes, "keep": self.keep, "daily": self.daily}
+
+
+def _line_id(line: bytes) -> str:
+    return hashlib.sha1(line).hexdigest()[:16]
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _bisect_left(a, x) -> int:
+    lo, hi = 0, len(a)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if a[mid] < x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _read_at(path: str, off: int) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "rb") as f:
+            f.seek(off)
+            return json.loads(f.readline())
+    except Exception:
+        return None
+
+
+def _tail_lines(path: str, n: int) -> List[Dict[str, Any]]:
+    # читаем блоки с конца, пока не наберём n полных строк
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return []
+    with f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > 0 and buf.count(b"\n") <= n:
+            step = min(_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    lines = buf.split(b"\n")
+    if pos > 0:
+        lines = lines[1:]  # первая строка блока может быть обрезана
+    out = []
+    for line in lines:
+        if line.strip():
+            try:
+                out.append(json.loads(line))
+            except Exception:
+                pass
+    return out[-n:] if n > 0 else []
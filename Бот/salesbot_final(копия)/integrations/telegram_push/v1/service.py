@@ -1,6 +1,11 @@
 
-import os, json, time
+import os, json, time, uuid, threading
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
+from core.resources.v1 import load_json
+from core.telegram.v1 import get_sender, sender_stats
+from .store import SubscriberStore
+from .sendlog import SendLog
 
 BASE = os.path.dirname(__file__)
 CFG = os.path.join(BASE, "data", "config.json")
@@ -8,27 +13,51 @@ SUB = os.path.join(BASE, "data", "subscribers.json")
 FMT = os.path.join(BASE, "data", "push_formats.json")
 LOG = os.path.join(BASE, "data", "send_log.jsonl")
 
+_STORE = None
+_SLOCK = threading.Lock()
+_LOG = SendLog(LOG)
+# последние рассылки: broadcast_id -> статус по получателям (в памяти процесса)
+_BROADCASTS: "OrderedDict[str, dict]" = OrderedDict()
+_BROADCASTS_KEEP = 100
+_BLOCK = threading.Lock()
+
 def _load(path: str, default):
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            if path.endswith(".jsonl"):
-                return []
-            return json.load(f)
-    except Exception:
-        return default
+    # кэш с проверкой mtime; объект только для чтения
+    return load_json(path, default)
 
-def _save(path: str, data):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def _store() -> SubscriberStore:
+    # при первом обращении — разовый перенос subscribers.json в SQLite
+    # (под локом: параллельные первые запросы не мигрируют дважды)
+    global _STORE
+    if _STORE is None:
+        with _SLOCK:
+            if _STORE is None:
+                st = SubscriberStore(os.environ.get("TELEGRAM_PUSH_DB", "salesbot.db"))
+                st.migrate_file(SUB)
+                _STORE = st
+    return _STORE
 
 def config()->Dict[str, Any]:
     return _load(CFG, {"enabled": False, "mock_mode": True, "bot_token_env": "TELEGRAM_BOT_TOKEN"})
 
 def subscribers()->Dict[str, Any]:
-    return _load(SUB, {})
+    return _store().all()
+
+def subscriber(manager_id: str)->Optional[Dict[str, Any]]:
+    return _store().get(manager_id)
+
+def subscribe(manager_id: str, chat_id, channels: List[str])->Dict[str, Any]:
+    return _store().subscribe(manager_id, chat_id, channels)
+
+def unsubscribe(manager_id: str, channels: Optional[List[str]] = None)->bool:
+    return _store().unsubscribe(manager_id, channels)
 
 def update_subscribers(m: Dict[str, Any]):
-    _save(SUB, m)
+    # полная замена; для одного менеджера — subscribe()
+    _store().replace_all(m)
+
+def channel_counts()->Dict[str, int]:
+    return _store().counts()
 
 def _render(template: str, payload: Dict[str, Any])->str:
     out = template
@@ -38,14 +67,30 @@ def _render(template: str, payload: Dict[str, Any])->str:
 
 def _append_log(entry: Dict[str, Any]):
     # append as JSONL
-    with open(LOG, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False)+"\n")
+    _append_logs([entry])
 
-def send_push(manager_id: str, channel: str, template_key: str, payload: Dict[str, Any])->Dict[str, Any]:
+def _append_logs(entries: List[Dict[str, Any]]):
+    # пачка строк — одна запись; ротация сегментов внутри SendLog
+    _LOG.append(entries)
+
+def read_log(manager_id: Optional[str] = None, channel: Optional[str] = None,
+             limit: int = 200, before: Optional[str] = None) -> Dict[str, Any]:
+    """Последние записи журнала; с фильтром — по индексу, курсор next — на более старые."""
+    if manager_id is None and channel is None and before is None:
+        return {"items": _LOG.tail(limit), "next": None}
+    items, nxt = _LOG.query(manager_id, channel, limit, before)
+    return {"items": items, "next": nxt}
+
+def log_stats() -> Dict[str, Any]:
+    return _LOG.stats()
+
+def _token(cfg: Dict[str, Any])->Optional[str]:
+    return os.environ.get(cfg.get("bot_token_env","TELEGRAM_BOT_TOKEN"))
+
+def send_push(manager_id: str, channel: str, template_key: str, payload: Dict[str, Any], wait: bool = False)->Dict[str, Any]:
     cfg = config()
-    subs = subscribers()
     fmt = _load(FMT, {})
-    sub = subs.get(manager_id)
+    sub = subscriber(manager_id)
     if not sub:
         return {"ok": False, "error": "not_subscribed"}
     if channel not in sub.get("channels", []):
@@ -66,17 +111,99 @@ def send_push(manager_id: str, channel: str, template_key: str, payload: Dict[st
         _append_log(entry)
         return {"ok": True, "mock": True, "entry": entry}
 
-    # Real send (disabled in mock-only mode). Example kept for adapter:
+    # Реальная отправка — через общую очередь (темп, 429 retry_after, длинные тексты):
+    # пачка пушей не теряется под лимитами Telegram, статус пишется в лог по факту отправки
+    token = _token(cfg)
+    if not token:
+        return {"ok": False, "error": "no_token_env"}
+
+    def _done(res: Dict[str, Any]):
+        if "status" in res:
+            _append_log({**entry, "status": res["status"]})
+        else:
+            _append_log({**entry, "error": res.get("error")})
+
     try:
-        import requests
-        token = os.environ.get(cfg.get("bot_token_env","TELEGRAM_BOT_TOKEN"))
-        if not token:
-            return {"ok": False, "error": "no_token_env"}
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        data = {"chat_id": sub.get("chat_id"), "text": text, "parse_mode": "HTML"}
-        r = requests.post(url, json=data, timeout=10)
-        _append_log({**entry, "status": r.status_code})
-        return {"ok": r.ok, "status": r.status_code}
+        res = get_sender(token).send_message(sub.get("chat_id"), text, parse_mode="HTML", wait=wait, callback=_done)
     except Exception as e:
         _append_log({**entry, "error": str(e)})
         return {"ok": False, "error": str(e)}
+    if wait:
+        return {"ok": bool(res.get("ok")), "status": res.get("status"), "parts": res.get("parts", 1)}
+    return {"ok": True, "queued": True, "parts": res.get("parts", 1)}
+
+def broadcast(channel: str, template_key: str, payload: Optional[Dict[str, Any]] = None,
+              payloads: Optional[Dict[str, Dict[str, Any]]] = None,
+              manager_ids: Optional[List[str]] = None)->Dict[str, Any]:
+    """
+    Рассылка шаблона всем подписчикам канала одним вызовом.
+    payloads — поля для отдельных менеджеров поверх общего payload;
+    manager_ids — ограничить рассылку этими менеджерами.
+    Отправка асинхронная (общая очередь); итоги по получателям — broadcast_status(id).
+    """
+    cfg = config()
+    fmt = _load(FMT, {})
+    tpl = fmt.get(template_key, "{{ text }}")
+    recipients = _store().by_channel(channel)
+    if manager_ids is not None:
+        wanted = set(map(str, manager_ids))
+        recipients = [r for r in recipients if r["manager_id"] in wanted]
+    mock = cfg.get("mock_mode", True)
+    token = None if mock else _token(cfg)
+    if not mock and not token:
+        return {"ok": False, "error": "no_token_env"}
+
+    payloads = payloads or {}
+    common = _render(tpl, payload or {})
+    bid = uuid.uuid4().hex[:12]
+    ts = int(time.time())
+    results: Dict[str, Dict[str, Any]] = {}
+    entries = []
+    for r in recipients:
+        mid = r["manager_id"]
+        own = payloads.get(mid)
+        text = _render(tpl, {**(payload or {}), **own}) if own else common
+        entries.append({"ts": ts, "manager_id": mid, "chat_id": r["chat_id"], "channel": channel,
+                        "template": template_key, "text": text, "broadcast": bid})
+        results[mid] = {"manager_id": mid, "chat_id": r["chat_id"], "status": "mock" if mock else "queued"}
+    state = {"broadcast_id": bid, "channel": channel, "template": template_key, "ts": ts,
+             "mock": bool(mock), "recipients": len(results), "results": results}
+    with _BLOCK:
+        _BROADCASTS[bid] = state
+        while len(_BROADCASTS) > _BROADCASTS_KEEP:
+            _BROADCASTS.popitem(last=False)
+
+    if mock:
+        if entries:
+            _append_logs(entries)
+    else:
+        sender = get_sender(token)
+        for entry in entries:
+            sender.send_message(entry["chat_id"], entry["text"], parse_mode="HTML", wait=False,
+                                callback=_delivered(results[entry["manager_id"]], entry))
+    return {"ok": True, **broadcast_status(bid)}
+
+def _delivered(result: Dict[str, Any], entry: Dict[str, Any]):
+    def _done(res: Dict[str, Any]):
+        result["status"] = "sent" if res.get("ok") else "failed"
+        if "status" in res:
+            result["http_status"] = res["status"]
+            _append_log({**entry, "status": res["status"]})
+        else:
+            result["error"] = res.get("error")
+            _append_log({**entry, "error": res.get("error")})
+    return _done
+
+def broadcast_status(broadcast_id: str)->Optional[Dict[str, Any]]:
+    state = _BROADCASTS.get(broadcast_id)
+    if state is None:
+        return None
+    results = list(state["results"].values())
+    counts: Dict[str, int] = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return {**{k: v for k, v in state.items() if k != "results"}, "counts": counts,
+            "done": not counts.get("queued"), "results": results}
+
+def queue_stats()->Dict[str, Any]:
+    return sender_stats()
@@ -0,0 +1,148 @@
+
+import os, json, time, threading
+from typing import List, Dict, Any, Optional
+from core.state.v1 import get_store
+
+# Подписчики telegram_push в SQLite (salesbot.db):
+#   tp_subscribers — строка на менеджера (chat_id, каналы)
+#   tp_channels    — индекс канал -> менеджер для рассылок
+# Подписка/отписка меняет только строки одного менеджера; каждая операция —
+# одна транзакция BEGIN IMMEDIATE, рассылка не видит менеджера «без каналов».
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tp_subscribers (
+  manager_id TEXT PRIMARY KEY,
+  chat_id TEXT NOT NULL,
+  channels TEXT,
+  updated REAL
+);
+CREATE TABLE IF NOT EXISTS tp_channels (
+  channel TEXT NOT NULL,
+  manager_id TEXT NOT NULL,
+  PRIMARY KEY (channel, manager_id)
+);
+CREATE INDEX IF NOT EXISTS tp_channels_mgr_idx ON tp_channels(manager_id);
+'''
+
+
+class SubscriberStore:
+    def __init__(self, db_path: str = "salesbot.db"):
+        self.db_path = db_path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _kv(self):
+        st = get_store(self.db_path)
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    for stmt in _SCHEMA.strip().split(';'):
+                        s = stmt.strip()
+                        if s:
+                            st._exec(s).close()
+                    self._ready = True
+        return st
+
+    def _q(self, sql: str, args: tuple = ()):
+        return self._kv()._exec(sql, args)
+
+    def _rows(self, sql: str, args: tuple = ()) -> list:
+        cur = self._q(sql, args)
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+
+    @staticmethod
+    def _rec(chat_id, channels) -> dict:
+        return {"chat_id": chat_id, "channels": json.loads(channels or "[]")}
+
+    # ---- запись ----
+
+    def subscribe(self, manager_id: str, chat_id: str, channels: List[str]) -> dict:
+        manager_id, chat_id = str(manager_id), str(chat_id)
+        channels = list(dict.fromkeys(channels or []))
+        kv = self._kv()
+        with kv.transaction():
+            self._q(
+                "REPLACE INTO tp_subscribers(manager_id, chat_id, channels, updated) VALUES(?,?,?,?)",
+                (manager_id, chat_id, json.dumps(channels, ensure_ascii=False), time.time()),
+            ).close()
+            self._q("DELETE FROM tp_channels WHERE manager_id=?", (manager_id,)).close()
+            if channels:
+                kv._exec_many("INSERT OR IGNORE INTO tp_channels(channel, manager_id) VALUES(?,?)",
+                              [(c, manager_id) for c in channels])
+        return {"chat_id": chat_id, "channels": channels}
+
+    def unsubscribe(self, manager_id: str, channels: Optional[List[str]] = None) -> bool:
+        """channels=None — удалить подписчика целиком, иначе — только эти каналы."""
+        with self._kv().transaction():
+            rec = self.get(manager_id)
+            if rec is None:
+                return False
+            if channels is None:
+                self._q("DELETE FROM tp_channels WHERE manager_id=?", (str(manager_id),)).close()
+                self._q("DELETE FROM tp_subscribers WHERE manager_id=?", (str(manager_id),)).close()
+                return True
+            left = [c for c in rec["channels"] if c not in set(channels)]
+            self.subscribe(manager_id, rec["chat_id"], left)
+            return True
+
+    def replace_all(self, m: Dict[str, Any]) -> None:
+        """Полная замена (старый update_subscribers), одной транзакцией."""
+        with self._kv().transaction():
+            self._q("DELETE FROM tp_channels").close()
+            self._q("DELETE FROM tp_subscribers").close()
+            for mid, rec in (m or {}).items():
+                self.subscribe(mid, rec.get("chat_id"), rec.get("channels") or [])
+
+    # ---- чтение ----
+
+    def get(self, manager_id: str) -> Optional[dict]:
+        rows = self._rows("SELECT chat_id, channels FROM tp_subscribers WHERE manager_id=?", (str(manager_id),))
+        return self._rec(*rows[0]) if rows else None
+
+    def by_channel(self, channel: str) -> List[dict]:
+        """Подписчики канала: [{manager_id, chat_id}], по manager_id."""
+        rows = self._rows(
+            "SELECT s.manager_id, s.chat_id FROM tp_channels c JOIN tp_subscribers s ON s.manager_id=c.manager_id "
+            "WHERE c.channel=? ORDER BY s.manager_id",
+            (channel,),
+        )
+        return [{"manager_id": m, "chat_id": c} for m, c in rows]
+
+    def all(self) -> Dict[str, dict]:
+        rows = self._rows("SELECT manager_id, chat_id, channels FROM tp_subscribers ORDER BY manager_id")
+        return {m: self._rec(c, ch) for m, c, ch in rows}
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._rows("SELECT channel, COUNT(*) FROM tp_channels GROUP BY channel")
+        return {ch: n for ch, n in rows}
+
+    # ---- migration ----
+
+    def migrate_file(self, path: str) -> dict:
+        """
+        Разовый перенос subscribers.json в SQLite одной транзакцией; после успеха рядом
+        кладётся маркер .migrated, файл не удаляется. Уже существующие в базе подписчики
+        не перезаписываются. Файл не читается / не объект — маркера нет, повтор при следующем запуске.
+        """
+        marker = path + ".migrated"
+        if not os.path.exists(path) or os.path.exists(marker):
+            return {"migrated": 0, "skipped": 0, "done": True}
+        migrated = skipped = 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("subscribers.json: ожидался объект")
+        except Exception as e:
+            return {"migrated": 0, "skipped": 0, "done": False, "error": str(e)}
+        with self._kv().transaction():
+            for mid, rec in data.items():
+                if self.get(mid) is not None or not isinstance(rec, dict) or not rec.get("chat_id"):
+                    skipped += 1
+                    continue
+                self.subscribe(mid, rec["chat_id"], rec.get("channels") or [])
+                migrated += 1
+        with open(marker, "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+        return {"migrated": migrated, "skipped": skipped, "done": True}
@@ -1,8 +1,8 @@
 
 import json, random
 from dataclasses import dataclass, asdict
-from core.state.v1 import StateStore
-from core.voice_gateway.v1 import VoicePipeline
+from core.state.v1 import get_store
+from core.voice_gateway.v1 import get_pipeline
 
 EMOTIONS = ["calm","neutral","annoyed","angry","excited"]
 CLIENT_TYPES = [
@@ -17,59 +17,61 @@ class ArenaState:
     ctype: str
     emotion: str
     difficulty: str
-    history: list
     meta: dict
     def to_dict(self): return asdict(self)
 
 class ArenaEngine:
     def __init__(self, sid: str):
         self.sid=f"arena:{sid}"
-        self.store=StateStore("salesbot.db")
+        self.store=get_store("salesbot.db")
         raw=self.store.get(self.sid)
         if raw:
             try:
                 d=json.loads(raw)
+                legacy=d.pop("history", None)
                 self.state=ArenaState(**d)
+                if legacy is not None:
+                    # старый формат: история внутри блоба -> журнал ходов
+                    self.store.import_turns(self.sid, legacy)
+                    self._save()
             except:
                 self._reset()
         else:
             self._reset()
 
-        try: self.llm=VoicePipeline().llm
+        try: self.llm=get_pipeline().llm
         except: self.llm=None
 
     def _reset(self):
+        self.store.clear_turns(self.sid)
         self.state = ArenaState(
             ctype=random.choice(CLIENT_TYPES),
             emotion=random.choice(EMOTIONS),
             difficulty=random.choice(DIFFICULTY),
-            history=[],
             meta={"round":0}
         )
         self._save()
 
     def _save(self):
+        # в kv — только мелкие поля; реплики живут в журнале ходов
         self.store.set(self.sid, json.dumps(self.state.to_dict(), ensure_ascii=False))
 
     def snapshot(self):
-        return self.state.to_dict()
+        d=self.state.to_dict()
+        d["history"]=self.store.turns(self.sid)
+        return d
 
-    def handle(self, text: str)->dict:
-        self.state.history.append({"role":"user","content":text})
+    def _prompt(self, text: str)->list:
+        self.store.append_turn(self.sid, {"role":"user","content":text})
         self.state.meta["round"] += 1
 
         persona_desc=f"Тип: {self.state.ctype}. Эмоция: {self.state.emotion}. Сложность: {self.state.difficulty}."
-        suggestion=None
-        if self.llm:
-            try:
-                msg=[
-                  {"role":"system","content":f"Ты клиент. {persona_desc} Реагируй естественно."},
-                  {"role":"user","content":text}
-                ]
-                suggestion=self.llm.chat(msg)
-            except:
-                suggestion=None
+        return [
+          {"role":"system","content":f"Ты клиент. {persona_desc} Реагируй естественно."},
+          {"role":"user","content":text}
+        ]
 
+    def _finish(self, text: str, suggestion)->dict:
         # emotion shift
         if any(w in text.lower() for w in ["извиняюсь","понимаю","давайте","готов"]):
             self.state.emotion="calm"
@@ -94,6 +96,26 @@ class ArenaEngine:
             "score":score
         }
 
+    def handle(self, text: str)->dict:
+        msg=self._prompt(text)
+        suggestion=None
+        if self.llm:
+            try:
+                suggestion=self.llm.chat(msg)
+            except:
+                suggestion=None
+        return self._finish(text, suggestion)
+
+    async def ahandle(self, text: str)->dict:
+        msg=self._prompt(text)
+        suggestion=None
+        if self.llm:
+            try:
+                suggestion=await self.llm.achat(msg)
+            except:
+                suggestion=None
+        return self._finish(text, suggestion)
+
     def reset(self):
         self._reset()
         return {"ok":True}
@@ -1,7 +1,7 @@
 
 import json, random, re
 from typing import Dict, Any, Optional
-from core.voice_gateway.v1 import VoicePipeline
+from core.voice_gateway.v1 import get_pipeline
 
 EMO_STATES = ["calm","neutral","annoyed","angry"]
 DIFF_COEF = {"easy":0.6,"medium":1.0,"hard":1.4,"nightmare":1.8}
@@ -35,7 +35,7 @@ def spawn_persona(difficulty: str = "medium", psy_type: Optional[str] = None, co
         "context": context or ""
     }
     # стартовая реплика
-    vp = VoicePipeline()
+    vp = get_pipeline()
     msg = [
         {"role":"system","content": f"Ты играешь роль клиента типа {psy_type}. Говори кратко, натурально. Первая реплика — обозначь позицию."},
         {"role":"user","content": context or "Запрос: обсуждаем покупку медиа-продукта «На Счастье»."}
@@ -69,7 +69,7 @@ def step_dialog(state: Dict[str,Any], manager_reply: str)->dict:
 
     # шаблон реакции
     sys_style = f"Ты клиент {psy}. Эмоция: {st['emotion']}. Давление: {st['pressure']:.1f}. Отвечай естественно, 1-3 фразы, соответствуя типу и эмоции. Если менеджер слаб — стань жестче; если хорош — смягчайся и продвигайся к следующему шагу."
-    vp = VoicePipeline()
+    vp = get_pipeline()
     msg = [
         {"role":"system","content": sys_style},
         {"role":"assistant","content": st.get("last_client","")},
@@ -1,9 +1,9 @@
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Request, Response
 from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
 from jinja2 import Environment, FileSystemLoader, select_autoescape
-import os, json
-from .service import list_cases, get_case, top_seller_reply, coach_generate_pitch, arena_context
+import os, json, asyncio
+from .service import list_cases, query_cases, get_case, top_seller_reply, coach_generate_pitch, arena_context
 
 router = APIRouter(prefix="/client_cases/v1", tags=["client_cases"])
 
@@ -18,8 +18,20 @@ async def css():
     return FileResponse(os.path.join(STATIC, "cases.css"))
 
 @router.get("/list")
-async def api_list(goal: str = None, budget: str = None, persona: str = None):
-    return list_cases(goal, budget, persona)
+async def api_list(response: Response, goal: str = None, budget: str = None, persona: str = None,
+                   limit: int = None, cursor: str = None, offset: int = 0):
+    # тело — по-прежнему список; пагинация: limit + cursor (id последнего кейса) или offset,
+    # следующая страница — в заголовке X-Next-Cursor, всего под фильтр — X-Total-Count
+    if limit is not None:
+        limit = min(max(limit, 1), 500)
+    try:
+        items, next_cursor, total = query_cases(goal, budget, persona, limit=limit, cursor=cursor, offset=max(offset, 0))
+    except ValueError:
+        return JSONResponse({"error": "bad_cursor"}, status_code=400)
+    response.headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 @router.get("/get/{case_id}")
 async def api_get(case_id: str):
@@ -54,7 +66,7 @@ async def coach_pitch(case_id: str, tone: str = "firm"):
     c = get_case(case_id)
     if not c:
         return JSONResponse({"error":"not found"}, status_code=404)
-    return {"pitch": coach_generate_pitch(c, tone)}
+    return {"pitch": await asyncio.to_thread(coach_generate_pitch, c, tone)}
 
 @router.get("/arena/{case_id}")
 async def case_to_arena(case_id: str):
@@ -1,44 +1,101 @@
 
-import os, json, random
-from typing import List, Dict, Any, Optional
-from core.voice_gateway.v1 import VoicePipeline
+import os, json, random, heapq
+from typing import List, Dict, Any, Optional, Tuple
+from core.voice_gateway.v1 import get_pipeline
+from core.resources.v1 import load_json
 
 BASE = os.path.dirname(__file__)
 DATA = os.path.join(BASE, "data", "cases.json")
 
 def _load()->List[dict]:
-    with open(DATA,"r",encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(DATA)
 
-def list_cases(goal: Optional[str]=None, budget: Optional[str]=None, persona: Optional[str]=None)->List[dict]:
+class CaseIndex:
+    """
+    Индекс кейсов в памяти:
+      - by_id: id -> кейс
+      - facets: {"goal"|"persona"|"budget": {значение: set(позиций)}}
+    Фильтр — пересечение множеств, порядок — как в cases.json (позиция = стабильный курсор).
+    """
+    FACETS = {
+        "goal": lambda x: x.get("goal"),
+        "persona": lambda x: x.get("persona"),
+        "budget": lambda x: (x.get("budget") or {}).get("key"),
+    }
+
+    def __init__(self, items: List[dict]):
+        self.items = items
+        self.by_id: Dict[str, dict] = {}
+        self.pos: Dict[str, int] = {}
+        self.facets: Dict[str, Dict[Any, set]] = {f: {} for f in self.FACETS}
+        for i, x in enumerate(items):
+            self.by_id.setdefault(x["id"], x)
+            self.pos.setdefault(x["id"], i)
+            for f, get in self.FACETS.items():
+                self.facets[f].setdefault(get(x), set()).add(i)
+
+    def match(self, **filters)->Optional[set]:
+        """Позиции под фильтры; None — фильтров нет (подходят все)."""
+        sets = [self.facets[f].get(v, set()) for f, v in filters.items() if v]
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return set.intersection(*sets)
+
+    def query(self, limit: Optional[int]=None, cursor: Optional[str]=None, offset: int=0, **filters)->Tuple[List[dict], Optional[str], int]:
+        hits = self.match(**filters)
+        total = len(self.items) if hits is None else len(hits)
+        after = -1
+        if cursor:
+            if cursor not in self.pos:
+                raise ValueError("bad_cursor")  # неизвестный / устаревший курсор — не первая страница заново
+            after = self.pos[cursor]
+        if hits is None:
+            positions = range(after + 1, len(self.items))
+        else:
+            positions = [p for p in hits if p > after] if after >= 0 else hits
+        if limit is None:
+            page = sorted(positions)[offset:]
+        else:
+            # страница — первые offset+limit позиций, без полной сортировки
+            page = heapq.nsmallest(offset + limit + 1, positions)[offset:]
+        more = limit is not None and len(page) > limit
+        if more:
+            page = page[:limit]
+        items = [self.items[p] for p in page]
+        next_cursor = items[-1]["id"] if more and items else None
+        return items, next_cursor, total
+
+_INDEX: Optional[CaseIndex] = None
+
+def _index()->CaseIndex:
+    # перестраивается, только когда загрузчик перечитал cases.json
+    global _INDEX
     items = _load()
-    def ok(x):
-        if goal and x["goal"] != goal: return False
-        if persona and x["persona"] != persona: return False
-        if budget:
-            key = x["budget"]["key"]
-            if budget != key: return False
-        return True
-    out=[]
-    for x in items:
-        if ok(x): out.append(x)
-    return out
+    if _INDEX is None or _INDEX.items is not items:
+        _INDEX = CaseIndex(items)
+    return _INDEX
+
+def query_cases(goal: Optional[str]=None, budget: Optional[str]=None, persona: Optional[str]=None,
+                limit: Optional[int]=None, cursor: Optional[str]=None, offset: int=0)->Tuple[List[dict], Optional[str], int]:
+    """-> (кейсы страницы, курсор следующей страницы или None, всего под фильтр); ValueError — неизвестный cursor"""
+    return _index().query(limit=limit, cursor=cursor, offset=offset, goal=goal, budget=budget, persona=persona)
+
+def list_cases(goal: Optional[str]=None, budget: Optional[str]=None, persona: Optional[str]=None)->List[dict]:
+    return query_cases(goal, budget, persona)[0]
 
 def get_case(case_id: str)->Optional[dict]:
-    for x in _load():
-        if x["id"] == case_id:
-            return x
-    return None
+    return _index().by_id.get(case_id)
 
 def top_seller_reply(case: dict)->str:
     return case.get("top_seller_answer") or case.get("best_practice_answer")
 
 def coach_generate_pitch(case: dict, tone: str="firm")->str:
-    vp = VoicePipeline()
+    vp = get_pipeline()
     sys = "Ты топ-продажник бренда «На Счастье». Короткий питч: ценность→структура→вопрос. 2–3 фразы."
     msg = [{"role":"system","content":sys},{"role":"user","content": json.dumps(case, ensure_ascii=False)[:2000]}]
     try:
-        return vp.llm.chat(msg)
+        return vp.llm.chat(msg, cache=True)
     except Exception:
         return top_seller_reply(case)
 
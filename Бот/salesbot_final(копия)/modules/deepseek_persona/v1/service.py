@@ -1,14 +1,14 @@
 
 import os, json, random
 from typing import Dict, Any
-from core.voice_gateway.v1 import VoicePipeline
+from core.voice_gateway.v1 import get_pipeline
+from core.resources.v1 import load_json
 
 BASE = os.path.dirname(__file__)
 DATA = os.path.join(BASE, "data", "persona.json")
 
 def load_persona()->Dict[str, Any]:
-    with open(DATA, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(DATA)
 
 def apply_persona(role: str, text: str)->str:
     persona = load_persona()
@@ -23,22 +23,34 @@ def apply_persona(role: str, text: str)->str:
         prefix = random.choice(blocks.get("client_rational", ["Мне нужно…"]))
     return f"{prefix} {text}"
 
-def persona_chat(prompt: str, role: str="coach")->str:
+def _persona_messages(prompt: str)->list:
     persona = load_persona()
-    vp = VoicePipeline()
     sys = (
         "Ты говоришь от имени бренда «На Счастье»: тёплый, уверенный стиль, "
-        "эмоции, искренность, уважение. Следуй правилам:
-" +
-        "
-".join(persona.get("rules", []))
+        "эмоции, искренность, уважение. Следуй правилам:\n" +
+        "\n".join(persona.get("rules", []))
     )
-    msg = [
+    return [
         {"role": "system", "content": sys},
         {"role": "user", "content": prompt}
     ]
+
+def persona_chat(prompt: str, role: str="coach")->str:
+    vp = get_pipeline()
+    msg = _persona_messages(prompt)
     try:
         base = vp.llm.chat(msg)
         return apply_persona(role, base)
     except Exception:
         return apply_persona(role, prompt)
+
+async def persona_stream(prompt: str, role: str="coach"):
+    """Как persona_chat, но отдаёт ответ кусками: сначала префикс персоны, затем текст LLM."""
+    vp = get_pipeline()
+    msg = _persona_messages(prompt)
+    yield apply_persona(role, "")
+    try:
+        async for chunk in vp.llm.astream(msg):
+            yield chunk
+    except Exception:
+        yield prompt
@@ -1,6 +1,8 @@
 
+import asyncio
+from typing import Optional
 from fastapi import APIRouter, Request
-from .service import start_session, append_message, analyze_session, list_sessions
+from .service import start_session, append_message, analyze_session, list_sessions, load_session, migrate_sessions, get_profile
 
 router = APIRouter(prefix="/dialog_memory/v1", tags=["dialog_memory"])
 
@@ -43,8 +45,22 @@ async def append(req: Request):
 @router.post("/analyze")
 async def analyze(req: Request):
     data = await req.json()
-    return analyze_session(data.get("manager_id"), data.get("session_id"))
+    # два синхронных вызова LLM — в поток
+    return await asyncio.to_thread(analyze_session, data.get("manager_id"), data.get("session_id"))
 
 @router.get("/list/{manager_id}")
-async def list_all(manager_id: str):
-    return list_sessions(manager_id)
+async def list_all(manager_id: str, limit: int = 50, offset: int = 0, before: Optional[float] = None, history: bool = False):
+    # новые сначала; следующая страница — offset+=limit или before=<timestamp последней>
+    return list_sessions(manager_id, limit=min(max(limit, 1), 500), offset=max(offset, 0), before=before, with_history=history)
+
+@router.get("/profile/{manager_id}")
+async def profile(manager_id: str):
+    return get_profile(manager_id) or {"error": "profile_not_found"}
+
+@router.get("/session/{manager_id}/{session_id}")
+async def get_session(manager_id: str, session_id: str):
+    return load_session(manager_id, session_id) or {"error": "session_not_found"}
+
+@router.post("/migrate")
+async def migrate():
+    return migrate_sessions()
@@ -1,26 +1,49 @@
 
-import os, json, time, uuid
+import os, json, time, uuid, threading
 from typing import List, Dict, Any, Optional
-from core.voice_gateway.v1 import VoicePipeline
+from core.voice_gateway.v1 import get_pipeline
+from core.keywords.v1 import KeywordIndex
+from core.context.v1 import get_window, session_key
+from .store import SessionStore
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data", "sessions")
 os.makedirs(DATA_DIR, exist_ok=True)
 
-def _session_path(manager_id: str, session_id: str):
-    return os.path.join(DATA_DIR, f"{manager_id}__{session_id}.json")
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+# теги ошибок анализа (по подстрокам текста ошибок)
+ERROR_TAGS = {
+    "price": ["дорог","цена"],
+    "trust": ["довер"],
+    "questions": ["нет вопрос"],
+    "value": ["нет ценност","выгода"],
+}
+_ERROR_IX = KeywordIndex(ERROR_TAGS, lower=True)
+
+def tag_errors(errors: List[str]) -> Dict[str, int]:
+    tags = _ERROR_IX.tags(" ".join(str(e) for e in (errors or [])))
+    return {t: n for t, n in tags.items() if n}
+
+def _store() -> SessionStore:
+    # при первом обращении — разовая миграция старых JSON-файлов сессий
+    # (под локом: параллельные первые запросы не мигрируют дважды)
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                st = SessionStore(os.environ.get("DIALOG_MEMORY_DB", "salesbot.db"))
+                st.migrate_dir(DATA_DIR)
+                _STORE = st
+    return _STORE
 
 def save_session(manager_id: str, session_id: str, record: dict):
-    path = _session_path(manager_id, session_id)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(record, f, ensure_ascii=False, indent=2)
+    record = dict(record, manager_id=manager_id, session_id=session_id)
+    _store().save(record)
     return True
 
 def load_session(manager_id: str, session_id: str):
-    path = _session_path(manager_id, session_id)
-    if not os.path.exists(path):
-        return None
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _store().load(manager_id, session_id)
 
 def start_session(manager_id: str):
     session_id = str(uuid.uuid4())
@@ -38,23 +61,23 @@ def start_session(manager_id: str):
     return record
 
 def append_message(manager_id: str, session_id: str, role: str, content: str, stage: Optional[str]):
-    record = load_session(manager_id, session_id)
-    if not record:
+    # O(1): одна вставка в dm_messages, история не перечитывается и не перезаписывается
+    st = _store()
+    if not st.exists(manager_id, session_id):
         return None
-    record["history"].append({"role": role, "content": content, "stage": stage})
-    save_session(manager_id, session_id, record)
-    return record
+    msg = st.append(manager_id, session_id, role, content, stage)
+    return {"manager_id": manager_id, "session_id": session_id, "appended": msg}
 
 def analyze_session(manager_id: str, session_id: str):
     record = load_session(manager_id, session_id)
     if not record:
         return None
 
-    vp = VoicePipeline()
+    vp = get_pipeline()
     msg = [
         {"role": "system",
          "content": "Ты анализируешь диалог менеджера. Выдели 3 ошибки, 3 сильные стороны и итоговый балл (0..100). Формат JSON: {errors:[], strengths:[], score:int}"},
-        {"role": "user", "content": json.dumps(record["history"], ensure_ascii=False)[:3000]}
+        {"role": "user", "content": get_window().render(session_key("dialog_memory", manager_id, session_id), record["history"])}
     ]
     j = vp.llm.chat(msg)
     try:
@@ -76,17 +99,19 @@ def analyze_session(manager_id: str, session_id: str):
     rec = vp.llm.chat(msg2)
     record["next_recommendations"] = rec.split("\n")[:3]
 
-    save_session(manager_id, session_id, record)
+    # только meta: история могла пополниться через /append, пока шли вызовы LLM
+    _store().save_meta(manager_id, session_id, record)
+    # указатель «последний анализ» и профиль тегов — для рекомендаций без перебора сессий
+    _store().update_profile(manager_id, session_id, record["errors"], tag_errors(record["errors"]))
     return record
 
-def list_sessions(manager_id: str):
-    files = os.listdir(DATA_DIR)
-    sessions = []
-    for f in files:
-        if f.startswith(manager_id+"__") and f.endswith(".json"):
-            with open(os.path.join(DATA_DIR, f), "r", encoding="utf-8") as ff:
-                try:
-                    sessions.append(json.load(ff))
-                except:
-                    pass
-    return sessions
+def get_profile(manager_id: str) -> Optional[dict]:
+    return _store().profile(manager_id)
+
+def list_sessions(manager_id: str, limit: int = 50, offset: int = 0, before: Optional[float] = None, with_history: bool = False):
+    return _store().list(manager_id, limit=limit, offset=offset, before=before, with_history=with_history)
+
+def migrate_sessions():
+    st = _store()
+    with _STORE_LOCK:
+        return st.migrate_dir(DATA_DIR)
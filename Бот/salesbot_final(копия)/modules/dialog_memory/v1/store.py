@@ -0,0 +1,253 @@
+
+import os, json, time, threading
+from typing import List, Dict, Any, Optional
+from core.state.v1 import get_store
+
+# Хранилище сессий dialog_memory в SQLite (salesbot.db):
+#   dm_sessions — одна строка на сессию (поля анализа в meta JSON)
+#   dm_messages — по строке на реплику, append без перезаписи истории
+#   dm_profiles — по строке на менеджера: указатель на последний анализ
+#                 и накопленный профиль тегов ошибок
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS dm_sessions (
+  manager_id TEXT NOT NULL,
+  session_id TEXT NOT NULL,
+  timestamp REAL,
+  meta TEXT,
+  PRIMARY KEY (manager_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS dm_sessions_mgr_ts_idx ON dm_sessions(manager_id, timestamp);
+CREATE INDEX IF NOT EXISTS dm_sessions_ts_idx ON dm_sessions(timestamp);
+CREATE TABLE IF NOT EXISTS dm_messages (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  manager_id TEXT NOT NULL,
+  session_id TEXT NOT NULL,
+  role TEXT,
+  content TEXT,
+  stage TEXT,
+  ts REAL
+);
+CREATE INDEX IF NOT EXISTS dm_messages_sess_idx ON dm_messages(manager_id, session_id, id);
+CREATE TABLE IF NOT EXISTS dm_profiles (
+  manager_id TEXT PRIMARY KEY,
+  session_id TEXT,
+  timestamp REAL,
+  errors TEXT,
+  tags TEXT,
+  totals TEXT,
+  analyses INTEGER
+);
+'''
+
+_CORE_FIELDS = ("manager_id", "session_id", "timestamp", "history")
+
+
+class SessionStore:
+    def __init__(self, db_path: str = "salesbot.db"):
+        self.db_path = db_path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _kv(self):
+        st = get_store(self.db_path)
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    for stmt in _SCHEMA.strip().split(';'):
+                        s = stmt.strip()
+                        if s:
+                            st._exec(s).close()
+                    self._ready = True
+        return st
+
+    def _q(self, sql: str, args: tuple = ()):
+        return self._kv()._exec(sql, args)
+
+    # ---- sessions ----
+
+    def exists(self, manager_id: str, session_id: str) -> bool:
+        cur = self._q("SELECT 1 FROM dm_sessions WHERE manager_id=? AND session_id=?", (manager_id, session_id))
+        row = cur.fetchone()
+        cur.close()
+        return row is not None
+
+    def count_messages(self, manager_id: str, session_id: str) -> int:
+        cur = self._q("SELECT COUNT(*) FROM dm_messages WHERE manager_id=? AND session_id=?", (manager_id, session_id))
+        n = cur.fetchone()[0]
+        cur.close()
+        return int(n or 0)
+
+    def _row_to_record(self, manager_id: str, session_id: str, ts, meta: Optional[str]) -> dict:
+        rec = {"manager_id": manager_id, "session_id": session_id, "timestamp": ts}
+        try:
+            rec.update(json.loads(meta or "{}"))
+        except Exception:
+            pass
+        return rec
+
+    def save(self, record: dict) -> None:
+        """
+        Upsert сессии вместе с историей: дописывается хвост (или история заменяется, если стала короче).
+        Только для создания, импорта и миграции — результаты анализа пишет save_meta.
+        """
+        manager_id, session_id = str(record["manager_id"]), str(record["session_id"])
+        meta = {k: v for k, v in record.items() if k not in _CORE_FIELDS}
+        history = record.get("history") or []
+        kv = self._kv()
+        with kv.transaction():  # сессия и её реплики — одной транзакцией
+            self._q(
+                "REPLACE INTO dm_sessions(manager_id, session_id, timestamp, meta) VALUES(?,?,?,?)",
+                (manager_id, session_id, record.get("timestamp") or time.time(), json.dumps(meta, ensure_ascii=False)),
+            ).close()
+            n = self.count_messages(manager_id, session_id)
+            if len(history) < n:
+                self._q("DELETE FROM dm_messages WHERE manager_id=? AND session_id=?", (manager_id, session_id)).close()
+                n = 0
+            if history[n:]:
+                now = time.time()
+                kv._exec_many(
+                    "INSERT INTO dm_messages(manager_id, session_id, role, content, stage, ts) VALUES(?,?,?,?,?,?)",
+                    [(manager_id, session_id, m.get("role"), m.get("content"), m.get("stage"), now) for m in history[n:]],
+                )
+
+    def save_meta(self, manager_id: str, session_id: str, meta: dict) -> bool:
+        """Обновить только поля анализа в dm_sessions; реплики не трогаются, параллельный append не теряется."""
+        meta = {k: v for k, v in meta.items() if k not in _CORE_FIELDS}
+        cur = self._q(
+            "UPDATE dm_sessions SET meta=? WHERE manager_id=? AND session_id=?",
+            (json.dumps(meta, ensure_ascii=False), manager_id, session_id),
+        )
+        n = cur.rowcount
+        cur.close()
+        return n > 0
+
+    def append(self, manager_id: str, session_id: str, role: Optional[str], content: Optional[str], stage: Optional[str]) -> dict:
+        msg = {"role": role, "content": content, "stage": stage}
+        self._q(
+            "INSERT INTO dm_messages(manager_id, session_id, role, content, stage, ts) VALUES(?,?,?,?,?,?)",
+            (manager_id, session_id, role, content, stage, time.time()),
+        ).close()
+        return msg
+
+    def history(self, manager_id: str, session_id: str) -> List[dict]:
+        cur = self._q(
+            "SELECT role, content, stage FROM dm_messages WHERE manager_id=? AND session_id=? ORDER BY id",
+            (manager_id, session_id),
+        )
+        rows = cur.fetchall()
+        cur.close()
+        return [{"role": r, "content": c, "stage": s} for r, c, s in rows]
+
+    def load(self, manager_id: str, session_id: str) -> Optional[dict]:
+        cur = self._q(
+            "SELECT timestamp, meta FROM dm_sessions WHERE manager_id=? AND session_id=?",
+            (manager_id, session_id),
+        )
+        row = cur.fetchone()
+        cur.close()
+        if not row:
+            return None
+        rec = self._row_to_record(manager_id, session_id, row[0], row[1])
+        rec["history"] = self.history(manager_id, session_id)
+        return rec
+
+    def list(self, manager_id: str, limit: int = 50, offset: int = 0, before: Optional[float] = None, with_history: bool = False) -> List[dict]:
+        """Сессии менеджера, новые сначала; before — курсор по timestamp."""
+        sql = "SELECT session_id, timestamp, meta FROM dm_sessions WHERE manager_id=?"
+        args: list = [manager_id]
+        if before is not None:
+            sql += " AND timestamp < ?"
+            args.append(before)
+        sql += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
+        args += [int(limit), int(offset)]
+        cur = self._q(sql, tuple(args))
+        rows = cur.fetchall()
+        cur.close()
+        out = []
+        for sid, ts, meta in rows:
+            rec = self._row_to_record(manager_id, sid, ts, meta)
+            if with_history:
+                rec["history"] = self.history(manager_id, sid)
+            out.append(rec)
+        return out
+
+    # ---- профиль менеджера ----
+
+    def update_profile(self, manager_id: str, session_id: str, errors: List[str], tags: Dict[str, int]) -> dict:
+        """Указатель на последний анализ + накопленные счётчики тегов ошибок."""
+        # чтение и запись — одной транзакцией IMMEDIATE: параллельные анализы
+        # одного менеджера не теряют счётчики
+        with self._kv().transaction():
+            prev = self.profile(manager_id) or {}
+            totals = dict(prev.get("totals") or {})
+            for t, n in tags.items():
+                totals[t] = totals.get(t, 0) + n
+            prof = {
+                "manager_id": manager_id,
+                "session_id": session_id,
+                "timestamp": time.time(),
+                "errors": list(errors or []),
+                "tags": dict(tags),
+                "totals": totals,
+                "analyses": int(prev.get("analyses") or 0) + 1,
+            }
+            self._q(
+                "REPLACE INTO dm_profiles(manager_id, session_id, timestamp, errors, tags, totals, analyses) VALUES(?,?,?,?,?,?,?)",
+                (manager_id, session_id, prof["timestamp"], json.dumps(prof["errors"], ensure_ascii=False),
+                 json.dumps(prof["tags"]), json.dumps(totals), prof["analyses"]),
+            ).close()
+        return prof
+
+    def profile(self, manager_id: str) -> Optional[dict]:
+        cur = self._q(
+            "SELECT session_id, timestamp, errors, tags, totals, analyses FROM dm_profiles WHERE manager_id=?",
+            (manager_id,),
+        )
+        row = cur.fetchone()
+        cur.close()
+        if not row:
+            return None
+        sid, ts, errors, tags, totals, n = row
+        return {
+            "manager_id": manager_id,
+            "session_id": sid,
+            "timestamp": ts,
+            "errors": json.loads(errors or "[]"),
+            "tags": json.loads(tags or "{}"),
+            "totals": json.loads(totals or "{}"),
+            "analyses": n or 0,
+        }
+
+    # ---- migration ----
+
+    def migrate_dir(self, data_dir: str) -> dict:
+        """
+        Разовый перенос старых файлов {manager}__{session}.json в SQLite, сессия — одной транзакцией.
+        Маркер .migrated кладётся, только если все файлы перенеслись; иначе failed —
+        список файлов, и при следующем запуске они пробуются снова. Файлы не удаляются.
+        """
+        marker = os.path.join(data_dir, ".migrated")
+        if not os.path.isdir(data_dir) or os.path.exists(marker):
+            return {"migrated": 0, "skipped": 0, "failed": [], "done": True}
+        migrated = skipped = 0
+        failed: List[str] = []
+        for fn in os.listdir(data_dir):
+            if not fn.endswith(".json") or "__" not in fn:
+                continue
+            try:
+                with open(os.path.join(data_dir, fn), "r", encoding="utf-8") as f:
+                    rec = json.load(f)
+                mid, sid = fn[:-5].split("__", 1)
+                rec.setdefault("manager_id", mid)
+                rec.setdefault("session_id", sid)
+                if self.exists(str(rec["manager_id"]), str(rec["session_id"])):
+                    skipped += 1
+                    continue
+                self.save(rec)
+                migrated += 1
+            except Exception:
+                failed.append(fn)
+        if not failed:
+            with open(marker, "w", encoding="utf-8") as f:
+                f.write(str(time.time()))
+        return {"migrated": migrated, "skipped": skipped, "failed": failed, "done": not failed}
@@ -1,64 +1,71 @@
 
 import os, json
 from typing import List, Dict, Any, Optional
-from modules.dialog_memory.v1.service import list_sessions
+from modules.dialog_memory.v1.service import list_sessions, get_profile, tag_errors
+from core.resources.v1 import load_json_dir
 
 BASE = os.path.dirname(__file__)
 LESSON_DIR = os.path.join(BASE, "lessons")
 
 def _iter_lessons()->List[dict]:
+    # файлы разбираются один раз, перечитываются только при смене mtime
     items = []
     for cat in ["master_path","objections","upsell","arena"]:
-        cdir = os.path.join(LESSON_DIR, cat)
-        if not os.path.isdir(cdir): 
-            continue
-        for fn in os.listdir(cdir):
-            if fn.endswith(".json"):
-                with open(os.path.join(cdir, fn),"r",encoding="utf-8") as f:
-                    try:
-                        items.append(json.load(f))
-                    except:
-                        pass
+        items.extend(load_json_dir(os.path.join(LESSON_DIR, cat)))
     return items
 
-def list_catalog()->List[dict]:
+_CATALOG = {"key": None, "by_id": {}, "summary": []}
+
+def _catalog()->dict:
+    # индекс id -> урок и краткий каталог пересобираются, только если загрузчик отдал новые объекты
     items = _iter_lessons()
-    return [{
-        "id": x["id"],
-        "title": x["title"],
-        "duration": x["duration"],
-        "type": x["type"],
-        "category": x["category"],
-        "preview": x.get("preview","")
-    } for x in items]
+    key = tuple(map(id, items))
+    if key != _CATALOG["key"]:
+        by_id = {}
+        for x in items:
+            by_id.setdefault(x["id"], x)
+        summary = [{
+            "id": x["id"],
+            "title": x["title"],
+            "duration": x["duration"],
+            "type": x["type"],
+            "category": x["category"],
+            "preview": x.get("preview","")
+        } for x in items]
+        # items держим в кэше: иначе id() освобождённых объектов могут совпасть с новыми
+        _CATALOG.update(key=key, by_id=by_id, summary=summary, items=items)
+    return _CATALOG
+
+def list_catalog()->List[dict]:
+    return list(_catalog()["summary"])
 
 def get_lesson(lesson_id: str)->Optional[dict]:
-    items = _iter_lessons()
-    for x in items:
-        if x["id"] == lesson_id:
-            return x
-    return None
+    return _catalog()["by_id"].get(lesson_id)
 
 def score_test(lesson: dict, answer_index: int)->dict:
     ok = (int(answer_index) == int(lesson["test"]["answer"]))
     return {"ok": ok, "correct": int(lesson["test"]["answer"])}
 
+# тег ошибки (dialog_memory.ERROR_TAGS) -> урок, в порядке приоритета
+TAG_LESSONS = [
+    ("price", "objections/price"),
+    ("trust", "objections/trust"),
+    ("questions", "master_path/qualification"),
+    ("value", "master_path/offer"),
+]
+
 def recommend_lessons(manager_id: str)->List[str]:
-    # На основе последних ошибок в dialog_memory
-    sessions = list_sessions(manager_id)
-    if not sessions:
-        return ["master_path/greeting", "master_path/qualification"]
-    last = sorted(sessions, key=lambda s: s.get("timestamp",0), reverse=True)[0]
-    errs = " ".join(last.get("errors",[])).lower()
-    rec = []
-    if any(w in errs for w in ["дорог","цена"]):
-        rec.append("objections/price")
-    if any(w in errs for w in ["довер"]):
-        rec.append("objections/trust")
-    if any(w in errs for w in ["нет вопрос"]):
-        rec.append("master_path/qualification")
-    if any(w in errs for w in ["нет ценност","выгода"]):
-        rec.append("master_path/offer")
+    # На основе последних ошибок в dialog_memory: профиль обновляет analyze_session
+    prof = get_profile(manager_id)
+    if prof:
+        tags = prof.get("tags") or {}
+    else:
+        # анализов ещё не было (или они до профилей) — берём самую новую сессию
+        sessions = list_sessions(manager_id, limit=1)
+        if not sessions:
+            return ["master_path/greeting", "master_path/qualification"]
+        tags = tag_errors(sessions[0].get("errors",[]))
+    rec = [lesson for tag, lesson in TAG_LESSONS if tags.get(tag)]
     if not rec:
         rec = ["arena/psychotypes","upsell/value"]
     return rec[:3]
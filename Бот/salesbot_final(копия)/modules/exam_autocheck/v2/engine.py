@@ -1,8 +1,8 @@
 
 import json, random
 from dataclasses import dataclass, asdict
-from core.state.v1 import StateStore
-from core.voice_gateway.v1 import VoicePipeline
+from core.state.v1 import get_store
+from core.voice_gateway.v1 import get_pipeline
 
 MODULES = ["master_path","objections","upsell","arena"]
 
@@ -18,7 +18,7 @@ class ExamState:
 class ExamAutoCheck:
     def __init__(self, sid:str):
         self.sid=f"exam:{sid}"
-        self.store=StateStore("salesbot.db")
+        self.store=get_store("salesbot.db")
         raw=self.store.get(self.sid)
         if raw:
             try:
@@ -28,7 +28,7 @@ class ExamAutoCheck:
                 self._reset()
         else:
             self._reset()
-        try: self.llm=VoicePipeline().llm
+        try: self.llm=get_pipeline().llm
         except: self.llm=None
 
     def _reset(self):
@@ -48,34 +48,26 @@ class ExamAutoCheck:
         self._reset()
         return {"ok":True, "module":self.state.module}
 
-    def answer(self, text:str)->dict:
-        if self.state.done:
-            return {"error":"exam finished"}
-
+    def _prompt(self, text:str)->list:
         self.state.answers.append(text)
+        return [
+          {"role":"system","content":f"Ты экзаменатор. Модуль: {self.state.module}. Оцени ответ 0-5 и дай обратную связь."},
+          {"role":"user","content":text}
+        ]
 
-        partial_score=0
-        feedback=None
-        if self.llm:
-            try:
-                msg=[
-                  {"role":"system","content":f"Ты экзаменатор. Модуль: {self.state.module}. Оцени ответ 0-5 и дай обратную связь."},
-                  {"role":"user","content":text}
-                ]
-                feedback=self.llm.chat(msg)
-                if any(s in feedback.lower() for s in ["5","отлично","идеально"]):
-                    partial_score=5
-                elif any(s in feedback.lower() for s in ["4"]):
-                    partial_score=4
-                elif any(s in feedback.lower() for s in ["3"]):
-                    partial_score=3
-                elif any(s in feedback.lower() for s in ["2"]):
-                    partial_score=2
-                else:
-                    partial_score=1
-            except:
-                partial_score=random.randint(1,5)
+    @staticmethod
+    def _grade(feedback:str)->int:
+        if any(s in feedback.lower() for s in ["5","отлично","идеально"]):
+            return 5
+        elif any(s in feedback.lower() for s in ["4"]):
+            return 4
+        elif any(s in feedback.lower() for s in ["3"]):
+            return 3
+        elif any(s in feedback.lower() for s in ["2"]):
+            return 2
+        return 1
 
+    def _finish(self, partial_score:int, feedback)->dict:
         self.state.score += partial_score
         self._save()
 
@@ -99,6 +91,36 @@ class ExamAutoCheck:
             "feedback":feedback
         }
 
+    def answer(self, text:str)->dict:
+        if self.state.done:
+            return {"error":"exam finished"}
+
+        msg=self._prompt(text)
+        partial_score=0
+        feedback=None
+        if self.llm:
+            try:
+                feedback=self.llm.chat(msg)
+                partial_score=self._grade(feedback)
+            except:
+                partial_score=random.randint(1,5)
+        return self._finish(partial_score, feedback)
+
+    async def aanswer(self, text:str)->dict:
+        if self.state.done:
+            return {"error":"exam finished"}
+
+        msg=self._prompt(text)
+        partial_score=0
+        feedback=None
+        if self.llm:
+            try:
+                feedback=await self.llm.achat(msg)
+                partial_score=self._grade(feedback)
+            except:
+                partial_score=random.randint(1,5)
+        return self._finish(partial_score, feedback)
+
     def result(self):
         if not self.state.done:
             return {"error":"not finished"}
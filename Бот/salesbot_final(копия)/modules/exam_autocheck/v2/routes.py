@@ -40,7 +40,7 @@ async def start(sid:str):
 @router.post("/answer/{sid}")
 async def answer(sid:str, text:str):
     ex=ExamAutoCheck(sid)
-    return ex.answer(text)
+    return await ex.aanswer(text)
 
 @router.get("/result/{sid}")
 async def result(sid:str):
@@ -1,15 +1,14 @@
 
 from dataclasses import dataclass, asdict
 from typing import Dict, Any
-from core.state.v1 import StateStore
-from core.voice_gateway.v1 import VoicePipeline
+from core.state.v1 import get_store
+from core.voice_gateway.v1 import get_pipeline
 
 STAGES = ["greeting","qualification","support","offer","demo","final","done"]
 
 @dataclass
 class MPState:
     stage: str
-    history: list
     metadata: dict
 
     def to_dict(self):
@@ -18,34 +17,41 @@ class MPState:
 class MasterPath:
     def __init__(self, session_id: str):
         self.sid = f"mp:{session_id}"
-        self.store = StateStore("salesbot.db")
+        self.store = get_store("salesbot.db")
         raw = self.store.get(self.sid)
         if raw:
             try:
                 import json
                 d = json.loads(raw)
                 self.state = MPState(stage=d.get("stage","greeting"),
-                                     history=d.get("history",[]),
                                      metadata=d.get("metadata",{}))
+                if "history" in d:
+                    # старый формат: история внутри блоба -> журнал ходов
+                    self.store.import_turns(self.sid, d["history"])
+                    self._save()
             except Exception:
                 self._reset()
         else:
             self._reset()
         try:
-            self.llm = VoicePipeline().llm
+            self.llm = get_pipeline().llm
         except Exception:
             self.llm = None
 
     def _reset(self):
-        self.state = MPState(stage="greeting", history=[], metadata={})
+        self.store.clear_turns(self.sid)
+        self.state = MPState(stage="greeting", metadata={})
         self._save()
 
     def _save(self):
         import json
+        # в kv — только мелкие поля; реплики живут в журнале ходов
         self.store.set(self.sid, json.dumps(self.state.to_dict(), ensure_ascii=False))
 
     def snapshot(self)->dict:
-        return self.state.to_dict()
+        d = self.state.to_dict()
+        d["history"] = self.store.turns(self.sid)
+        return d
 
     def advance(self)->str:
         idx = STAGES.index(self.state.stage)
@@ -54,19 +60,14 @@ class MasterPath:
             self._save()
         return self.state.stage
 
-    def handle(self, text: str)->dict:
-        self.state.history.append({"role":"user","content":text})
-        suggestion = None
-        if self.llm:
-            try:
-                msg = [
-                    {"role":"system","content":f"Ты коуч. Текущий этап: {self.state.stage}."},
-                    {"role":"user","content": text}
-                ]
-                suggestion = self.llm.chat(msg)
-            except Exception:
-                suggestion = None
+    def _prompt(self, text: str)->list:
+        self.store.append_turn(self.sid, {"role":"user","content":text})
+        return [
+            {"role":"system","content":f"Ты коуч. Текущий этап: {self.state.stage}."},
+            {"role":"user","content": text}
+        ]
 
+    def _finish(self, text: str, suggestion)->dict:
         reply = {
             "stage": self.state.stage,
             "coach_suggestion": suggestion
@@ -83,6 +84,26 @@ class MasterPath:
         self._save()
         return reply
 
+    def handle(self, text: str)->dict:
+        msg = self._prompt(text)
+        suggestion = None
+        if self.llm:
+            try:
+                suggestion = self.llm.chat(msg)
+            except Exception:
+                suggestion = None
+        return self._finish(text, suggestion)
+
+    async def ahandle(self, text: str)->dict:
+        msg = self._prompt(text)
+        suggestion = None
+        if self.llm:
+            try:
+                suggestion = await self.llm.achat(msg)
+            except Exception:
+                suggestion = None
+        return self._finish(text, suggestion)
+
     def reset(self):
         self._reset()
         return {"ok": True}
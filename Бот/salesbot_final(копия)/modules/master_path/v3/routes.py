@@ -44,7 +44,7 @@ async def start(sid: str):
 @router.post("/handle/{sid}")
 async def handle(sid: str, text: str):
     mp = MasterPath(sid)
-    return mp.handle(text)
+    return await mp.ahandle(text)
 
 @router.get("/snapshot/{sid}")
 async def snapshot(sid: str):
@@ -1,7 +1,9 @@
 
 import json, re
 from typing import List, Dict, Any
-from core.voice_gateway.v1 import VoicePipeline
+from core.voice_gateway.v1 import get_pipeline
+from core.keywords.v1 import KeywordIndex
+from core.metrics.v1 import timed
 
 def _load_rubric()->dict:
     import os, json
@@ -11,50 +13,63 @@ def _load_rubric()->dict:
 
 RUBRIC = _load_rubric()
 
-# Простые эвристики для чеков (детерминированно)
+# Простые эвристики для чеков (детерминированно):
+# чек засчитан, если найдено любое слово или хватает вопросов ("questions": N).
+# В rubrics.json у чека можно задать свои "keywords" / "questions" — они важнее таблицы.
+CHECK_RULES = {
+    "tone_warm": {"keywords": ["рад","приятно","здравствуйте","спасибо","что удобно"]},
+    "intro_clear": {"keywords": ["я","меня зовут","компания","мы занимаемся"]},
+    "agenda": {"keywords": ["предлагаю","план","давайте так","сначала","потом"]},
+    "need_questions": {"keywords": ["что важно","расскажите","поделитесь"], "questions": 2},
+    "budget_timeline": {"keywords": ["бюджет","сколько готовы","срок","когда планируете","дедлайн"]},
+    "decision_process": {"keywords": ["кто принимает","лицо принимающее решение","кто решает","комитет"]},
+    "paraphrase": {"keywords": ["правильно ли я понимаю","то есть вы","если верно понял"]},
+    "proof": {"keywords": ["кейс","пример","результат","цифр","покажу"]},
+    "bridge": {"keywords": ["свяжем","как раз решает","поэтому наш","это поможет"]},
+    "value_driven": {"keywords": ["результат","выгода","экономия","рост","ценность"]},
+    "structure": {"keywords": ["во-первых","во вторых","итак","структура","предлагаю пакет"]},
+    "risk_reversal": {"keywords": ["гарантия","без риска","договор","возврат","тест"]},
+    "relevance": {"keywords": ["под ваш кейс","пример из вашей отрасли","как у вас"]},
+    "interaction": {"questions": 1},
+    "cta_next": {"keywords": ["предлагаю созвониться","приглашаю","перейдём к","шаг","старт"]},
+    "summary": {"keywords": ["итого","резюме","подведём итог"]},
+    "clear_next": {"keywords": ["встреч","завтра","в понедельник","в среду","числа","дата"]},
+    "close": {"keywords": ["готовы оформить","приступим","закроем","подтверждаете"]},
+}
+
+def _build_checks(rubric: dict):
+    rules = {k: dict(v) for k, v in CHECK_RULES.items()}
+    for cfg in rubric.values():
+        for chk in cfg.get("checks", []):
+            r = rules.setdefault(chk["id"], {})
+            for key in ("keywords", "questions"):
+                if key in chk:
+                    r[key] = chk[key]
+    ix = KeywordIndex({cid: r.get("keywords", []) for cid, r in rules.items()}, lower=True)
+    return rules, ix
+
+CHECKS, _CHECK_IX = _build_checks(RUBRIC)
+
+def _check_hits(text: str)->set:
+    """Все сработавшие чеки за один проход индекса по тексту."""
+    text = text or ""
+    found = _CHECK_IX.present(text)
+    qs = text.count("?")
+    hits = set()
+    for cid, r in CHECKS.items():
+        if r.get("questions") and qs >= r["questions"]:
+            hits.add(cid)
+        elif any(w in found for w in _CHECK_IX.groups[cid]):
+            hits.add(cid)
+    return hits
+
 def _check(text: str, check_id: str)->bool:
-    t = (text or "").lower()
-    if check_id == "tone_warm":
-        return any(w in t for w in ["рад","приятно","здравствуйте","спасибо","что удобно"])
-    if check_id == "intro_clear":
-        return any(w in t for w in ["я","меня зовут","компания","мы занимаемся"])
-    if check_id == "agenda":
-        return any(w in t for w in ["предлагаю","план","давайте так","сначала","потом"])
-    if check_id == "need_questions":
-        return t.count("?") >= 2 or any(w in t for w in ["что важно","расскажите","поделитесь"])
-    if check_id == "budget_timeline":
-        return any(w in t for w in ["бюджет","сколько готовы","срок","когда планируете","дедлайн"])
-    if check_id == "decision_process":
-        return any(w in t for w in ["кто принимает","лицо принимающее решение","кто решает","комитет"])
-    if check_id == "paraphrase":
-        return any(w in t for w in ["правильно ли я понимаю","то есть вы","если верно понял"])
-    if check_id == "proof":
-        return any(w in t for w in ["кейс","пример","результат","цифр","покажу"])
-    if check_id == "bridge":
-        return any(w in t for w in ["свяжем","как раз решает","поэтому наш","это поможет"])
-    if check_id == "value_driven":
-        return any(w in t for w in ["результат","выгода","экономия","рост","ценность"])
-    if check_id == "structure":
-        return any(w in t for w in ["во-первых","во вторых","итак","структура","предлагаю пакет"])
-    if check_id == "risk_reversal":
-        return any(w in t for w in ["гарантия","без риска","договор","возврат","тест"])
-    if check_id == "relevance":
-        return any(w in t for w in ["под ваш кейс","пример из вашей отрасли","как у вас"])
-    if check_id == "interaction":
-        return t.count("?") >= 1
-    if check_id == "cta_next":
-        return any(w in t for w in ["предлагаю созвониться","приглашаю","перейдём к","шаг","старт"])
-    if check_id == "summary":
-        return any(w in t for w in ["итого","резюме","подведём итог"])
-    if check_id == "clear_next":
-        return any(w in t for w in ["встреч","завтра","в понедельник","в среду","числа","дата"])
-    if check_id == "close":
-        return any(w in t for w in ["готовы оформить","приступим","закроем","подтверждаете"])
-    return False
+    return check_id in _check_hits(text)
 
 def rubric_summary()->dict:
     return RUBRIC
 
+@timed("rules", scorer="master_path_rubrics")
 def score_dialog(history: List[Dict[str,str]])->dict:
     # history: [{role, content, stage}]
     stages = {k: {"score":0.0, "checks":[]} for k in RUBRIC.keys()}
@@ -74,8 +89,9 @@ def score_dialog(history: List[Dict[str,str]])->dict:
         text = " ".join(stage_texts.get(st) or [])[:5000]
         stage_score = 0.0
         checks_res = []
+        hits = _check_hits(text)
         for chk in cfg["checks"]:
-            ok = _check(text, chk["id"])
+            ok = chk["id"] in hits
             w = chk["weight"]
             if ok:
                 stage_score += w
@@ -88,12 +104,12 @@ def score_dialog(history: List[Dict[str,str]])->dict:
 
     # LLM совет по улучшению (строгий коуч)
     try:
-        vp = VoicePipeline()
+        vp = get_pipeline()
         msg = [
             {"role":"system","content":"Ты строгий коуч продаж. Дай 3 короткие прицельные рекомендации по улучшению на основе списка проблем. Формат: маркированный список."},
             {"role":"user","content": json.dumps(issues, ensure_ascii=False)[:2000]}
         ]
-        coach = vp.llm.chat(msg)
+        coach = vp.llm.chat(msg, cache=True)
         tips = [t.strip(" -•") for t in coach.splitlines() if t.strip()][:5]
     except Exception:
         tips = []
@@ -1,8 +1,8 @@
 
 import random, json
 from dataclasses import dataclass, asdict
-from core.state.v1 import StateStore
-from core.voice_gateway.v1 import VoicePipeline
+from core.state.v1 import get_store
+from core.voice_gateway.v1 import get_pipeline
 
 OBJECTION_TYPES = [
     "price","trust","hurry","think","ask_spouse","scam_fear",
@@ -28,7 +28,7 @@ class OBJState:
 class ObjectionEngine:
     def __init__(self, sid: str):
         self.sid=f"obj:{sid}"
-        self.store=StateStore("salesbot.db")
+        self.store=get_store("salesbot.db")
         raw=self.store.get(self.sid)
         if raw:
             try:
@@ -39,7 +39,7 @@ class ObjectionEngine:
         else:
             self._reset()
         try:
-            self.llm=VoicePipeline().llm
+            self.llm=get_pipeline().llm
         except:
             self.llm=None
 
@@ -55,22 +55,16 @@ class ObjectionEngine:
     def snapshot(self):
         return self.state.to_dict()
 
-    def handle(self, text: str)->dict:
+    def _prompt(self, text: str)->list:
         self.state.history.append({"role":"user","content":text})
         persona_desc=PERSONAS[self.state.persona]
         ot=self.state.objection_type
+        return [
+          {"role":"system","content":f"Ты клиент. Тип возражения: {ot}. {persona_desc}"},
+          {"role":"user","content":text}
+        ]
 
-        suggestion=None
-        if self.llm:
-            try:
-                msg=[
-                  {"role":"system","content":f"Ты клиент. Тип возражения: {ot}. {persona_desc}"},
-                  {"role":"user","content":text}
-                ]
-                suggestion=self.llm.chat(msg)
-            except:
-                suggestion=None
-
+    def _finish(self, text: str, suggestion)->dict:
         # simple scoring
         score=0
         if any(w in text.lower() for w in ["понимаю","согласен","давайте","могу"]):
@@ -82,11 +76,31 @@ class ObjectionEngine:
 
         return {
             "persona": self.state.persona,
-            "objection_type": ot,
+            "objection_type": self.state.objection_type,
             "client_reply": suggestion,
             "score": score
         }
 
+    def handle(self, text: str)->dict:
+        msg=self._prompt(text)
+        suggestion=None
+        if self.llm:
+            try:
+                suggestion=self.llm.chat(msg)
+            except:
+                suggestion=None
+        return self._finish(text, suggestion)
+
+    async def ahandle(self, text: str)->dict:
+        msg=self._prompt(text)
+        suggestion=None
+        if self.llm:
+            try:
+                suggestion=await self.llm.achat(msg)
+            except:
+                suggestion=None
+        return self._finish(text, suggestion)
+
     def reset(self):
         self._reset()
         return {"ok":True}
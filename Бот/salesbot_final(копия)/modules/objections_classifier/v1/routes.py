@@ -1,18 +1,32 @@
 
+import asyncio
 from fastapi import APIRouter, Request
-from .service import classify, apply_patterns, score_response
+from fastapi.responses import JSONResponse
+from .service import classify, classify_batch, apply_patterns, score_response, MAX_BATCH
 
 router = APIRouter(prefix="/objections_classifier/v1", tags=["objections_classifier"])
 
 @router.post("/classify")
 async def r_classify(req: Request):
     data = await req.json()
-    return classify(data.get("utterance",""), data.get("history"))
+    # без совпадения по правилам classify спрашивает LLM — в поток
+    return await asyncio.to_thread(classify, data.get("utterance",""), data.get("history"))
+
+@router.post("/classify_batch")
+async def r_classify_batch(req: Request):
+    data = await req.json()
+    # тысячи реплик — в поток, чтобы не держать event loop
+    try:
+        return await asyncio.to_thread(classify_batch, data.get("utterances"), bool(data.get("llm", False)), bool(data.get("score", True)))
+    except ValueError as e:
+        if str(e) == "batch_too_large":
+            return JSONResponse({"error": "batch_too_large", "max": MAX_BATCH}, status_code=413)
+        return JSONResponse({"error": "bad_utterances", "detail": "utterances must be a list"}, status_code=400)
 
 @router.post("/patterns")
 async def r_patterns(req: Request):
     data = await req.json()
-    return apply_patterns(data.get("type","doubts"), data.get("history"), data.get("last_reply",""))
+    return await asyncio.to_thread(apply_patterns, data.get("type","doubts"), data.get("history"), data.get("last_reply",""), data.get("session_id"))
 
 @router.post("/score")
 async def r_score(req: Request):
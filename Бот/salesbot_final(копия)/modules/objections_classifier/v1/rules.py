@@ -21,12 +21,24 @@ NEGATIVE_SIGNS = [
 
 QUESTION_SIGN = r"\?"
 
-def detect_type(text: str):
-    text = (text or "").lower()
+
+# ---- таблицы, скомпилированные один раз при импорте ----
+# Объединённое выражение (alternation/lookahead с именованными группами)
+# на re из CPython медленнее набора отдельных скомпилированных паттернов:
+# многошаблонного автомата в нём нет, и каждая позиция перебирает все ветки.
+# Поэтому паттерны компилируются по отдельности, а один проход analyze()
+# отдаёт и тип, и штрафы.
+
+_TYPE_RX = [(t, [re.compile(rgx) for rgx in regs]) for t, regs in PATTERNS.items()]
+_NEG_RX = [(re.compile(rgx, flags=re.IGNORECASE), rgx, weight, reason) for rgx, weight, reason in NEGATIVE_SIGNS]
+_QUESTION_RX = re.compile(QUESTION_SIGN)
+
+def _type_result(text: str):
+    low = text.lower()
     hits = {}
-    for t, regs in PATTERNS.items():
-        for rgx in regs:
-            if re.search(rgx, text):
+    for t, regs in _TYPE_RX:
+        for rx in regs:
+            if rx.search(low):
                 hits[t] = hits.get(t,0)+1
     if not hits:
         return None, 0, []
@@ -35,18 +47,28 @@ def detect_type(text: str):
     conf = min(0.9, 0.4 + 0.2*(hits[best]-1))
     return best, conf, reasons
 
-def detect_penalties(text: str):
-    text = text or ""
+def _penalty_result(text: str):
     penalties = []
     score_delta = 0
-    for rgx,weight,reason in NEGATIVE_SIGNS:
-        if re.search(rgx, text, flags=re.IGNORECASE):
+    for rx,rgx,weight,reason in _NEG_RX:
+        if rx.search(text):
             penalties.append({"rule": rgx, "weight": weight, "reason": reason})
             score_delta -= weight
-    if not re.search(QUESTION_SIGN, text):
+    if not _QUESTION_RX.search(text):
         penalties.append({"rule": "no_question", "weight": 1, "reason": "нет уточняющего вопроса"})
         score_delta -= 1
     if len(text.strip()) < 20:
         penalties.append({"rule": "too_short", "weight": 1, "reason": "короткий ответ — мало ценности"})
         score_delta -= 1
     return penalties, score_delta
+
+def detect_type(text: str):
+    return _type_result(text or "")
+
+def detect_penalties(text: str):
+    return _penalty_result(text or "")
+
+def analyze(text: str):
+    """Тип возражения и штрафы за один вызов: ((type, conf, reasons), (penalties, score_delta))."""
+    text = text or ""
+    return _type_result(text), _penalty_result(text)
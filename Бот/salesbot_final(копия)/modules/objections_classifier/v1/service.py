@@ -1,8 +1,10 @@
 
-import json
+import json, time
 from typing import List, Dict, Any
-from .rules import detect_type, detect_penalties, TYPES
-from core.voice_gateway.v1 import VoicePipeline
+from .rules import detect_type, detect_penalties, analyze, TYPES
+from core.voice_gateway.v1 import get_pipeline
+from core.metrics.v1 import timer, timed, record
+from core.context.v1 import get_window, session_key
 
 def _load_patterns()->dict:
     import json, os
@@ -12,17 +14,32 @@ def _load_patterns()->dict:
 
 PATTERNS = _load_patterns()
 
+MAX_BATCH = 10000
+# llm=True: не больше стольких LLM-фоллбеков на пакет, дальше — doubts без LLM
+MAX_BATCH_LLM = 50
+# короткий контекст для перефраза шаблона (раньше — первые 600 символов JSON истории)
+PATTERN_CONTEXT_TOKENS = 300
+
 def classify(utterance: str, history: List[Dict[str,str]]|None=None)->dict:
-    obj_type, conf, reasons = detect_type(utterance or "")
-    advice = None
+    with timer("rules", scorer="objections_classifier"):
+        type_res = detect_type(utterance or "")
+    return _classify(type_res, utterance, llm=True)
+
+def _classify(type_res, utterance: str, llm: bool)->dict:
+    obj_type, conf, reasons = type_res
+    reasons = list(reasons)
+    if not obj_type and not llm:
+        obj_type = "doubts"
+        conf = 0.4
+        reasons.append("fallback:doubts")
     if not obj_type:
         # fallback в LLM для распознавания типа
-        vp = VoicePipeline()
+        vp = get_pipeline()
         msg = [
             {"role":"system","content":"Классифицируй тип возражения: price/trust/need/timing/doubts/competing. Ответи только типом."},
             {"role":"user","content": utterance or ""}
         ]
-        guess = (vp.llm.chat(msg) or "").strip().lower()
+        guess = (vp.llm.chat(msg, cache=True) or "").strip().lower()
         if guess in TYPES:
             obj_type = guess
             conf = max(conf, 0.55)
@@ -40,15 +57,16 @@ def classify(utterance: str, history: List[Dict[str,str]]|None=None)->dict:
         "advice": advice
     }
 
-def apply_patterns(obj_type: str, history: List[Dict[str,str]]|None, last_reply: str)->dict:
+def apply_patterns(obj_type: str, history: List[Dict[str,str]]|None, last_reply: str, session_id: str|None=None)->dict:
     pat = PATTERNS.get(obj_type) or {}
     template = pat.get("template")
     coach = pat.get("coach")
     # LLM перефраз дерева шаблона под контекст
-    vp = VoicePipeline()
+    vp = get_pipeline()
+    context = get_window().render(session_key("objections_classifier", session_id), history, budget=PATTERN_CONTEXT_TOKENS)
     msg = [
         {"role":"system","content":"Ты строгий коуч продаж. Переформулируй шаблон ответа под реплику клиента и историю диалога. Сделай 2-3 внятные фразы + один уточняющий вопрос."},
-        {"role":"user","content": f"Шаблон: {template}\nРеплика клиента: {last_reply}\nИстория: {json.dumps(history or [])[:600]}"}
+        {"role":"user","content": f"Шаблон: {template}\nРеплика клиента: {last_reply}\nИстория: {context}"}
     ]
     coach_reply = vp.llm.chat(msg)
     return {
@@ -56,8 +74,48 @@ def apply_patterns(obj_type: str, history: List[Dict[str,str]]|None, last_reply:
         "coach_reply": coach_reply or coach
     }
 
+@timed("rules", scorer="objections_classifier.penalties")
 def score_response(last_reply: str)->dict:
-    penalties, delta = detect_penalties(last_reply or "")
+    return _score(detect_penalties(last_reply or ""))
+
+def _score(pen_res)->dict:
+    penalties, delta = pen_res
     base = 0
     score = max(0, base + 5 + delta)  # 0..10 шкала (5 базовая, штрафы снижают)
     return {"penalties": penalties, "score_delta": delta, "score": score}
+
+def classify_batch(utterances: List[Any], llm: bool=False, score: bool=True)->dict:
+    """
+    Пакетная классификация (пересчёт исторических диалогов).
+    utterances — список строк или {"utterance": ...}; один проход analyze() на реплику.
+    llm=False — без LLM-фоллбека (тип не найден -> doubts), иначе как classify(),
+    но не больше MAX_BATCH_LLM вызовов LLM на пакет.
+    ValueError("bad_utterances") — не список, ValueError("batch_too_large") — больше MAX_BATCH.
+    """
+    if utterances is None:
+        utterances = []
+    if not isinstance(utterances, list):
+        raise ValueError("bad_utterances")  # строка иначе разбиралась бы по символам
+    if len(utterances) > MAX_BATCH:
+        raise ValueError("batch_too_large")
+    results = []
+    by_type: Dict[str,int] = {}
+    llm_calls = 0
+    # фаза rules — только analyze(); LLM-фоллбек в _classify меряется как llm
+    rules_s = 0.0
+    for it in utterances:
+        text = (it.get("utterance") if isinstance(it, dict) else it) or ""
+        text = str(text)
+        t0 = time.perf_counter()
+        type_res, pen_res = analyze(text)
+        rules_s += time.perf_counter() - t0
+        use_llm = llm and not type_res[0] and llm_calls < MAX_BATCH_LLM
+        if use_llm:
+            llm_calls += 1
+        res = _classify(type_res, text, llm=use_llm)
+        if score:
+            res["score"] = _score(pen_res)
+        by_type[res["type"]] = by_type.get(res["type"],0)+1
+        results.append(res)
+    record("rules", rules_s, scorer="objections_classifier.batch")
+    return {"count": len(results), "by_type": by_type, "llm_calls": llm_calls, "results": results}
@@ -1,8 +1,8 @@
 
 import json, random
 from dataclasses import dataclass, asdict
-from core.state.v1 import StateStore
-from core.voice_gateway.v1 import VoicePipeline
+from core.state.v1 import get_store
+from core.voice_gateway.v1 import get_pipeline
 
 ERROR_TYPES = [
     "too_fast","too_slow","no_greeting","weak_offer","no_questions","pressure",
@@ -18,7 +18,6 @@ LEVELS = ["low","medium","high"]
 
 @dataclass
 class DragonState:
-    history: list
     last_error: dict
     meta: dict
     def to_dict(self): return asdict(self)
@@ -26,57 +25,81 @@ class DragonState:
 class DragonEngine:
     def __init__(self, sid:str):
         self.sid=f"dragon:{sid}"
-        self.store=StateStore("salesbot.db")
+        self.store=get_store("salesbot.db")
         raw=self.store.get(self.sid)
         if raw:
             try:
                 d=json.loads(raw)
+                legacy=d.pop("history", None)
                 self.state=DragonState(**d)
+                if legacy is not None:
+                    # старый формат: история внутри блоба -> журнал ходов
+                    self.store.import_turns(self.sid, legacy)
+                    self._save()
             except:
                 self._reset()
         else:
             self._reset()
-        try: self.llm=VoicePipeline().llm
+        try: self.llm=get_pipeline().llm
         except: self.llm=None
 
     def _reset(self):
-        self.state = DragonState(history=[], last_error={}, meta={"round":0})
+        self.store.clear_turns(self.sid)
+        self.state = DragonState(last_error={}, meta={"round":0})
         self._save()
 
     def _save(self):
+        # в kv — только мелкие поля; реплики живут в журнале ходов
         self.store.set(self.sid, json.dumps(self.state.to_dict(), ensure_ascii=False))
 
     def snapshot(self):
-        return self.state.to_dict()
+        d=self.state.to_dict()
+        d["history"]=self.store.turns(self.sid)
+        return d
 
-    def handle(self, text:str)->dict:
-        self.state.history.append({"role":"user","content":text})
+    def _prompt(self, text:str)->list:
+        self.store.append_turn(self.sid, {"role":"user","content":text})
         self.state.meta["round"] += 1
 
         # choose random error type (LLM improves quality)
         etype=random.choice(ERROR_TYPES)
         level=random.choice(LEVELS)
+        self.state.last_error={"type":etype,"level":level,"advice":None}
+        return [
+          {"role":"system","content":"Ты супер‑коуч. Анализируй ошибки менеджера максимально честно."},
+          {"role":"user","content":f"Фраза менеджера: {text}. Ошибка: {etype}. Уровень: {level}."}
+        ]
+
+    def _finish(self, advice)->dict:
+        self.state.last_error["advice"]=advice
+        self._save()
+
+        return {
+            "error_type": self.state.last_error["type"],
+            "level": self.state.last_error["level"],
+            "advice": advice,
+            "round": self.state.meta["round"]
+        }
 
+    def handle(self, text:str)->dict:
+        msg=self._prompt(text)
         advice=None
         if self.llm:
             try:
-                msg=[
-                  {"role":"system","content":"Ты супер‑коуч. Анализируй ошибки менеджера максимально честно."},
-                  {"role":"user","content":f"Фраза менеджера: {text}. Ошибка: {etype}. Уровень: {level}."}
-                ]
                 advice=self.llm.chat(msg)
             except:
                 advice=None
+        return self._finish(advice)
 
-        self.state.last_error={"type":etype,"level":level,"advice":advice}
-        self._save()
-
-        return {
-            "error_type": etype,
-            "level": level,
-            "advice": advice,
-            "round": self.state.meta["round"]
-        }
+    async def ahandle(self, text:str)->dict:
+        msg=self._prompt(text)
+        advice=None
+        if self.llm:
+            try:
+                advice=await self.llm.achat(msg)
+            except:
+                advice=None
+        return self._finish(advice)
 
     def reset(self):
         self._reset()
@@ -1,15 +1,21 @@
 
+import asyncio
 from fastapi import APIRouter, Request
-from .service import analyze_reply, suggest_fix
+from .service import analyze_reply, suggest_fix, score_replies
 
 router = APIRouter(prefix="/sleep_dragon_rules/v1", tags=["sleeping_dragon_rules"])
 
 @router.post("/score")
 async def score(req: Request):
     data = await req.json()
-    return analyze_reply(data.get("history"), data.get("reply",""), data.get("stage"))
+    return await asyncio.to_thread(analyze_reply, data.get("history"), data.get("reply",""), data.get("stage"), data.get("session_id"))
+
+@router.post("/score_batch")
+async def score_batch(req: Request):
+    data = await req.json()
+    return await asyncio.to_thread(score_replies, data.get("replies") or [])
 
 @router.post("/suggest")
 async def suggest(req: Request):
     data = await req.json()
-    return suggest_fix(data.get("history"), data.get("reply",""), data.get("stage"))
+    return await asyncio.to_thread(suggest_fix, data.get("history"), data.get("reply",""), data.get("stage"), data.get("session_id"))
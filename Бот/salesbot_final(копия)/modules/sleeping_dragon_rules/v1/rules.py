@@ -0,0 +1,85 @@
+
+import ast, re
+from typing import List, Dict, Any
+
+# Компилятор правил data/rules.json.
+# check — выражение Python над reply; разбирается один раз при загрузке,
+# проверяется по белому списку узлов AST и компилируется в code object.
+# pattern — регулярка, компилируется один раз (IGNORECASE).
+
+_SAFE_BUILTINS = {"len": len, "any": any, "all": all, "min": min, "max": max, "str": str, "int": int}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Mod,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.Call, ast.Attribute, ast.Name, ast.Load, ast.Store, ast.Constant,
+    ast.List, ast.Tuple, ast.Set, ast.GeneratorExp, ast.comprehension, ast.IfExp, ast.Subscript, ast.Slice,
+)
+
+# методы строки, которые можно вызывать в check
+_ALLOWED_ATTRS = {"lower", "upper", "strip", "startswith", "endswith", "count", "split", "find"}
+
+
+class RuleError(ValueError):
+    pass
+
+
+def _check_ast(tree: ast.AST, names: set) -> None:
+    local = set(names)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.comprehension):
+            for n in ast.walk(node.target):
+                if isinstance(n, ast.Name):
+                    local.add(n.id)
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise RuleError(f"недопустимая конструкция: {type(node).__name__}")
+        if isinstance(node, ast.Attribute) and (node.attr.startswith("_") or node.attr not in _ALLOWED_ATTRS):
+            raise RuleError(f"недопустимый атрибут: {node.attr}")
+        if isinstance(node, ast.Name) and node.id not in local and node.id not in _SAFE_BUILTINS:
+            raise RuleError(f"неизвестное имя: {node.id}")
+
+
+def compile_check(src: str):
+    tree = ast.parse(src, mode="eval")
+    _check_ast(tree, {"reply"})
+    return compile(tree, f"<rule:{src}>", "eval")
+
+
+def compile_rules(rules: List[dict]) -> List[dict]:
+    """rules.json -> список правил с готовыми rx / code; битые правила пропускаются."""
+    out = []
+    for r in rules:
+        try:
+            rx = re.compile(r["pattern"], flags=re.IGNORECASE) if r.get("pattern") else None
+            code = compile_check(r["check"]) if r.get("check") else None
+        except (SyntaxError, RuleError, re.error):
+            continue
+        out.append({"id": r["id"], "msg": r["msg"], "penalty": int(r["penalty"]), "rx": rx, "code": code})
+    return out
+
+
+def apply_compiled(compiled: List[dict], reply: str) -> Dict[str, Any]:
+    reply = reply or ""
+    # reply — в globals: иначе генераторы внутри check его не видят
+    env = {"__builtins__": _SAFE_BUILTINS, "reply": reply}
+    penalties = []
+    minus = 0
+    for r in compiled:
+        hit = bool(r["rx"] and r["rx"].search(reply))
+        if not hit and r["code"] is not None:
+            try:
+                hit = bool(eval(r["code"], env))
+            except Exception:
+                pass
+        if hit:
+            penalties.append({"id": r["id"], "msg": r["msg"], "penalty": r["penalty"]})
+            minus += r["penalty"]
+    rule_score = max(0, min(10, 10 - minus))
+    return {"penalties": penalties, "rule_score": rule_score}
+
+
+def apply_many(compiled: List[dict], replies: List[str]) -> List[Dict[str, Any]]:
+    """Пакетная оценка списка ответов одним вызовом."""
+    return [apply_compiled(compiled, r) for r in replies]
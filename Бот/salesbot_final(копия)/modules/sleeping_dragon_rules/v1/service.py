@@ -1,7 +1,10 @@
 
-import json, re
+import json
 from typing import List, Dict, Any, Optional
-from core.voice_gateway.v1 import VoicePipeline
+from core.voice_gateway.v1 import get_pipeline
+from .rules import compile_rules, apply_compiled, apply_many
+from core.metrics.v1 import timed
+from core.context.v1 import get_window, session_key, clip
 
 def _load_rules()->list:
     import os, json
@@ -10,35 +13,30 @@ def _load_rules()->list:
         return json.load(f)
 
 RULES = _load_rules()
+# check/pattern разбираются и компилируются один раз при импорте
+COMPILED = compile_rules(RULES)
 
+@timed("rules", scorer="sleeping_dragon_rules")
 def _apply_rules(reply: str)->Dict[str,Any]:
-    reply = reply or ""
-    penalties = []
-    minus = 0
-    ctx = {"reply": reply}
-    for r in RULES:
-        hit = False
-        if r.get("pattern"):
-            if re.search(r["pattern"], reply, flags=re.IGNORECASE):
-                hit = True
-        if r.get("check"):
-            try:
-                if eval(r["check"], {}, ctx):
-                    hit = True
-            except Exception:
-                pass
-        if hit:
-            penalties.append({"id": r["id"], "msg": r["msg"], "penalty": r["penalty"]})
-            minus += int(r["penalty"])
-    rule_score = max(0, min(10, 10 - minus))
-    return {"penalties": penalties, "rule_score": rule_score}
+    return apply_compiled(COMPILED, reply or "")
 
-def _llm_score(history: Optional[List[dict]], reply: str, stage: Optional[str])->Dict[str,Any]:
+@timed("rules", scorer="sleeping_dragon_rules.batch")
+def score_replies(replies: List[str])->dict:
+    """Только правила, без LLM: оценка пачки ответов одним вызовом."""
+    items = [str(r or "") for r in (replies or [])]
+    return {"ok": True, "count": len(items), "results": apply_many(COMPILED, items)}
+
+def _payload(history: Optional[List[dict]], reply: str, stage: Optional[str], session_id: Optional[str], field: str)->str:
+    # история — свёртка + последние реплики в бюджете окна, а не обрезанный JSON
+    w = get_window()
+    return json.dumps({field: clip(reply, w.budget), "stage": stage, "history": w.render(session_key("sleeping_dragon_rules", session_id), history)}, ensure_ascii=False)
+
+def _llm_score(history: Optional[List[dict]], reply: str, stage: Optional[str], session_id: Optional[str]=None)->Dict[str,Any]:
     # оцениваем смысловую сторону — кратко, 0..10 и 3 причины
-    vp = VoicePipeline()
+    vp = get_pipeline()
     msg = [
         {"role":"system","content":"Ты строгий экзаменатор продаж. Оцени ответ по шкале 0..10, 3 короткие причины. Формат JSON: {score:int, reasons:[str,str,str]}."},
-        {"role":"user","content": json.dumps({"reply":reply, "stage":stage, "history":history or []}, ensure_ascii=False)[:2000]}
+        {"role":"user","content": _payload(history, reply, stage, session_id, "reply")}
     ]
     j = (vp.llm.chat(msg) or "").strip()
     # попытка распарсить
@@ -56,18 +54,18 @@ def _combined(rule_score: int, llm_score: int)->int:
     # комбинированная оценка, чуть больше веса у правил (они точные)
     return int(round(0.6*rule_score + 0.4*llm_score))
 
-def analyze_reply(history: Optional[List[dict]], reply: str, stage: Optional[str]=None)->dict:
+def analyze_reply(history: Optional[List[dict]], reply: str, stage: Optional[str]=None, session_id: Optional[str]=None)->dict:
     r = _apply_rules(reply or "")
-    l = _llm_score(history, reply or "", stage)
+    l = _llm_score(history, reply or "", stage, session_id)
     combined = _combined(r["rule_score"], l["llm_score"])
     return {"ok": True, "rule": r, "llm": l, "combined": combined}
 
-def suggest_fix(history: Optional[List[dict]], reply: str, stage: Optional[str]=None)->dict:
+def suggest_fix(history: Optional[List[dict]], reply: str, stage: Optional[str]=None, session_id: Optional[str]=None)->dict:
     # короткая «правильная» версия ответа
-    vp = VoicePipeline()
+    vp = get_pipeline()
     msg = [
         {"role":"system","content":"Ты строгий коуч. Перепиши ответ так, чтобы он соответствовал лучшей практике: ценность→короткий аргумент→уточняющий вопрос→мягкое CTA. 2–4 фразы."},
-        {"role":"user","content": json.dumps({"bad_reply":reply, "stage":stage, "history":history or []}, ensure_ascii=False)[:2000]}
+        {"role":"user","content": _payload(history, reply or "", stage, session_id, "bad_reply")}
     ]
     fix = vp.llm.chat(msg)
     return {"ok": True, "suggestion": fix}
@@ -1,39 +1,64 @@
 
 import re
+from core.keywords.v1 import KeywordIndex
+from core.metrics.v1 import timed
 
 WARM_WORDS = ["🥰","🌸","💛","💫","❤️","Прекрасно","Чудесно","рада","помочь","красиво","трогательно","спасибо","тепло"]
 EMPATHY_KEYS = ["понимаю","представляю","трогательно","как здорово","спасибо вам","это чудесно","какая история","слышно, что для вас важно"]
 QUESTION_HINTS = ["как","когда","что","кто","почему","зачем","какой","какая","какие"]
+# порядок важен: первая найденная стадия
+STAGE_KEYS = {
+    "story_collection": ["как зовут","расскажите","истори"],
+    "payment": ["предоплат","оплат"],
+    "demo": ["демо"],
+    "upsell": ["подар","акци","в подарок"],
+}
+
+# индексы строятся один раз; тёплые слова — с учётом регистра, остальное — по lower()
+_WARM_IX = KeywordIndex({"warm": WARM_WORDS})
+_LOWER_IX = KeywordIndex({"empathy": EMPATHY_KEYS, "hints": QUESTION_HINTS, "?": ["?"], **STAGE_KEYS}, lower=True)
+
+def _warmth(tag_counts: dict) -> int:
+    return min(100, tag_counts["warm"] * 8)
+
+def _empathy(tag_counts: dict) -> int:
+    return min(100, tag_counts["empathy"] * 12)
+
+def _questions(tag_counts: dict, tags: dict) -> int:
+    # +bonus for open questions
+    return min(100, tag_counts["?"]*15 + tags["hints"]*3)
+
+def _stage(tags: dict) -> str:
+    for stage in STAGE_KEYS:
+        if tags[stage]:
+            return stage
+    return "generic"
+
+def _scan(text: str):
+    counts = _LOWER_IX.counts(text)
+    tag_counts = {tag: sum(counts.get(w, 0) for w in ws) for tag, ws in _LOWER_IX.groups.items()}
+    tags = {tag: sum(1 for w in ws if w in counts) for tag, ws in _LOWER_IX.groups.items()}
+    return tag_counts, tags
 
 def score_warmth(text: str) -> int:
-    return min(100, sum(text.count(w) for w in WARM_WORDS) * 8)
+    return _warmth(_WARM_IX.tag_counts(text))
 
 def score_empathy(text: str) -> int:
-    return min(100, sum(text.lower().count(k) for k in EMPATHY_KEYS) * 12)
+    return _empathy(_scan(text)[0])
 
 def score_questions(text: str) -> int:
-    qs = text.count("?")
-    # +bonus for open questions
-    bonus = sum(1 for h in QUESTION_HINTS if h in text.lower())
-    return min(100, qs*15 + bonus*3)
+    return _questions(*_scan(text))
 
 def detect_stage(text: str) -> str:
-    t = text.lower()
-    if "как зовут" in t or "расскажите" in t or "истори" in t:
-        return "story_collection"
-    if "предоплат" in t or "оплат" in t:
-        return "payment"
-    if "демо" in t:
-        return "demo"
-    if "подар" in t or "акци" in t or "в подарок" in t:
-        return "upsell"
-    return "generic"
+    return _stage(_scan(text)[1])
 
+@timed("rules", scorer="trainer_core")
 def evaluate(text: str):
+    tag_counts, tags = _scan(text)
     warm = score_warmth(text)
-    emp = score_empathy(text)
-    q = score_questions(text)
-    stage = detect_stage(text)
+    emp = _empathy(tag_counts)
+    q = _questions(tag_counts, tags)
+    stage = _stage(tags)
     tips = []
     if q < 40:
         tips.append("Добавь 1–2 открытых вопроса, чтобы углубить историю.")
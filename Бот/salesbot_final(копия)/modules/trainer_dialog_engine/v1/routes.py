@@ -1,6 +1,8 @@
 
+import json, asyncio
 from fastapi import APIRouter, Request
-from .service import new_session, turn, stop
+from fastapi.responses import StreamingResponse
+from .service import new_session, turn, turn_stream, stop
 
 router = APIRouter(prefix="/trainer_dialog_engine/v1", tags=["trainer_dialog_engine"])
 
@@ -12,7 +14,16 @@ async def start(req: Request):
 @router.post("/turn")
 async def go(req: Request):
     data = await req.json()
-    return turn(data.get("sid"), data.get("text",""))
+    # persona_chat — синхронный вызов LLM: в поток, чтобы не держать event loop
+    return await asyncio.to_thread(turn, data.get("sid"), data.get("text",""))
+
+@router.post("/turn_stream")
+async def go_stream(req: Request):
+    data = await req.json()
+    async def lines():
+        async for ev in turn_stream(data.get("sid"), data.get("text","")):
+            yield json.dumps(ev, ensure_ascii=False) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @router.post("/stop")
 async def fin(req: Request):
@@ -1,16 +1,27 @@
 
 import os, json, time, uuid
+from core.metrics.v1 import timed
 
 SESS_PATH = os.path.join(os.path.dirname(__file__), "data")
 
 def _path(sid: str):
+    os.makedirs(SESS_PATH, exist_ok=True)
     return os.path.join(SESS_PATH, f"{sid}.json")
 
+@timed("session_io", op="load", module="trainer_dialog_engine")
+def _load(p: str) -> dict:
+    with open(p,"r",encoding="utf-8") as f:
+        return json.load(f)
+
+@timed("session_io", op="save", module="trainer_dialog_engine")
+def _save(p: str, rec: dict):
+    with open(p,"w",encoding="utf-8") as f:
+        json.dump(rec,f,ensure_ascii=False,indent=2)
+
 def new_session(manager_id: str, scenario_id: str):
     sid = str(uuid.uuid4())
     rec = {"sid": sid, "manager_id": manager_id, "scenario_id": scenario_id, "history": [], "created": time.time()}
-    with open(_path(sid),"w",encoding="utf-8") as f:
-        json.dump(rec,f,ensure_ascii=False,indent=2)
+    _save(_path(sid), rec)
     return rec
 
 def _persona_reply(user_text: str) -> str:
@@ -20,6 +31,16 @@ def _persona_reply(user_text: str) -> str:
     except Exception:
         return "Интересно, а как это будет звучать? И сколько по времени?"
 
+async def _persona_stream(user_text: str):
+    try:
+        from modules.deepseek_persona.v1.service import persona_stream
+        stream = persona_stream(f"Ответь как клиент бренда на: {user_text}", role="client_emotional")
+    except Exception:
+        yield "Интересно, а как это будет звучать? И сколько по времени?"
+        return
+    async for chunk in stream:
+        yield chunk
+
 def _evaluate(text: str):
     try:
         from modules.trainer_core.v1.service import evaluate
@@ -31,19 +52,42 @@ def turn(sid: str, text: str):
     p = _path(sid)
     if not os.path.exists(p):
         return {"error":"session_not_found"}
-    rec = json.load(open(p,"r",encoding="utf-8"))
+    rec = _load(p)
     eval_res = _evaluate(text)
     rec["history"].append({"role":"manager","text":text,"eval":eval_res})
     reply = _persona_reply(text)
     rec["history"].append({"role":"client","text":reply})
-    json.dump(rec, open(p,"w",encoding="utf-8"), ensure_ascii=False, indent=2)
+    _save(p, rec)
     return {"reply": reply, "eval": eval_res, "sid": sid}
 
+async def turn_stream(sid: str, text: str):
+    """
+    Потоковый вариант turn(): события по мере готовности —
+    {"type":"eval"} сразу, затем {"type":"delta","text":...} кусками ответа клиента,
+    в конце {"type":"done","reply":...}.
+    """
+    p = _path(sid)
+    if not os.path.exists(p):
+        yield {"type":"error","error":"session_not_found"}
+        return
+    rec = _load(p)
+    eval_res = _evaluate(text)
+    rec["history"].append({"role":"manager","text":text,"eval":eval_res})
+    yield {"type":"eval","eval":eval_res,"sid":sid}
+    parts = []
+    async for chunk in _persona_stream(text):
+        parts.append(chunk)
+        yield {"type":"delta","text":chunk}
+    reply = "".join(parts)
+    rec["history"].append({"role":"client","text":reply})
+    _save(p, rec)
+    yield {"type":"done","reply":reply,"eval":eval_res,"sid":sid}
+
 def stop(sid: str):
     p = _path(sid)
     if not os.path.exists(p):
         return {"error":"session_not_found"}
-    rec = json.load(open(p,"r",encoding="utf-8"))
+    rec = _load(p)
     scores = [h.get("eval",{}).get("scores",{}) for h in rec["history"] if h["role"]=="manager"]
     def avg(key):
         vals = [s.get(key,0) for s in scores]
@@ -1,10 +1,11 @@
 
 import json, os
+from core.resources.v1 import load_json
 BASE = os.path.dirname(__file__)
 RUB = os.path.join(BASE,"data","rubric.json")
 
 def grade(session_report: dict)->dict:
-    r = json.load(open(RUB,"r",encoding="utf-8"))
+    r = load_json(RUB)
     w = r["weights"]
     s = session_report.get("scores",{})
     total = int(
@@ -1,11 +1,11 @@
 
 import json, os, random
+from core.resources.v1 import load_json
 BASE = os.path.dirname(__file__)
 DATA = os.path.join(BASE, "data", "scenarios.json")
 
 def load():
-    with open(DATA,"r",encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(DATA)
 
 def list_scenarios():
     return load()["catalog"]
@@ -1,10 +1,11 @@
 
 import json, os
+from core.resources.v1 import load_json
 BASE = os.path.dirname(__file__)
 CHK = os.path.join(BASE,"data","checklist.json")
 
 def load():
-    return json.load(open(CHK,"r",encoding="utf-8"))
+    return load_json(CHK)
 
 def evaluate_story(payload: dict)->dict:
     data = load()
@@ -1,8 +1,8 @@
 
 import json, random
 from dataclasses import dataclass, asdict
-from core.state.v1 import StateStore
-from core.voice_gateway.v1 import VoicePipeline
+from core.state.v1 import get_store
+from core.voice_gateway.v1 import get_pipeline
 
 MODES = ["soft","normal","aggressive"]
 PACKAGES = {
@@ -23,7 +23,7 @@ class USState:
 class UpsellEngine:
     def __init__(self, sid:str):
         self.sid=f"us:{sid}"
-        self.store=StateStore("salesbot.db")
+        self.store=get_store("salesbot.db")
         raw=self.store.get(self.sid)
         if raw:
             try:
@@ -34,7 +34,7 @@ class UpsellEngine:
         else:
             self._reset()
         try:
-            self.llm=VoicePipeline().llm
+            self.llm=get_pipeline().llm
         except:
             self.llm=None
 
@@ -50,22 +50,16 @@ class UpsellEngine:
     def snapshot(self):
         return self.state.to_dict()
 
-    def handle(self, text:str)->dict:
+    def _prompt(self, text:str)->list:
         self.state.history.append({"role":"user","content":text})
         pkg_desc=PACKAGES[self.state.package]
         mode=self.state.mode
+        return [
+          {"role":"system","content":f"Ты клиент. Сценарий допродажи: {mode}. Пакет предлагается: {pkg_desc}."},
+          {"role":"user","content":text}
+        ]
 
-        suggestion=None
-        if self.llm:
-            try:
-                msg=[
-                  {"role":"system","content":f"Ты клиент. Сценарий допродажи: {mode}. Пакет предлагается: {pkg_desc}."},
-                  {"role":"user","content":text}
-                ]
-                suggestion=self.llm.chat(msg)
-            except:
-                suggestion=None
-
+    def _finish(self, text:str, suggestion)->dict:
         score=0
         if any(w in text.lower() for w in ["получите","давайте","предлагаю","выгода"]):
             score+=1
@@ -75,12 +69,32 @@ class UpsellEngine:
         self._save()
 
         return {
-            "mode":mode,
+            "mode":self.state.mode,
             "package":self.state.package,
             "client_reply":suggestion,
             "score":score
         }
 
+    def handle(self, text:str)->dict:
+        msg=self._prompt(text)
+        suggestion=None
+        if self.llm:
+            try:
+                suggestion=self.llm.chat(msg)
+            except:
+                suggestion=None
+        return self._finish(text, suggestion)
+
+    async def ahandle(self, text:str)->dict:
+        msg=self._prompt(text)
+        suggestion=None
+        if self.llm:
+            try:
+                suggestion=await self.llm.achat(msg)
+            except:
+                suggestion=None
+        return self._finish(text, suggestion)
+
     def reset(self):
         self._reset()
         return {"ok":True}
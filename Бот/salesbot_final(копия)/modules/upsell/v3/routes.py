@@ -44,7 +44,7 @@ async def start(sid:str):
 @router.post("/handle/{sid}")
 async def handle(sid:str, text:str):
     eng=UpsellEngine(sid)
-    return eng.handle(text)
+    return await eng.ahandle(text)
 
 @router.get("/snapshot/{sid}")
 async def snapshot(sid:str):
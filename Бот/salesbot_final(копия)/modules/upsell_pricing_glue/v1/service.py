@@ -1,7 +1,7 @@
 
 import json, math
 from typing import Dict, Any, List, Optional
-from core.voice_gateway.v1 import VoicePipeline
+from core.voice_gateway.v1 import get_pipeline
 
 def _sum_items(items: List[dict])->float:
     return float(sum(max(0.0, float(x.get("price",0))) for x in (items or [])))
@@ -52,7 +52,7 @@ def suggest_upsell(catalog: Dict[str,Any], current_tier: str="basic", target_tie
     cur = compute_offer(catalog, current_tier, currency, discount, coupon, vat)
     tgt = compute_offer(catalog, target_tier, currency, discount, coupon, vat)
     diff = max(0.0, tgt["total"] - cur["total"])
-    vp = VoicePipeline()
+    vp = get_pipeline()
     prompt = [
         {"role":"system","content":"Ты жёсткий коуч продаж. Объясни выгоду апгрейда с учётом цены, результата и примеров. Стиль: уверенно, по делу, 2-3 фразы + 1 вопрос."},
         {"role":"user","content": json.dumps({"current":cur,"target":tgt,"context":context}, ensure_ascii=False)}
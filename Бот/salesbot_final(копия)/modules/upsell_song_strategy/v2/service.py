@@ -1,13 +1,13 @@
 
 import json, os
 from typing import Dict, Any, List
+from core.resources.v1 import load_json
 
 BASE = os.path.dirname(__file__)
 DATA = os.path.join(BASE, "data", "upsell_scripts.json")
 
 def _load()->Dict[str, Any]:
-    with open(DATA, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_json(DATA)
 
 def warmup_message()->str:
     return _load().get("warmup_before_texts","")
@@ -1,6 +1,7 @@
 
 import os, json, time, uuid
 from typing import Dict, Any, List, Optional
+from core.metrics.v1 import timed
 
 BASE = os.path.dirname(__file__)
 DATA = os.path.join(BASE, "data", "sessions")
@@ -19,10 +20,10 @@ def new_session(manager_id: str, context: str="")->dict:
         "history": [],   # {role: manager|client, content, metrics?}
         "last_metrics": {}
     }
-    with open(_path(manager_id, sid), "w", encoding="utf-8") as f:
-        json.dump(rec, f, ensure_ascii=False, indent=2)
+    save_session(rec)
     return rec
 
+@timed("session_io", op="load", module="voice_arena")
 def load_session(manager_id: str, session_id: str)->Optional[dict]:
     p = _path(manager_id, session_id)
     if not os.path.exists(p):
@@ -30,6 +31,7 @@ def load_session(manager_id: str, session_id: str)->Optional[dict]:
     with open(p,"r",encoding="utf-8") as f:
         return json.load(f)
 
+@timed("session_io", op="save", module="voice_arena")
 def save_session(rec: dict):
     with open(_path(rec["manager_id"], rec["session_id"]), "w", encoding="utf-8") as f:
         json.dump(rec, f, ensure_ascii=False, indent=2)
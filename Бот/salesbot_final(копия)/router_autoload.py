@@ -1,5 +1,8 @@
 from fastapi import FastAPI
-import importlib
+from starlette.routing import BaseRoute, Match, NoMatchFound, compile_path
+from starlette._utils import get_route_path
+from typing import Dict, List, Optional
+import asyncio, hashlib, importlib, json, os, re, threading, time, tracemalloc
 ROUTE_MODULES = [
     # Публичные API
     "api.public.v1.routes",
@@ -27,6 +30,8 @@ ROUTE_MODULES = [
     # Доп-модули
     "modules.voice_arena.v1.routes",
     "modules.dialog_memory.v1.routes",
+    "modules.objections_classifier.v1.routes",
+    "modules.sleeping_dragon_rules.v1.routes",
     "modules.edu_lessons.v1.routes",
     "modules.client_cases.v1.routes",
     "modules.sales_commission.v1.routes",
@@ -46,20 +51,265 @@ ROUTE_MODULES = [
     "integrations.telegram_push.v1.routes",
     "integrations.telegram_bot.v1.routes",
 ]
-def include_all(app: FastAPI)->None:
-    attached = []
-    errors = []
-    for m in ROUTE_MODULES:
+# Стартовые ручки модулей для манифеста команд (порядок = приоритет)
+START_SUFFIXES = ("/start", "/start_session", "/run", "/init")
+
+def _module_of(import_path: str):
+    # 'modules.master_path.v3.routes' -> ('master_path', 'v3')
+    parts = import_path.split(".")
+    if len(parts) >= 3 and parts[0] == "modules":
+        version = next((p for p in parts[2:5] if re.match(r"^v\d+$", p)), "")
+        return parts[1], version
+    return "", ""
+
+def build_commands(post_paths: Dict[str, List[str]]) -> dict:
+    """
+    Манифест команд бота: по модулю — его стартовая POST-ручка.
+    version — хэш содержимого: клиент сверяет им свой кэш.
+    """
+    commands = []
+    for imp, paths in post_paths.items():
+        module, version = _module_of(imp)
+        if not module:
+            continue
+        endpoint = next((p for suf in START_SUFFIXES for p in paths if p.endswith(suf) and "{" not in p), "")
+        if endpoint:
+            commands.append({
+                "command": f"/{module}",
+                "module": module,
+                "version": version,
+                "endpoint": endpoint,
+                "method": "POST",
+                "description": f"{module} ({version or 'no-version'})",
+            })
+    digest = hashlib.sha1(json.dumps(commands, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return {"version": digest, "commands": commands}
+
+# Ленивый режим (ROUTER_LAZY=1): роуты регистрируются по статическому манифесту
+# router_manifest.json, модуль импортируется при первом запросе к нему или фоновым
+# прогревом после старта (ROUTER_WARMUP=0 — выключить, ROUTER_WARMUP_DELAY — пауза, сек).
+# Манифест: python router_autoload.py --manifest. Модули, которых нет в манифесте,
+# подключаются сразу. ROUTER_PROFILE_MEMORY=1 — замер памяти импорта (tracemalloc).
+# В /openapi.json ещё не подключённые модули есть по манифесту: пути, методы и
+# path-параметры без схем тел и ответов; полная схема — после импорта модуля.
+MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "router_manifest.json")
+
+def _env_on(name: str, default: str = "0") -> bool:
+    return os.environ.get(name, default).lower() in ("1", "true", "yes", "on")
+
+def _route_info(router) -> List[dict]:
+    return [{"path": r.path, "methods": sorted(getattr(r, "methods", None) or [])}
+            for r in router.routes if getattr(r, "path", None)]
+
+def _post_paths(routes: List[dict]) -> List[str]:
+    return [r["path"] for r in routes if "POST" in r["methods"]]
+
+def load_manifest(path: str = MANIFEST) -> Dict[str, List[dict]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("modules") or {}
+    except Exception:
+        return {}
+
+
+class LazyRoute(BaseRoute):
+    """Заглушка модуля: совпадает с его путями, первый запрос подключает модуль."""
+
+    def __init__(self, mounter: "RouteMounter", module: str, paths: List[str]):
+        self.mounter = mounter
+        self.module = module
+        self.paths = paths
+        self._rx = [compile_path(p)[0] for p in paths]
+
+    def matches(self, scope):
+        if scope["type"] in ("http", "websocket"):
+            path = get_route_path(scope)
+            if any(rx.match(path) for rx in self._rx):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params):
+        raise NoMatchFound(name, path_params)
+
+    async def handle(self, scope, receive, send):
+        await self.mounter.aload(self.module, "first_hit")
+        # заглушки уже нет — маршрутизируем заново по настоящим роутам
+        await self.mounter.app.router(scope, receive, send)
+
+
+class RouteMounter:
+    def __init__(self, app: FastAPI, profile_memory: bool = False):
+        self.app = app
+        self.profile_memory = profile_memory
+        self.attached: List[str] = []
+        self.errors: list = []
+        self.profile: Dict[str, dict] = {}
+        self.routes: Dict[str, List[dict]] = {}
+        self.lazy: Dict[str, LazyRoute] = {}
+        self.started_tracing = False
+        self._lock = threading.Lock()
+
+    def _import(self, m: str):
+        # время и (по желанию) память импорта модуля вместе с его новыми зависимостями
+        mem0 = tracemalloc.get_traced_memory()[0] if self.profile_memory else 0
+        t0 = time.perf_counter()
         try:
-            mod = importlib.import_module(m)
-            router = getattr(mod, "router", None)
-            if router is None:
-                continue
-            app.include_router(router)
-            attached.append(m)
+            return importlib.import_module(m), None
         except Exception as e:
-            errors.append((m, str(e)))
+            return None, e
+        finally:
+            prof = self.profile.setdefault(m, {})
+            prof["import_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            if self.profile_memory:
+                prof["mem_kb"] = round((tracemalloc.get_traced_memory()[0] - mem0) / 1024, 1)
+
+    def _mount(self, m: str, mod, err, how: str) -> None:
+        with self._lock:
+            placeholder = self.lazy.pop(m, None)
+            if err is not None:
+                self.errors.append((m, str(err)))
+            router = getattr(mod, "router", None) if mod is not None else None
+            routes = self.app.router.routes
+            if router is not None and m not in self.attached:
+                n = len(routes)
+                self.app.include_router(router)
+                self.attached.append(m)
+                self.routes[m] = _route_info(router)
+                if placeholder is not None:
+                    # настоящие роуты встают на место заглушки: порядок матчинга прежний
+                    new = routes[n:]
+                    del routes[n:]
+                    i = routes.index(placeholder)
+                    routes[i:i + 1] = new
+                    self.app.openapi_schema = None
+            elif placeholder is not None:
+                routes.remove(placeholder)
+            self.profile.setdefault(m, {}).update(loaded=how, routes=len(self.routes.get(m, [])))
+
+    def load(self, m: str, how: str = "startup") -> None:
+        mod, err = self._import(m)
+        self._mount(m, mod, err, how)
+
+    async def aload(self, m: str, how: str) -> None:
+        if m not in self.lazy:
+            return
+        mod, err = await asyncio.to_thread(self._import, m)
+        if m in self.lazy:
+            self._mount(m, mod, err, how)
+
+    def add_lazy(self, m: str, routes: List[dict]) -> None:
+        route = LazyRoute(self, m, [r["path"] for r in routes])
+        self.lazy[m] = route
+        self.routes[m] = routes
+        self.app.router.routes.append(route)
+        self.profile[m] = {"loaded": None, "routes": len(routes)}
+
+    def openapi_paths(self) -> Dict[str, dict]:
+        """Заготовки OpenAPI для ещё не подключённых модулей — по путям и методам из манифеста."""
+        paths: Dict[str, dict] = {}
+        with self._lock:
+            lazy = {m: list(self.routes.get(m, [])) for m in self.lazy}
+        for m, routes in lazy.items():
+            tag = _module_of(m)[0] or m
+            for r in routes:
+                _, fmt, convertors = compile_path(r["path"])
+                params = [{"name": name, "in": "path", "required": True, "schema": {"type": "string"}}
+                          for name in convertors]
+                op_base = re.sub(r"\W", "_", fmt).strip("_")
+                for method in r["methods"]:
+                    op = {
+                        "tags": [tag],
+                        "summary": fmt,
+                        "description": f"{m}: модуль ещё не загружен (ROUTER_LAZY=1), схема появится после первого запроса",
+                        "operationId": f"lazy_{op_base}_{method.lower()}",
+                        "responses": {"200": {"description": "Successful Response"}},
+                    }
+                    if params:
+                        op["parameters"] = params
+                    paths.setdefault(fmt, {})[method.lower()] = op
+        return paths
+
+    async def warmup(self, delay: float = 0.0) -> None:
+        for m in list(self.lazy):
+            await asyncio.sleep(delay)
+            await self.aload(m, "warmup")
+        if self.profile_memory and self.started_tracing:
+            tracemalloc.stop()
+
+    def summary(self) -> dict:
+        return {
+            # attached — реально смонтированные; lazy — ещё не импортированные (смонтируются на первом запросе)
+            "attached": list(self.attached),
+            "errors": self.errors,
+            "lazy": sorted(self.lazy),
+            "import_ms_total": round(sum(p.get("import_ms", 0) for p in self.profile.values()), 1),
+            "modules": self.profile,
+        }
+
+
+def include_all(app: FastAPI, lazy: Optional[bool] = None)->None:
+    lazy = _env_on("ROUTER_LAZY") if lazy is None else lazy
+    mounter = RouteMounter(app, profile_memory=_env_on("ROUTER_PROFILE_MEMORY"))
+    manifest = load_manifest() if lazy else {}
+    if mounter.profile_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        mounter.started_tracing = True
+    for m in ROUTE_MODULES:
+        if m in manifest:
+            mounter.add_lazy(m, manifest[m])
+        else:
+            mounter.load(m)
+    if mounter.started_tracing and not mounter.lazy:
+        tracemalloc.stop()
+    commands = build_commands({m: _post_paths(r) for m, r in mounter.routes.items()})
+    app.state.route_mounter = mounter
+
+    if mounter.lazy:
+        base_openapi = app.openapi
+
+        def openapi_with_lazy():
+            # LazyRoute не APIRoute и в схему не попадает — добавляем пути из манифеста;
+            # _mount сбрасывает app.openapi_schema, и подключённый модуль даёт полную схему
+            if app.openapi_schema is None:
+                schema = base_openapi()
+                for path, ops in mounter.openapi_paths().items():
+                    item = schema.setdefault("paths", {}).setdefault(path, {})
+                    for method, op in ops.items():
+                        item.setdefault(method, op)
+            return app.openapi_schema
+        app.openapi = openapi_with_lazy
+
+    if mounter.lazy and _env_on("ROUTER_WARMUP", "1"):
+        delay = float(os.environ.get("ROUTER_WARMUP_DELAY", "0"))
+
+        async def _warmup_routes():
+            asyncio.get_running_loop().create_task(mounter.warmup(delay))
+        app.router.add_event_handler("startup", _warmup_routes)
 
     @app.get("/api/public/v1/routes_summary")
     async def routes_summary():
-        return {"attached": attached, "errors": errors}
+        # attached / errors + время (и память) импорта по модулям
+        return mounter.summary()
+
+    @app.get("/api/public/v1/commands")
+    async def commands_manifest():
+        # бот берёт команды отсюда и не пробует ручки вслепую
+        return commands
+
+
+def write_manifest(path: str = MANIFEST) -> dict:
+    """Статический манифест роутов для ленивого режима (импортирует все модули)."""
+    app = FastAPI()
+    mounter = RouteMounter(app)
+    for m in ROUTE_MODULES:
+        mounter.load(m)
+    data = {"modules": {m: mounter.routes[m] for m in mounter.attached}}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    return {"modules": len(data["modules"]), "errors": mounter.errors}
+
+
+if __name__ == "__main__":
+    import sys
+    if "--manifest" in sys.argv:
+        print(json.dumps(write_manifest(), ensure_ascii=False, indent=1))
@@ -17,12 +17,12 @@ from aiogram.utils import executor
 
 # Подключаем автозагрузчик модулей для telegram
 from telegram.autoload import autoload_telegram_handlers
-from api.core.registry import ModuleRegistry
+from api.core.registry import get_registry
 
 def main():
     bot = Bot(token=TELEGRAM_TOKEN)
     dp = Dispatcher(bot)
-    registry = ModuleRegistry()
+    registry = get_registry()
 
     # Автозагрузка телеграм-хэндлеров из пакета modules
     autoload_telegram_handlers(dp, registry, package_name="modules")
@@ -5,8 +5,15 @@ import time
 import requests
 import json
 import re
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Tuple, List
 
+from core.telegram.v1 import get_sender, split_text
+from api.core.registry import get_registry
+
 # ============ SETTINGS ============
 BACKEND_URL = (os.getenv("BACKEND_URL") or "http://127.0.0.1:8080").rstrip("/")
 # token names supported by your bat files; add more if your bat uses another name
@@ -17,6 +24,16 @@ TOKEN = (
     or os.getenv("TOKEN")
 )
 ADMIN_CHAT_ID = os.getenv("ADMIN_CHAT_ID")  # optional
+# stream client replies into the chat via editMessageText (set BOT_STREAMING=0 to disable)
+STREAMING = os.getenv("BOT_STREAMING", "1").lower() not in ("0", "false", "no", "off")
+STREAM_EDIT_INTERVAL = float(os.getenv("BOT_STREAM_EDIT_INTERVAL", "1.0"))
+# parallel chats (each chat is still handled strictly in order) and max queued updates
+WORKERS = max(1, int(os.getenv("BOT_WORKERS", "8")))
+MAX_PENDING = max(WORKERS, int(os.getenv("BOT_MAX_PENDING", "200")))
+# discovered module commands are cached on disk; reused while fresh and matching the backend version
+COMMANDS_CACHE = os.getenv("BOT_COMMANDS_CACHE") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bot_commands_cache.json")
+COMMANDS_TTL = float(os.getenv("BOT_COMMANDS_TTL", "86400"))
+PROBE_WORKERS = max(1, int(os.getenv("BOT_PROBE_WORKERS", "16")))
 
 if not TOKEN:
     print("❌ Нет TELEGRAM токена в переменных окружения. Проверьте start_core_api.bat")
@@ -33,19 +50,52 @@ def log(*args):
     ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
     print(f"[{ts}] [BOT]", *args)
 
-# Telegram helpers
+# Pooled HTTP: one keep-alive requests.Session per worker thread
+_HTTP = threading.local()
+
+def http() -> requests.Session:
+    s = getattr(_HTTP, "session", None)
+    if s is None:
+        s = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        _HTTP.session = s
+    return s
+
+# Telegram helpers: all Bot API writes go through the shared outbound queue
+# (global + per-chat pacing, 429 retry_after, long texts split into parts)
+def tg():
+    return get_sender(TOKEN)
+
 def send_message(chat_id: int, text: str):
-    """Send text to Telegram (safe)."""
+    """Send text to Telegram (safe). Returns message_id (of the first part) or None."""
     try:
-        resp = requests.post(
-            BASE_URL + "/sendMessage",
-            json={"chat_id": chat_id, "text": text},
-            timeout=10,
-        )
-        if not resp.ok:
-            log("Ошибка sendMessage:", resp.status_code, resp.text)
+        res = tg().send_message(chat_id, text)
+        if not res.get("ok"):
+            log("Ошибка sendMessage:", res.get("status"), res.get("data") or res.get("error"))
+            return None
+        return ((res.get("data") or {}).get("result") or {}).get("message_id")
     except Exception as e:
         log("Ошибка отправки в Telegram:", e)
+        return None
+
+def edit_message(chat_id: int, message_id: int, text: str, final: bool = True):
+    """
+    Replace text of an already sent message (safe).
+    final=True: overflow beyond 4096 chars goes out once as new messages;
+    final=False (intermediate streaming edits): only the head is shown.
+    """
+    try:
+        head, *rest = split_text(text)
+        res = tg().call("editMessageText", {"chat_id": chat_id, "message_id": message_id, "text": head})
+        if not res.get("ok"):
+            log("Ошибка editMessageText:", res.get("status"), res.get("data") or res.get("error"))
+        if final:
+            for part in rest:
+                send_message(chat_id, part)
+    except Exception as e:
+        log("Ошибка редактирования в Telegram:", e)
 
 def get_session(chat_id: int):
     if chat_id not in SESSIONS:
@@ -57,7 +107,7 @@ def api_start_session(manager_id: str, scenario_id: str = "cold_start_warm") ->
     url = BACKEND_URL + "/trainer_dialog_engine/v1/start"
     log("CALL /trainer_dialog_engine/v1/start", manager_id, scenario_id)
     try:
-        r = requests.post(url, json={"manager_id": manager_id, "scenario_id": scenario_id}, timeout=10)
+        r = http().post(url, json={"manager_id": manager_id, "scenario_id": scenario_id}, timeout=10)
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -68,18 +118,32 @@ def api_turn(sid: str, text: str) -> dict:
     url = BACKEND_URL + "/trainer_dialog_engine/v1/turn"
     log("CALL /trainer_dialog_engine/v1/turn", sid, "text:", text[:50])
     try:
-        r = requests.post(url, json={"sid": sid, "text": text}, timeout=15)
+        r = http().post(url, json={"sid": sid, "text": text}, timeout=15)
         r.raise_for_status()
         return r.json()
     except Exception as e:
         log("Ошибка вызова /trainer turn:", e)
         return {"error": str(e)}
 
+def api_turn_stream(sid: str, text: str):
+    """
+    Streaming variant of api_turn: yields NDJSON events from
+    /trainer_dialog_engine/v1/turn_stream ("eval", "delta", "done", "error").
+    Raises if the endpoint is unavailable.
+    """
+    url = BACKEND_URL + "/trainer_dialog_engine/v1/turn_stream"
+    log("CALL /trainer_dialog_engine/v1/turn_stream", sid, "text:", text[:50])
+    with http().post(url, json={"sid": sid, "text": text}, timeout=15, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if line:
+                yield json.loads(line)
+
 def api_stop(sid: str) -> dict:
     url = BACKEND_URL + "/trainer_dialog_engine/v1/stop"
     log("CALL /trainer_dialog_engine/v1/stop", sid)
     try:
-        r = requests.post(url, json={"sid": sid}, timeout=10)
+        r = http().post(url, json={"sid": sid}, timeout=10)
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -105,7 +169,7 @@ def fetch_routes_summary() -> Dict:
     """
     url = BACKEND_URL + "/api/public/v1/routes_summary"
     try:
-        r = requests.get(url, timeout=5)
+        r = http().get(url, timeout=5)
         r.raise_for_status()
         return r.json()
     except Exception as e:
@@ -130,6 +194,18 @@ def parse_attached_module_name(import_path: str) -> Tuple[str, str]:
         return name, version
     return "", ""
 
+def _probe(candidate: str) -> bool:
+    url = BACKEND_URL + candidate
+    try:
+        # POST a lightweight probe; backend should respond quickly
+        r = http().post(url, json={"probe": True, "chat_id": 0}, timeout=5)
+        # Accept any 2xx as success; 404/405 -> next candidate
+        log("Probe candidate", candidate, "->", r.status_code)
+        return 200 <= r.status_code < 300
+    except Exception as e:
+        log("Probe candidate", candidate, "failed:", e)
+        return False
+
 def probe_module_endpoint(module: str, version: str) -> str:
     """
     Try to find a working endpoint for module/version by POSTing empty chat_id.
@@ -137,102 +213,133 @@ def probe_module_endpoint(module: str, version: str) -> str:
     """
     for pattern in PROBE_PATTERNS:
         candidate = pattern.format(module=module, version=version)
-        url = BACKEND_URL + candidate
-        try:
-            # POST a lightweight probe; backend should respond quickly
-            r = requests.post(url, json={"probe": True, "chat_id": 0}, timeout=5)
-            # Accept any 2xx as success
-            if 200 <= r.status_code < 300:
-                log("Probe OK:", candidate, "status", r.status_code)
-                return candidate
-            else:
-                # If backend returns 404/405, try next
-                log("Probe candidate", candidate, "->", r.status_code)
-        except Exception as e:
-            log("Probe candidate", candidate, "failed:", e)
-            # continue trying
+        if _probe(candidate):
+            return candidate
     return ""
 
-def build_module_commands_from_backend() -> Dict[str, Tuple[str, str]]:
+def fetch_commands_manifest() -> Dict:
+    """Backend command manifest: /api/public/v1/commands -> {"version", "commands": [...]}"""
+    try:
+        r = http().get(BACKEND_URL + "/api/public/v1/commands", timeout=5)
+        if r.status_code == 404:
+            return {}
+        r.raise_for_status()
+        return r.json()
+    except Exception as e:
+        log("Не удалось запросить манифест команд:", e)
+        return {}
+
+def build_module_commands_from_backend(attached: List[str]) -> Dict[str, Tuple[str, str]]:
     """
-    Query backend to discover attached modules and probe for working start endpoints.
+    Older backends without the manifest: probe start endpoints of attached modules.
+    Modules are probed concurrently; within a module candidates go one by one in
+    PROBE_PATTERNS order and stop at the first 2xx, so side-effecting fallbacks
+    (/run, /init) are never hit when /start already answers.
     Returns mapping: "/module" -> (endpoint_path, description)
     """
-    commands = {}
-    rs = fetch_routes_summary()
-    attached = rs.get("attached") or []
-    if not attached:
-        log("routes_summary returned no attached modules; fallback to fs-scan")
-        return commands
-
-    log("routes_summary attached modules count:", len(attached))
+    plan = []
     for imp in attached:
         module, version = parse_attached_module_name(imp)
         if not module:
             continue
-        # attempt to probe with version first
-        endpoint = ""
-        if version:
-            endpoint = probe_module_endpoint(module, version)
-        # if probe with version failed, also try without version
-        if not endpoint:
-            endpoint = probe_module_endpoint(module, "")
+        # with version first, then without version
+        candidates = []
+        for v in ([version] if version else []) + [""]:
+            for pattern in PROBE_PATTERNS:
+                c = pattern.format(module=module, version=v)
+                if "//" not in c and c not in candidates:
+                    candidates.append(c)
+        plan.append((module, version, candidates))
+
+    def first_ok(candidates: List[str]) -> str:
+        return next((c for c in candidates if _probe(c)), "")
+
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="probe") as pool:
+        found = list(pool.map(first_ok, [cs for _, _, cs in plan]))
+    commands = {}
+    for (module, version, _), endpoint in zip(plan, found):
         if endpoint:
-            cmd = f"/{module}"
-            desc = f"{module} ({version or 'no-version'})"
-            commands[cmd] = (endpoint, desc)
+            commands[f"/{module}"] = (endpoint, f"{module} ({version or 'no-version'})")
         else:
             log("No start endpoint found for", module, version)
     return commands
 
-# Fallback: local fs scanning (previous behaviour)
+def _load_commands_cache() -> dict:
+    try:
+        with open(COMMANDS_CACHE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("backend") != BACKEND_URL or time.time() - float(data.get("ts", 0)) > COMMANDS_TTL:
+            return {}
+        return data
+    except Exception:
+        return {}
+
+def _save_commands_cache(version: str, commands: Dict[str, Tuple[str, str]]) -> None:
+    try:
+        tmp = COMMANDS_CACHE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"backend": BACKEND_URL, "version": version, "ts": time.time(),
+                       "commands": {k: list(v) for k, v in commands.items()}}, f, ensure_ascii=False)
+        os.replace(tmp, COMMANDS_CACHE)
+    except Exception as e:
+        log("Не удалось сохранить кэш команд:", e)
+
+def discover_module_commands() -> Dict[str, Tuple[str, str]]:
+    """
+    1) backend manifest (no probing at all)
+    2) routes_summary + concurrent probing, skipped when the disk cache matches the attached set
+    3) disk cache within TTL if the backend is unreachable
+    Empty result -> caller falls back to fs-scan.
+    """
+    cache = _load_commands_cache()
+    cached = {k: tuple(v) for k, v in (cache.get("commands") or {}).items()}
+
+    manifest = fetch_commands_manifest()
+    if manifest.get("commands") is not None:
+        commands = {c["command"]: (c["endpoint"], c.get("description") or c["module"]) for c in manifest["commands"]}
+        if cache.get("version") != manifest.get("version"):
+            _save_commands_cache(manifest.get("version") or "", commands)
+        log("Команды из манифеста backend:", len(commands))
+        return commands
+
+    rs = fetch_routes_summary()
+    # lazy modules are not imported yet but their routes mount on first hit
+    attached = (rs.get("attached") or []) + [m for m in rs.get("lazy") or [] if m not in (rs.get("attached") or [])]
+    if not attached:
+        if cached:
+            log("backend недоступен; команды из кэша", COMMANDS_CACHE)
+            return cached
+        log("routes_summary returned no attached modules; fallback to fs-scan")
+        return {}
+    version = "probe:" + hashlib.sha1("\n".join(sorted(attached)).encode("utf-8")).hexdigest()[:16]
+    if cached and cache.get("version") == version:
+        log("Команды из кэша (набор модулей не изменился):", len(cached))
+        return cached
+    log("routes_summary attached modules count:", len(attached))
+    commands = build_module_commands_from_backend(attached)
+    if commands:
+        _save_commands_cache(version, commands)
+    return commands
+
+# Fallback: local fs scanning via the shared module registry (no imports, one version per module)
 def find_modules_commands_fs() -> Dict[str, Tuple[str, str]]:
-    candidates = []
-    here = os.path.abspath(os.path.dirname(__file__))
-    candidates.append(os.path.join(here, "modules"))
-    candidates.append(os.path.join(here, "..", "modules"))
-    candidates.append(os.path.join(here, "..", "..", "modules"))
-    candidates.append(os.path.join(os.getcwd(), "modules"))
-    modules_dir = None
-    for p in candidates:
-        if os.path.isdir(p):
-            modules_dir = os.path.abspath(p)
-            break
     commands = {}
-    if not modules_dir:
-        log("FS-scan: modules folder not found in candidates", candidates)
-        return commands
-    log("FS-scan modules folder:", modules_dir)
     try:
-        for name in sorted(os.listdir(modules_dir)):
-            item = os.path.join(modules_dir, name)
-            if not os.path.isdir(item):
-                continue
-            if name.startswith(".") or name in ("__pycache__", "tests"):
-                continue
-            versions = []
-            for sub in os.listdir(item):
-                m = re.match(r"^v(\d+)", sub)
-                if m and os.path.isdir(os.path.join(item, sub)):
-                    versions.append((int(m.group(1)), sub))
-            if versions:
-                versions.sort(reverse=True)
-                version = versions[0][1]
-                endpoint = f"/{name}/{version}/start"
-                command = f"/{name}"
-                description = f"{name} ({version})"
-                commands[command] = (endpoint, description)
-            else:
-                endpoint = f"/{name}/start"
-                command = f"/{name}"
-                description = f"{name} (no version)"
-                commands[command] = (endpoint, description)
+        # URL versions: _current resolved to its concrete vN, as the routes are mounted
+        versions = get_registry().route_versions()
     except Exception as e:
         log("Ошибка при FS сканировании modules:", e)
+        return commands
+    for name, version in sorted(versions.items()):
+        if re.match(r"^v\d+$", version):
+            commands[f"/{name}"] = (f"/{name}/{version}/start", f"{name} ({version})")
+        else:
+            commands[f"/{name}"] = (f"/{name}/start", f"{name} (no version)")
+    log("FS-scan modules:", len(commands))
     return commands
 
 # Build MODULE_COMMANDS using backend discovery first, then fs fallback
-MODULE_COMMANDS = build_module_commands_from_backend()
+MODULE_COMMANDS = discover_module_commands()
 if not MODULE_COMMANDS:
     MODULE_COMMANDS = find_modules_commands_fs()
 log("Discovered module commands:", MODULE_COMMANDS)
@@ -300,28 +407,13 @@ def handle_stop_dialog(chat_id: int, session: dict):
     if ADMIN_CHAT_ID and ADMIN_CHAT_ID != "0":
         try:
             admin_msg = f"👤 Менеджер: {chat_id}\nSID: {sid}\n\n" + "\n".join(lines)
-            requests.post(BASE_URL + "/sendMessage", json={"chat_id": int(ADMIN_CHAT_ID), "text": admin_msg}, timeout=10)
+            tg().send_message(int(ADMIN_CHAT_ID), admin_msg, wait=False)
         except Exception as e:
             log("Ошибка отправки админу:", e)
     session["mode"] = None
     session["sid"] = None
 
-def handle_dialog_turn(chat_id: int, text: str, session: dict):
-    sid = session.get("sid")
-    if not sid:
-        send_message(chat_id, "Сессия ещё не запущена. Напиши /train, чтобы начать 🌿")
-        return
-    data = api_turn(sid, text)
-    if "error" in data:
-        if data.get("error") == "session_not_found":
-            send_message(chat_id, "Сессия не найдена. Напиши /train.")
-            session["mode"] = None
-            session["sid"] = None
-            return
-        send_message(chat_id, f"Ошибка при ходе диалога: {data.get('error')}")
-        return
-    reply = data.get("reply", "Клиент пока молчит")
-    eval_res = data.get("eval", {})
+def format_turn(reply: str, eval_res: dict) -> str:
     scores = eval_res.get("scores", {})
     warmth = scores.get("warmth", 0)
     empathy = scores.get("empathy", 0)
@@ -332,7 +424,70 @@ def handle_dialog_turn(chat_id: int, text: str, session: dict):
         msg += "\nРекомендации:\n"
         for t in tips:
             msg += f"• {t}\n"
-    send_message(chat_id, msg)
+    return msg
+
+def handle_turn_error(chat_id: int, session: dict, error):
+    if error == "session_not_found":
+        send_message(chat_id, "Сессия не найдена. Напиши /train.")
+        session["mode"] = None
+        session["sid"] = None
+        return
+    send_message(chat_id, f"Ошибка при ходе диалога: {error}")
+
+def stream_dialog_turn(chat_id: int, sid: str, text: str, session: dict) -> bool:
+    """
+    Show the client reply as it is generated: send a placeholder once,
+    then editMessageText at most every STREAM_EDIT_INTERVAL seconds.
+    Returns False if streaming is unavailable and nothing was sent yet.
+    """
+    message_id = None
+    shown = ""
+    parts: List[str] = []
+    last_edit = 0.0
+    try:
+        for ev in api_turn_stream(sid, text):
+            kind = ev.get("type")
+            if kind == "error":
+                handle_turn_error(chat_id, session, ev.get("error"))
+                return True
+            if kind == "eval":
+                message_id = send_message(chat_id, "🗣 Клиент:\n…")
+                if message_id is None:
+                    return False
+            elif kind == "delta" and message_id is not None:
+                parts.append(ev.get("text") or "")
+                now = time.time()
+                current = "🗣 Клиент:\n" + "".join(parts) + " …"
+                if now - last_edit >= STREAM_EDIT_INTERVAL and current != shown:
+                    edit_message(chat_id, message_id, current, final=False)
+                    shown, last_edit = current, now
+            elif kind == "done" and message_id is not None:
+                reply = ev.get("reply") or "".join(parts) or "Клиент пока молчит"
+                edit_message(chat_id, message_id, format_turn(reply, ev.get("eval") or {}))
+                return True
+    except Exception as e:
+        log("Ошибка потокового хода диалога:", e)
+        if message_id is None:
+            return False
+    if message_id is not None:
+        # stream cut off before "done" — keep what we have
+        edit_message(chat_id, message_id, "🗣 Клиент:\n" + ("".join(parts) or "Клиент пока молчит"))
+        return True
+    return False
+
+def handle_dialog_turn(chat_id: int, text: str, session: dict):
+    sid = session.get("sid")
+    if not sid:
+        send_message(chat_id, "Сессия ещё не запущена. Напиши /train, чтобы начать 🌿")
+        return
+    if STREAMING and stream_dialog_turn(chat_id, sid, text, session):
+        return
+    data = api_turn(sid, text)
+    if "error" in data:
+        handle_turn_error(chat_id, session, data.get("error"))
+        return
+    reply = data.get("reply", "Клиент пока молчит")
+    send_message(chat_id, format_turn(reply, data.get("eval", {})))
 
 # ===================== GENERIC MODULE CALL =====================
 
@@ -345,7 +500,7 @@ def handle_module_command(chat_id: int, session: dict, cmd: str):
     url = BACKEND_URL + endpoint
     log("CALL MODULE", cmd, url)
     try:
-        resp = requests.post(url, json={"chat_id": chat_id}, timeout=15)
+        resp = http().post(url, json={"chat_id": chat_id}, timeout=15)
         resp.raise_for_status()
         try:
             data = resp.json()
@@ -405,25 +560,77 @@ def handle_update(update: dict):
 
 # ===================== MAIN LOOP =====================
 
+def update_chat_id(update: dict):
+    return ((update.get("message") or {}).get("chat") or {}).get("id")
+
+class ChatDispatcher:
+    """
+    Runs handle_update on a bounded thread pool.
+    Updates of one chat go through a per-chat queue drained by a single worker,
+    so their order is kept; different chats run in parallel (up to WORKERS).
+    submit() blocks only when MAX_PENDING updates are queued (backpressure).
+    """
+
+    def __init__(self, workers: int = WORKERS, max_pending: int = MAX_PENDING):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot-chat")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.queues: Dict[object, deque] = {}
+
+    def submit(self, update: dict):
+        self.slots.acquire()
+        key = update_chat_id(update)
+        with self.lock:
+            q = self.queues.get(key)
+            if q is not None:
+                # chat already has a worker draining it
+                q.append(update)
+                return
+            self.queues[key] = deque([update])
+        self.pool.submit(self._drain, key)
+
+    def _drain(self, key):
+        while True:
+            with self.lock:
+                q = self.queues[key]
+                if not q:
+                    del self.queues[key]
+                    return
+                update = q.popleft()
+            try:
+                handle_update(update)
+            except Exception as e:
+                log("Ошибка обработки update", update.get("update_id"), e)
+            finally:
+                self.slots.release()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"busy_chats": len(self.queues), "queued": sum(len(q) for q in self.queues.values())}
+
 def main():
     log("✅ simple_telegram_bot started. BACKEND_URL:", BACKEND_URL)
     log("Telegram token present. Discovered module commands:", MODULE_COMMANDS)
+    log(f"workers={WORKERS}, max_pending={MAX_PENDING}")
+    dispatcher = ChatDispatcher()
     offset = None
     last_heartbeat = time.time()
     while True:
         try:
-            resp = requests.get(BASE_URL + "/getUpdates", params={"timeout": 50, "offset": offset}, timeout=70)
+            resp = http().get(BASE_URL + "/getUpdates", params={"timeout": 50, "offset": offset}, timeout=70)
             data = resp.json()
             for upd in data.get("result", []):
                 offset = upd["update_id"] + 1
-                handle_update(upd)
+                # polling continues while updates are being handled by workers
+                dispatcher.submit(upd)
         except Exception as e:
             log("Ошибка в основном цикле:", e)
             time.sleep(3)
         now = time.time()
         if now - last_heartbeat > 60:
             active_chats = len(SESSIONS)
-            log(f"heartbeat: active_chats={active_chats}, last_activity_ago={int(now-LAST_ACTIVITY_TS)}s")
+            st = dispatcher.stats()
+            log(f"heartbeat: active_chats={active_chats}, busy_chats={st['busy_chats']}, queued={st['queued']}, last_activity_ago={int(now-LAST_ACTIVITY_TS)}s")
             last_heartbeat = now
 
 if __name__ == "__main__":
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный бенчмарк тренажёра с локальной заглушкой DeepSeek.
+
+  python smoke_tests/bench.py --users 20 --turns 5 --llm-latency 0.3 --llm-jitter 0.1 --out bench.json
+
+- поднимает фейковый DeepSeek (/v1/chat/completions, обычный и SSE-ответ)
+  с задержкой latency ± jitter;
+- запускает startup:app в этом же процессе (httpx.ASGITransport, без сети),
+  БД (cwd) и JSON-сессии trainer_dialog_engine / dialog_memory — во временном
+  каталоге (--data-dir), дерево исходников не трогается;
+- N параллельных «стажёров» проходят arena/v4, master_path/v3, objections/v3,
+  trainer_dialog_engine/v1 и dialog_memory/v1;
+- пишет JSON: p50/p95/p99 по эндпоинтам и модулям, RPS, число записей SQLite,
+  блокировки event loop. Два JSON разных сборок удобно сравнивать diff-ом.
+
+--url http://host:port — гонять уже запущенный сервер (без метрик SQLite и loop).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEXTS = [
+    "Здравствуйте! Понимаю, давайте расскажу, как мы работаем.",
+    "Сколько стоит песня к юбилею?",
+    "Давайте уточню: для кого подарок и какое настроение хотите?",
+    "Понимаю ваши сомнения, готов показать примеры.",
+    "Дорого? Давайте сравним с обычным подарком.",
+]
+
+
+# ---- фейковый DeepSeek ----
+
+class FakeLLM:
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = None
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def start(self) -> str:
+        llm = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a):
+                pass
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(n) or b"{}")
+                with llm._lock:
+                    llm.requests += 1
+                time.sleep(llm._delay())
+                text = "Хм, интересно. А сколько это займёт по времени?"
+                if body.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    for w in text.split(" "):
+                        chunk = {"choices": [{"delta": {"content": w + " "}}]}
+                        self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.close_connection = True
+                    return
+                raw = json.dumps({"choices": [{"message": {"content": text}}]}, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+
+
+# ---- счётчик записей SQLite ----
+
+class SQLiteWrites:
+    """Считает пишущие SQL-выражения на всех соединениях пула StateStore."""
+
+    VERBS = ("INSERT", "REPLACE", "UPDATE", "DELETE")
+
+    def __init__(self):
+        self.writes = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+
+    def _trace(self, sql: str):
+        head = sql.lstrip()[:8].upper()
+        with self._lock:
+            if head.startswith(self.VERBS):
+                self.writes += 1
+            elif head.startswith("COMMIT"):
+                self.commits += 1
+
+    def install(self):
+        from core.state.v1 import store as state_store
+        orig = state_store.StorePool._open
+        tracer = self
+
+        def _open(pool, path):
+            conn = orig(pool, path)
+            conn.set_trace_callback(tracer._trace)
+            return conn
+
+        state_store.StorePool._open = _open
+
+
+# ---- блокировка event loop ----
+
+class LoopLag:
+    """Пробник: спит tick секунд и меряет, насколько позже проснулся."""
+
+    def __init__(self, tick: float = 0.01, threshold: float = 0.005):
+        self.tick = tick
+        self.threshold = threshold
+        self.lags = []
+        self._stop = False
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop:
+            t0 = loop.time()
+            await asyncio.sleep(self.tick)
+            self.lags.append(max(0.0, loop.time() - t0 - self.tick))
+
+    def stop(self):
+        self._stop = True
+
+    def report(self) -> dict:
+        blocked = [x for x in self.lags if x > self.threshold]
+        return {
+            "samples": len(self.lags),
+            "blocked_ms": round(sum(blocked) * 1000, 1),
+            "blocked_events": len(blocked),
+            "max_lag_ms": round(max(self.lags) * 1000, 1) if self.lags else 0.0,
+            "p99_lag_ms": round(_pct(self.lags, 99) * 1000, 2),
+        }
+
+
+def _pct(values, p: float) -> float:
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+def _summary(lat) -> dict:
+    return {
+        "count": len(lat),
+        "p50_ms": round(_pct(lat, 50) * 1000, 2),
+        "p95_ms": round(_pct(lat, 95) * 1000, 2),
+        "p99_ms": round(_pct(lat, 99) * 1000, 2),
+        "max_ms": round(max(lat) * 1000, 2) if lat else 0.0,
+    }
+
+
+# ---- сценарии стажёра ----
+
+class Recorder:
+    def __init__(self, client):
+        self.client = client
+        self.samples = {}
+        self.errors = {}
+
+    async def call(self, label: str, method: str, url: str, **kw):
+        t0 = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, **kw)
+            ok = r.status_code < 400
+            data = r.json() if ok and r.headers.get("content-type", "").startswith("application/json") else None
+        except Exception:
+            ok, data = False, None
+        self.samples.setdefault(label, []).append(time.perf_counter() - t0)
+        if not ok:
+            self.errors[label] = self.errors.get(label, 0) + 1
+        return data
+
+
+async def trainee_engine(rec: Recorder, prefix: str, uid: str, turns: int):
+    await rec.call(f"{prefix}/start", "POST", f"{prefix}/start/{uid}")
+    for _ in range(turns):
+        await rec.call(f"{prefix}/handle", "POST", f"{prefix}/handle/{uid}", params={"text": random.choice(TEXTS)})
+    await rec.call(f"{prefix}/snapshot", "GET", f"{prefix}/snapshot/{uid}")
+
+
+async def trainee_dialog(rec: Recorder, uid: str, turns: int):
+    p = "/trainer_dialog_engine/v1"
+    s = await rec.call(f"{p}/start", "POST", f"{p}/start", json={"manager_id": uid, "scenario_id": "cold_start_warm"})
+    sid = (s or {}).get("sid")
+    for _ in range(turns):
+        await rec.call(f"{p}/turn", "POST", f"{p}/turn", json={"sid": sid, "text": random.choice(TEXTS)})
+    await rec.call(f"{p}/stop", "POST", f"{p}/stop", json={"sid": sid})
+
+
+async def trainee_memory(rec: Recorder, uid: str, turns: int):
+    p = "/dialog_memory/v1"
+    s = await rec.call(f"{p}/start", "POST", f"{p}/start", json={"manager_id": uid})
+    sid = (s or {}).get("session_id")
+    for i in range(turns):
+        role = "manager" if i % 2 == 0 else "client"
+        await rec.call(f"{p}/append", "POST", f"{p}/append",
+                       json={"manager_id": uid, "session_id": sid, "role": role, "content": random.choice(TEXTS), "stage": "greeting"})
+    await rec.call(f"{p}/analyze", "POST", f"{p}/analyze", json={"manager_id": uid, "session_id": sid})
+    await rec.call(f"{p}/list", "GET", f"{p}/list/{uid}")
+
+
+SCENARIOS = {
+    "arena": lambda rec, uid, t: trainee_engine(rec, "/arena/v4", uid, t),
+    "master_path": lambda rec, uid, t: trainee_engine(rec, "/master_path/v3", uid, t),
+    "objections": lambda rec, uid, t: trainee_engine(rec, "/objections/v3", uid, t),
+    "trainer_dialog_engine": trainee_dialog,
+    "dialog_memory": trainee_memory,
+}
+
+
+async def trainee(rec: Recorder, n: int, turns: int, modules):
+    uid = f"bench{n}"
+    for name in modules:
+        await SCENARIOS[name](rec, uid, turns)
+
+
+# ---- запуск ----
+
+def _isolate_module_data(data_dir: str) -> None:
+    # сессии в JSON пишутся рядом с модулем, а не в cwd — переводим их в data_dir,
+    # иначе прогон оставит файлы (и маркер .migrated dialog_memory) в дереве исходников
+    from modules.trainer_dialog_engine.v1 import service as tde
+    from modules.dialog_memory.v1 import service as dm
+    tde.SESS_PATH = os.path.join(data_dir, "trainer_dialog_engine")
+    dm.DATA_DIR = os.path.join(data_dir, "dialog_memory", "sessions")
+    os.makedirs(dm.DATA_DIR, exist_ok=True)
+
+
+async def run(args) -> dict:
+    import httpx
+
+    fake = None
+    writes = None
+    lag = None
+    if args.url:
+        transport, base = None, args.url.rstrip("/")
+    else:
+        fake = FakeLLM(args.llm_latency, args.llm_jitter)
+        os.environ["DEEPSEEK_API_URL"] = fake.start()
+        os.environ.setdefault("DEEPSEEK_API_KEY", "bench")
+        sys.path.insert(0, ROOT)
+        writes = SQLiteWrites()
+        writes.install()
+        import startup
+        data_dir = os.path.abspath(args.data_dir or tempfile.mkdtemp(prefix="salesbot_bench_"))
+        os.chdir(data_dir)
+        _isolate_module_data(data_dir)
+        transport, base = httpx.ASGITransport(app=startup.app), "http://bench"
+        lag = LoopLag()
+
+    modules = [m.strip() for m in args.modules.split(",") if m.strip()]
+    limits = httpx.Limits(max_connections=args.users * 2)
+    async with httpx.AsyncClient(transport=transport, base_url=base, timeout=60, limits=limits) as client:
+        rec = Recorder(client)
+        probe = asyncio.ensure_future(lag.run()) if lag else None
+        t0 = time.perf_counter()
+        await asyncio.gather(*(trainee(rec, i, args.turns, modules) for i in range(args.users)))
+        elapsed = time.perf_counter() - t0
+        if lag:
+            lag.stop()
+            await probe
+
+    if not args.url:
+        from core.state.v1 import close_all
+        from core.voice_gateway.v1 import close_async_client
+        close_all()
+        await close_async_client()
+        fake.stop()
+
+    all_lat = [x for v in rec.samples.values() for x in v]
+    by_module = {}
+    for label, v in rec.samples.items():
+        by_module.setdefault(label.strip("/").split("/")[0], []).extend(v)
+    report = {
+        "config": {
+            "users": args.users, "turns": args.turns, "modules": modules,
+            "llm_latency": args.llm_latency, "llm_jitter": args.llm_jitter,
+            "target": args.url or "in-process", "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(all_lat),
+        "errors": sum(rec.errors.values()),
+        "throughput_rps": round(len(all_lat) / elapsed, 2) if elapsed else 0.0,
+        "latency": _summary(all_lat),
+        "by_module": {k: _summary(v) for k, v in sorted(by_module.items())},
+        "by_endpoint": {k: _summary(v) for k, v in sorted(rec.samples.items())},
+        "errors_by_endpoint": rec.errors,
+    }
+    if fake:
+        report["llm_requests"] = fake.requests
+    if writes:
+        report["sqlite"] = {"writes": writes.writes, "commits": writes.commits}
+    if lag:
+        report["event_loop"] = lag.report()
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="salesbot trainer benchmark")
+    ap.add_argument("--users", type=int, default=10)
+    ap.add_argument("--turns", type=int, default=5)
+    ap.add_argument("--modules", default=",".join(SCENARIOS))
+    ap.add_argument("--llm-latency", type=float, default=0.2)
+    ap.add_argument("--llm-jitter", type=float, default=0.05)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--data-dir", default=None)
+    ap.add_argument("--url", default=None)
+    ap.add_argument("--out", default="bench.json")
+    args = ap.parse_args()
+    random.seed(args.seed)
+
+    out = os.path.abspath(args.out)
+    report = asyncio.run(run(args))
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    lat = report["latency"]
+    print(f"{report['requests']} req, {report['errors']} err, {report['throughput_rps']} rps, "
+          f"p50={lat['p50_ms']}ms p95={lat['p95_ms']}ms p99={lat['p99_ms']}ms -> {out}")
+
+
+if __name__ == "__main__":
+    main()
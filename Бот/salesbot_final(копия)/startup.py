@@ -7,6 +7,59 @@ app = FastAPI(title="salesbot", version="v1-final")
 async def root_health():
     return {"ok": True, "app": "salesbot", "version": "v1-final"}
 
+# общий пул соединений StateStore
+from core.state.v1 import pool_stats, close_all as close_state_pool
+# общий httpx.AsyncClient для LLM
+from core.voice_gateway.v1 import close_async_client
+
+@app.get("/api/public/v1/state_pool")
+async def state_pool():
+    return {"ok": True, "pool": pool_stats()}
+
+@app.on_event("shutdown")
+async def _close_state_pool():
+    close_state_pool()
+
+@app.on_event("shutdown")
+async def _close_llm_client():
+    await close_async_client()
+
+# кэш файлов данных модулей (JSON с проверкой mtime)
+import os
+from core.resources.v1 import get_loader, resource_stats
+
+@app.get("/api/public/v1/resources")
+async def resources():
+    return {"ok": True, "resources": resource_stats()}
+
+@app.on_event("startup")
+async def _watch_resources():
+    # RESOURCE_WATCH=inotify|poll — фоновое слежение вместо stat на каждом вызове
+    mode = os.environ.get("RESOURCE_WATCH", "").lower()
+    if mode in ("inotify", "poll", "1", "on"):
+        get_loader().watch(float(os.environ.get("RESOURCE_WATCH_INTERVAL", "1")), None if mode in ("1", "on") else mode)
+
+@app.on_event("shutdown")
+async def _unwatch_resources():
+    get_loader().unwatch()
+
+# общий реестр модулей (версии — один раз, экземпляры — лениво)
+from api.core.registry import get_registry
+app.state.registry = get_registry()
+
+@app.get("/api/public/v1/registry")
+async def registry_stats():
+    return {"ok": True, **get_registry().stats()}
+
+# тайминги запросов: заголовок Server-Timing и гистограммы для Prometheus
+from fastapi.responses import PlainTextResponse
+from core.metrics.v1 import TimingMiddleware, get_metrics
+app.add_middleware(TimingMiddleware)
+
+@app.get("/api/public/v1/metrics")
+async def metrics():
+    return PlainTextResponse(get_metrics().render(), media_type="text/plain; version=0.0.4")
+
 # автоподключение всех роутов
 try:
     from router_autoload import include_all
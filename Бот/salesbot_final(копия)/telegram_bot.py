@@ -2,7 +2,7 @@ import os
 from aiogram import Bot
 from aiogram.dispatcher import Dispatcher
 from aiogram.utils import executor
-from api.core.registry import ModuleRegistry
+from api.core.registry import get_registry
 from telegram.autoload import autoload_telegram_handlers
 
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
@@ -11,7 +11,7 @@ if not TELEGRAM_TOKEN:
 
 bot = Bot(token=TELEGRAM_TOKEN)
 dp = Dispatcher(bot)
-registry = ModuleRegistry()
+registry = get_registry()
 
 # Автозагрузка модулей
 autoload_telegram_handlers(dp, registry, package_name="modules")